@@ -0,0 +1,60 @@
+import os
+import sys
+import numpy as np
+
+# LinkGraph lives with the crawler that writes link_graph.bin
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'web_crawler', 'Code'))
+from link_graph import LinkGraph
+
+
+class PageRank:
+    """PageRank over the crawler's memory-mapped CSR link graph, one vectorized pass per iteration."""
+
+    def __init__(self, graph_path="./links/link_graph.bin", damping_factor=0.85):
+        self.graph = LinkGraph.open(graph_path)
+        self.damp = damping_factor  # Damping factor
+        self.num = self.graph.num_nodes  # Total number of pages
+        self.ol_count = self.graph.out_degree()  # Number of out-links for each page
+        self.sink = self.ol_count == 0  # Sink nodes, pages without out-links
+        self.pr = None  # PageRank of each page, indexed by node id
+
+    def get_page_rank(self, convergence_threshold=0.0001, max_iterations=100):
+        pr = np.full(self.num, 1 / self.num)
+        in_sources = np.asarray(self.graph.in_sources)
+        in_offsets = np.asarray(self.graph.in_offsets)
+        safe_count = np.maximum(self.ol_count, 1)
+        for iterations in range(1, max_iterations + 1):
+            sinkPR = pr[self.sink].sum()
+            share = np.where(self.sink, 0, pr / safe_count)  # What each page passes to every out-link
+            # Sum the shares of each page's in-links: prefix sums over the transpose, one difference per row
+            totals = np.concatenate(([0.0], np.cumsum(share[in_sources])))
+            newPR = (1 - self.damp) / self.num + self.damp * sinkPR / self.num \
+                + self.damp * (totals[in_offsets[1:]] - totals[in_offsets[:-1]])
+            change = np.abs(newPR - pr).sum()
+            pr = newPR
+            print(f"Iteration {iterations}, Change: {change}, SinkPR: {sinkPR}")
+            if change <= convergence_threshold:
+                break
+        else:
+            print("Reached maximum iterations.")
+        self.pr = pr
+
+    def print_top_500(self, result_file_path="./links/page_rank_results_csr.txt"):
+        top = np.argsort(-self.pr)[:500]
+        in_count = self.graph.in_degree()
+        pages = [self.graph.urls[i] for i in top]
+        page_width = max(len(page) for page in pages) + 2
+        rank_width = 20
+        count_width = 17
+        header = f"{'Page'.ljust(page_width)}{'Page Rank'.ljust(rank_width)}{'No. of Outlinks'.ljust(count_width)}{'No. of Inlinks'.ljust(count_width)}\n"
+        with open(result_file_path, "w") as f:
+            f.write(header)
+            for page, node in zip(pages, top):
+                f.write(f"{page.ljust(page_width)}{f'{self.pr[node]:.16f}'.ljust(rank_width)}"
+                        f"{str(self.ol_count[node]).ljust(count_width)}{str(in_count[node]).ljust(count_width)}\n")
+
+
+if __name__ == "__main__":
+    pr = PageRank(sys.argv[1] if len(sys.argv) > 1 else "./links/link_graph.bin")
+    pr.get_page_rank()
+    pr.print_top_500()
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import socket
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+from stream_fetch import CHUNK_SIZE, DEFAULT_DEADLINE, DEFAULT_MAX_BYTES, incremental_decoder, is_html_type
+
+
+class FetchResult:
+    """`text` is the decoded HTML body; `skipped` is set when it was not read, as in stream_fetch.StreamedResponse."""
+
+    def __init__(self, url, final_url, status_code, headers, text='', skipped=None, bytes_read=0):
+        self.url = url
+        self.final_url = final_url
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.skipped = skipped
+        self.bytes_read = bytes_read
+
+
+class CachedResolver(AbstractResolver):
+    """aiohttp resolver answering from a dns_cache.DnsCache, a lookup that misses runs off the event loop."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        try:
+            infos = await asyncio.get_running_loop().run_in_executor(None, self.cache.lookup, host)
+        except ValueError as e:  # An invalid name, reported like any other resolution failure
+            raise OSError(f"Cannot resolve {host}: {e}") from e
+        return [{"hostname": host, "host": address[0], "port": port, "family": af, "proto": proto,
+                 "flags": socket.AI_NUMERICHOST | socket.AI_NUMERICSERV}
+                for af, _, proto, _, address in infos if not family or af == family]
+
+    async def close(self):
+        pass
+
+
+class HostSlots:
+    """
+    Hand out one fetch slot per host every `delay` seconds without blocking other hosts. With `delay_for`
+    (e.g. host_rate.RateController.delay) the spacing is asked per host at each reservation instead.
+    Slots can be shared by several hosts (a politeness group) by waiting on the group's key.
+    """
+
+    def __init__(self, delay=1.0, delay_for=None):
+        self.delay = delay
+        self.delay_for = delay_for
+        self.next_slot = {}
+
+    async def wait(self, host, key=None):
+        key = key or host
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        # Reserve the slot before sleeping so concurrent waiters on the same host queue up behind it.
+        slot = max(now, self.next_slot.get(key, now))
+        self.next_slot[key] = slot + (self.delay_for(host) if self.delay_for else self.delay)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AsyncFetcher:
+    """
+    Keep many requests in flight across hosts while each host still gets at most one request per
+    `politeness_delay`, or per the delay `rate` (a host_rate.RateController) gives it from its responses.
+    With `group_of` (netloc -> politeness group, e.g. a server IP) slots and pending limits are per group,
+    rates stay per host. With `resolver` (a dns_cache.DnsCache) connections go to its cached addresses.
+    """
+
+    def __init__(self, concurrency=200, politeness_delay=1.0, timeout=5, max_pending_per_host=2, metrics=None,
+                 deadline=DEFAULT_DEADLINE, max_bytes=DEFAULT_MAX_BYTES, rate=None, group_of=None, resolver=None):
+        self.concurrency = concurrency
+        self.metrics = metrics  # Optional telemetry.CrawlMetrics
+        # timeout bounds connecting and each read like requests' timeout, deadline the whole fetch
+        self.timeout = aiohttp.ClientTimeout(total=deadline, sock_connect=timeout, sock_read=timeout)
+        self.max_bytes = max_bytes
+        self.rate = rate
+        self.group_of = group_of
+        self.resolver = resolver
+        self.slots = HostSlots(politeness_delay, rate.delay if rate else None)
+        self.max_pending_per_host = max_pending_per_host
+        self.pending_per_host = defaultdict(int)
+        self.deferred = defaultdict(deque)  # Items parked because their host already has enough waiters
+        self.deferred_count = 0
+        self.max_deferred = concurrency * 50
+
+    def pool_trace_configs(self):
+        """Count connection checkouts and new connections like http_pool.PoolStats (pool_checkouts, pool_connects)."""
+        if not self.metrics:
+            return []
+        metrics = self.metrics
+
+        async def on_request_start(session, context, params):
+            metrics.count('pool_checkouts')
+
+        async def on_connection_create_end(session, context, params):
+            metrics.count('pool_connects')
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return [trace_config]
+
+    async def fetch(self, session, url):
+        """Check the headers first: only a 200 HTML body under max_bytes is downloaded, decoded chunk by chunk."""
+        async with session.get(url, allow_redirects=True) as response:
+            result = FetchResult(url, str(response.url), response.status, response.headers)
+            content_type = response.headers.get('Content-Type', '')
+            if response.status != 200:
+                return result
+            if not is_html_type(content_type):
+                result.skipped = 'content_type'
+                return result
+            if response.content_length is not None and response.content_length > self.max_bytes:
+                result.skipped = 'too_large'
+                return result
+            parts, decoder = [], None
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                if decoder is None:
+                    decoder = incremental_decoder(content_type, chunk)
+                result.bytes_read += len(chunk)
+                if result.bytes_read > self.max_bytes:
+                    result.skipped = 'too_large'
+                    return result
+                parts.append(decoder.decode(chunk))
+            if decoder is not None:
+                parts.append(decoder.decode(b'', final=True))
+            result.text = ''.join(parts)
+            return result
+
+    async def run(self, next_item, handle_result, should_stop, requeue=None, budget=None):
+        """
+        Drive the crawl. `next_item()` returns the next frontier item (or None when empty),
+        `handle_result(item, result)` processes a finished fetch (result is None on failure) on a
+        worker thread, one result at a time, so parsing doesn't stall the event loop.
+        `should_stop()` tells the loop to stop dispatching new work; items still deferred then are
+        handed to `requeue(item)` so they go back to the frontier. With `budget()` (results still
+        wanted) no more fetches start than the budget allows, workers past it wait for a fetch to be
+        handled and are requeued once the crawl stops.
+        """
+        loop = asyncio.get_running_loop()
+        handler = ThreadPoolExecutor(max_workers=1, thread_name_prefix='handle_result')
+        semaphore = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+        budget_freed = asyncio.Condition()
+        claimed = 0  # Fetches started against the budget and not handled yet
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.max_pending_per_host,
+                                         resolver=CachedResolver(self.resolver) if self.resolver else None)
+        # trust_env: honour HTTP_PROXY like requests does
+        async with aiohttp.ClientSession(timeout=self.timeout, connector=connector, trust_env=True,
+                                         trace_configs=self.pool_trace_configs()) as session:
+
+            async def claim():
+                nonlocal claimed
+                async with budget_freed:
+                    await budget_freed.wait_for(lambda: should_stop() or claimed < budget())
+                    if should_stop():
+                        return False
+                    claimed += 1
+                    return True
+
+            async def release():
+                nonlocal claimed
+                async with budget_freed:
+                    claimed -= 1
+                    budget_freed.notify_all()
+
+            async def worker(item, host, group):
+                if budget and not await claim():
+                    self.pending_per_host[group] -= 1
+                    if requeue:
+                        await loop.run_in_executor(handler, requeue, item)
+                    return
+                result = None
+                try:
+                    waited = time.perf_counter()
+                    await self.slots.wait(host, group)
+                    async with semaphore:
+                        started = time.perf_counter()
+                        result = await self.fetch(session, item.url)
+                    if self.metrics:
+                        self.metrics.observe('politeness_wait_seconds', started - waited)
+                        self.metrics.observe('fetch_seconds', time.perf_counter() - started)
+                    if self.rate:
+                        self.rate.record(host, time.perf_counter() - started, result.status_code, result.headers.get('Retry-After'))
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    if self.rate:
+                        self.rate.record(host, time.perf_counter() - waited)
+                    logging.error(f"Failed to fetch URL {item.url}: {e}")
+                finally:
+                    self.pending_per_host[group] -= 1
+                try:
+                    await loop.run_in_executor(handler, handle_result, item, result)
+                except Exception:
+                    logging.exception(f"Failed to handle the result of {item.url}")
+                finally:
+                    if budget:
+                        await release()
+                    # The host's next waiter goes out even if handling failed
+                    if self.deferred[group] and not should_stop():
+                        self.deferred_count -= 1
+                        dispatch(self.deferred[group].popleft())
+
+            def dispatch(item):
+                host = urlparse(item.url).netloc
+                group = self.group_of(host) if self.group_of else host
+                if self.pending_per_host[group] >= self.max_pending_per_host:
+                    self.deferred[group].append(item)
+                    self.deferred_count += 1
+                    return
+                self.pending_per_host[group] += 1
+                task = asyncio.ensure_future(worker(item, host, group))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+
+            while not should_stop():
+                # Keep the number of runnable tasks bounded so the frontier keeps ordering the work.
+                if len(in_flight) >= self.concurrency * 2 or self.deferred_count >= self.max_deferred:
+                    await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                item = await next_item()
+                if item is None:
+                    if not in_flight:
+                        break
+                    await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                dispatch(item)
+
+            while in_flight:
+                await asyncio.wait(in_flight)
+        handler.shutdown()
+
+        leftover = [item for queue in self.deferred.values() for item in queue]
+        self.deferred.clear()
+        self.deferred_count = 0
+        if leftover and requeue:
+            logging.info(f"Returning {len(leftover)} deferred items to the frontier")
+            for item in leftover:
+                requeue(item)
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIGS = ('web_crawler', 'web_crawler_async', 'craw_new', 'craw_new_doc_store', 'pipelined', 'sharded')
+
+
+def run_config(config, seeds, args):
+    """Runs inside the child process, in its own working directory. Returns (pages fetched, documents written)."""
+    sys.path.insert(0, CODE_DIR)
+    if config.startswith('web_crawler'):
+        from crawler import WebCrawler
+        crawler = WebCrawler(seeds, seen_store=args.seen_store)
+        if config == 'web_crawler_async':
+            crawler.crawl_async(max_pages=args.pages, concurrency=args.concurrency)
+        else:
+            crawler.crawl(max_pages=args.pages)
+        return crawler.metrics.pages_fetched, crawler.metrics.documents_written
+    if config == 'sharded':
+        from sharded_crawl import ShardedCrawl
+        documents = ShardedCrawl(seeds, args.pages, 'out', ['cold', 'war'], num_workers=args.workers).start_crawling()
+        pages = 0
+        for name in os.listdir('out'):
+            if name.startswith('shard_') and os.path.exists(os.path.join('out', name, 'crawl_metrics.json')):
+                with open(os.path.join('out', name, 'crawl_metrics.json')) as f:
+                    pages += json.load(f)["pages_fetched"]
+        return pages, documents
+    if config == 'pipelined':
+        from pipeline import PipelinedCrawler
+        crawler = PipelinedCrawler(seeds, args.pages, 'out', ['cold', 'war'], fetch_threads=args.fetch_threads,
+                                   parse_workers=args.workers, seen_store=args.seen_store)
+        crawler.start_crawling()
+        return crawler.metrics.pages_fetched, crawler.metrics.documents_written
+    from craw_new import Crawler
+    crawler = Crawler(seeds, args.pages, 'out', ['cold', 'war'], seen_store=args.seen_store,
+                      use_doc_store=config == 'craw_new_doc_store')
+    crawler.start_crawling()
+    return crawler.metrics.pages_fetched, crawler.metrics.documents_written
+
+
+def child_main(args):
+    os.chdir(args.workdir)
+    seeds = args.seeds.split(',')
+    start = time.perf_counter()
+    pages, documents = run_config(args.run, seeds, args)
+    print(json.dumps({"pages": pages, "documents": documents, "seconds": time.perf_counter() - start}))
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Synthetic web did not come up on port {port}")
+
+
+def benchmark(config, seeds, args, env):
+    workdir = tempfile.mkdtemp(prefix=f"bench_{config}_", dir=args.workdir)
+    command = [sys.executable, os.path.abspath(__file__), '--run', config, '--workdir', workdir, '--seeds', ','.join(seeds),
+               '--pages', str(args.pages), '--concurrency', str(args.concurrency), '--workers', str(args.workers),
+               '--fetch-threads', str(args.fetch_threads),
+               '--seen-store', args.seen_store]
+    with open(os.path.join(workdir, 'bench_stdout.txt'), 'w+') as out:
+        process = subprocess.Popen(command, stdout=out, stderr=subprocess.DEVNULL, env=env)
+        # wait4 gives this child's own CPU time and peak RSS, including the worker processes it joined
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        out.seek(0)
+        lines = out.read().strip().splitlines()
+    if process.returncode != 0 or not lines:
+        return {"config": config, "error": f"exit code {process.returncode}, see {workdir}"}
+    result = json.loads(lines[-1])
+    cpu = usage.ru_utime + usage.ru_stime
+    result.update({
+        "config": config,
+        "pages_per_second": result["pages"] / result["seconds"],
+        "cpu_ms_per_page": 1000 * cpu / max(result["pages"], 1),
+        "max_rss_mb": usage.ru_maxrss / 1024,
+        "workdir": workdir,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a local synthetic web with each crawler configuration and compare throughput.")
+    parser.add_argument('--configs', default=','.join(CONFIGS), help=f"comma separated, from {', '.join(CONFIGS)}")
+    parser.add_argument('--pages', type=int, default=1000, help="page / document budget per run")
+    parser.add_argument('--hosts', type=int, default=200)
+    parser.add_argument('--pages-per-host', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--host-mode', choices=('loopback', 'proxy'), default='loopback')
+    parser.add_argument('--concurrency', type=int, default=200, help="asyncio fetch concurrency")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="processes for the sharded crawl and the pipelined parse stage")
+    parser.add_argument('--fetch-threads', type=int, default=16, help="fetch threads of the pipelined crawl")
+    parser.add_argument('--seen-store', default='set')
+    parser.add_argument('--workdir', default=None, help="parent directory for the runs' output (default: a temp dir)")
+    parser.add_argument('--json', help="also write the results to this file")
+    # Internal: run one configuration in this process
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    parser.add_argument('--seeds', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        child_main(args)
+        return
+
+    sys.path.insert(0, CODE_DIR)
+    from synthetic_web import SyntheticWeb
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix='bench_crawl_')
+    os.makedirs(args.workdir, exist_ok=True)
+    web = SyntheticWeb(args.hosts, args.pages_per_host, args.seed, args.port, args.host_mode, latency_ms=args.latency_ms)
+    server = subprocess.Popen([sys.executable, os.path.join(CODE_DIR, 'synthetic_web.py'), '--port', str(args.port),
+                               '--hosts', str(args.hosts), '--pages-per-host', str(args.pages_per_host),
+                               '--seed', str(args.seed), '--latency-ms', str(args.latency_ms), '--host-mode', args.host_mode],
+                              stdout=subprocess.DEVNULL)
+    env = dict(os.environ)
+    if args.host_mode == 'proxy':
+        env['HTTP_PROXY'] = env['http_proxy'] = f"http://127.0.0.1:{args.port}"
+    results = []
+    try:
+        wait_for_port(args.port)
+        print(f"{args.hosts} hosts x {args.pages_per_host} pages, {args.latency_ms:.0f} ms latency, budget {args.pages} pages, output in {args.workdir}")
+        print(f"{'config':<20} {'pages':>7} {'docs':>7} {'seconds':>8} {'pages/s':>8} {'cpu ms/page':>12} {'max rss MB':>11}")
+        for config in args.configs.split(','):
+            result = benchmark(config, web.seed_urls(), args, env)
+            results.append(result)
+            if "error" in result:
+                print(f"{config:<20} failed: {result['error']}")
+                continue
+            print(f"{config:<20} {result['pages']:>7} {result['documents']:>7} {result['seconds']:>8.1f} "
+                  f"{result['pages_per_second']:>8.1f} {result['cpu_ms_per_page']:>12.2f} {result['max_rss_mb']:>11.1f}")
+    finally:
+        server.terminate()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import heapq
+import random
+import resource
+import shutil
+import tempfile
+import time
+from disk_frontier import DiskSpillingFrontier
+
+
+def current_rss_mb():
+    """Resident set size from /proc on Linux, peak RSS elsewhere."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def fake_url(i):
+    return f"http://host{i % 5000}.example.org/wiki/Page_{i}_{random.getrandbits(32):08x}"
+
+
+def run(frontier_name, push, pop, total, report_every):
+    start = time.time()
+    for i in range(total):
+        push(random.random(), fake_url(i))
+        if (i + 1) % report_every == 0:
+            print(f"{frontier_name:>6} queued {i + 1:>9,}  rss {current_rss_mb():8.1f} MB  {time.time() - start:6.1f}s")
+    drained = 0
+    drain_start = time.time()
+    for _ in range(min(total, report_every)):
+        pop()
+        drained += 1
+    print(f"{frontier_name:>6} drained {drained:,} in {time.time() - drain_start:.2f}s, rss {current_rss_mb():.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS of the in-memory heap vs the disk-spilling frontier as the queue grows.")
+    parser.add_argument('--urls', type=int, default=3000000)
+    parser.add_argument('--max-in-memory', type=int, default=200000)
+    parser.add_argument('--report-every', type=int, default=500000)
+    parser.add_argument('--heap', action='store_true', help="benchmark the plain heapq frontier instead")
+    args = parser.parse_args()
+
+    random.seed(0)
+    if args.heap:
+        heap = []
+        run('heap', lambda p, u: heapq.heappush(heap, (p, u)), lambda: heapq.heappop(heap), args.urls, args.report_every)
+        return
+    spill_dir = tempfile.mkdtemp(prefix='frontier_bench_')
+    try:
+        frontier = DiskSpillingFrontier(spill_dir, max_in_memory=args.max_in_memory)
+        run('disk', frontier.push, frontier.pop, args.urls, args.report_every)
+        frontier.close()
+    finally:
+        shutil.rmtree(spill_dir)
+
+
+if __name__ == '__main__':
+    main()
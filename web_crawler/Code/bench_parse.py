@@ -0,0 +1,75 @@
+import argparse
+import os
+import time
+from bs4 import BeautifulSoup
+from html_parse import parse_html, lxml
+
+
+def old_crawler_path(raw):
+    """What crawler.py did per page before the single parse stage: decode, then BeautifulSoup on the raw bytes."""
+    raw.decode('utf-8', 'ignore')
+    soup = BeautifulSoup(raw, 'html.parser')
+    soup.find('title')
+    links = [(a['href'], a.text) for a in soup.find_all('a', href=True)]
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.decompose()
+    soup.get_text()
+    return links
+
+
+def old_craw_new_path(raw):
+    """What craw_new.py did per page: one BeautifulSoup parse for links, a second one in process_document."""
+    html = raw.decode('utf-8', 'ignore')
+    soup = BeautifulSoup(html, 'html.parser')
+    links = [(a['href'], a.text) for a in soup.find_all('a', href=True)]
+    soup = BeautifulSoup(html, 'html.parser')
+    for data in soup(["script", "style", "header"]):
+        data.decompose()
+    ' '.join(soup.stripped_strings)
+    return links
+
+
+def load_corpus(corpus_dir, limit):
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(corpus_dir, name), 'rb') as f:
+                pages.append(f.read())
+            if len(pages) == limit:
+                break
+    return pages
+
+
+def time_it(name, func, pages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for raw in pages:
+            func(raw)
+        best = min(best, time.perf_counter() - start)
+    total_mb = sum(len(p) for p in pages) / 1e6
+    print(f"{name:<22} {best:8.3f}s  {len(pages) / best:8.1f} pages/s  {total_mb / best:6.1f} MB/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the single-pass parse stage with the old BeautifulSoup paths over saved HTML.")
+    parser.add_argument('corpus', help="directory of saved .html pages")
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.limit)
+    if not pages:
+        raise SystemExit(f"No .html files in {args.corpus}")
+    print(f"{len(pages)} pages, {sum(len(p) for p in pages) / 1e6:.1f} MB")
+    baseline = time_it('crawler.py (old)', old_crawler_path, pages, args.repeat)
+    time_it('craw_new.py (old)', old_craw_new_path, pages, args.repeat)
+    backends = ['bs4', 'stream'] + (['lxml'] if lxml else [])
+    for backend in backends:
+        elapsed = time_it(f"parse_html[{backend}]", lambda raw: parse_html(raw.decode('utf-8', 'ignore'), parser=backend), pages, args.repeat)
+        print(f"{'':<22} {baseline / elapsed:.1f}x vs crawler.py (old)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import os
+import random
+import time
+from urllib.parse import urljoin
+
+from craw_new import BLOCK_LIST, Crawler
+from crawler import URL_BLACKLIST, WebCrawler
+from html_parse import parse_html
+from url_filter import UrlFilter, LinkNormalizer
+
+
+def synthetic_pages(num_pages, links_per_page, num_sites, seed):
+    """Wikipedia-shaped pages: a shared navigation block on every page plus article links, some to other sites."""
+    rnd = random.Random(seed)
+    navigation = [(f"/wiki/{name}", name) for name in ("Main_Page", "Portal:Contents", "Special:Random",
+                                                      "Help:Contents", "Special:RecentChanges", "Wikipedia:About")]
+    navigation += [(f"//en.wikipedia.org/w/index.php?title=Cold_War&action=edit&section={i}", "edit") for i in range(20)]
+    pages = []
+    for _ in range(num_pages):
+        base = f"https://en.wikipedia.org/wiki/Article_{rnd.randrange(100000)}"
+        links = list(navigation)
+        for _ in range(links_per_page - len(navigation)):
+            roll = rnd.random()
+            article = int(rnd.paretovariate(0.3)) % 50000  # Popular articles are linked from many pages
+            if roll < 0.7:
+                links.append((f"/wiki/Article_{article}", f"article {article}"))
+            elif roll < 0.8:
+                links.append((f"/wiki/File:Image_{article}.jpg", "image"))
+            else:
+                links.append((f"http://www.site{rnd.randrange(num_sites)}.org/history/page_{article}.html", "external"))
+        pages.append((base, links))
+    return pages
+
+
+def corpus_pages(corpus_dir, limit):
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(corpus_dir, name), 'rb') as f:
+                page = parse_html(f.read().decode('utf-8', 'ignore'))
+            pages.append((f"https://en.wikipedia.org/wiki/{os.path.splitext(name)[0]}", page.links))
+            if len(pages) == limit:
+                break
+    return pages
+
+
+def old_crawler_links(pages):
+    """crawler.py process_links_found before the normalizer: urljoin, canonicalize and a list scan per link."""
+    crawler = WebCrawler.__new__(WebCrawler)  # canonicalize_url and is_valid_url don't touch instance state
+    kept = 0
+    for base, links in pages:
+        for href, _ in links:
+            absolute_link = crawler.canonicalize_url(urljoin(base, href))
+            if crawler.is_valid_url(absolute_link) and not any(keyword in absolute_link for keyword in URL_BLACKLIST):
+                kept += 1
+    return kept
+
+
+def old_craw_new_links(pages):
+    """craw_new.py crawl_url before the normalizer."""
+    kept = 0
+    for base, links in pages:
+        for url, _ in links:
+            if not url.startswith('http'):
+                url = urljoin(base, url)
+            canonical_link = Crawler.canonicalize_url(url)
+            can_low_link = canonical_link.replace('http://', '').replace('https://', '').lower()
+            if not any(substring in can_low_link for substring in BLOCK_LIST):
+                kept += 1
+    return kept
+
+
+def new_links(normalizer):
+    def run(pages):
+        normalizer.canonical.cache_clear()  # Every repeat starts cold, like a new crawl
+        return sum(len(normalizer.normalize(base, links)) for base, links in pages)
+    return run
+
+
+def time_it(name, func, pages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        kept = func(pages)
+        best = min(best, time.perf_counter() - start)
+    num_links = sum(len(links) for _, links in pages)
+    print(f"{name:<28} {best:8.3f}s  {num_links / best / 1e3:8.1f}k links/s  {kept} kept")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the compiled url filter and memoized canonicalizer with the old per-link path.")
+    parser.add_argument('--corpus', help="directory of saved .html pages (default: synthetic pages)")
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--links-per-page', type=int, default=500)
+    parser.add_argument('--sites', type=int, default=200, help="external sites linked from synthetic pages")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        pages = corpus_pages(args.corpus, args.pages)
+    else:
+        pages = synthetic_pages(args.pages, args.links_per_page, args.sites, seed=0)
+    print(f"{len(pages)} pages, {sum(len(links) for _, links in pages)} links")
+
+    # The kept counts differ from the old paths by in-page duplicates, which the old code enqueued once per occurrence
+    web_crawler = WebCrawler.__new__(WebCrawler)
+    baseline = time_it('crawler.py (old)', old_crawler_links, pages, args.repeat)
+    elapsed = time_it('crawler.py LinkNormalizer', new_links(LinkNormalizer(web_crawler.canonicalize_url, UrlFilter(URL_BLACKLIST),
+                                                                             web_crawler.is_valid_url)), pages, args.repeat)
+    print(f"{'':<28} {baseline / elapsed:.1f}x")
+    baseline = time_it('craw_new.py (old)', old_craw_new_links, pages, args.repeat)
+    elapsed = time_it('craw_new.py LinkNormalizer', new_links(LinkNormalizer(Crawler.canonicalize_url,
+                                                                              UrlFilter(BLOCK_LIST, ignore_case=True))), pages, args.repeat)
+    print(f"{'':<28} {baseline / elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+
+
+class CrawlState:
+    """
+    Replayable model of what a crawler checkpoint holds. Both the crawler's recovery and the background
+    compactor build it by applying logged events, so neither needs a pause of the live crawler.
+    """
+
+    def __init__(self):
+        self.frontier = {}  # url -> [in_link_count, wave_number, keyword_match, is_seed, timestamp]
+        self.queued = {}  # url -> best priority, craw_new's frontier ('queue' events)
+        self.visited = set()
+        self.crawled_count = 0
+        self.in_links = {}  # url -> set of urls
+        self.out_links = {}
+        self.extra = {}  # crawler specific values logged with 'set'
+        self.tables = {}  # table -> {key: value}, crawler specific records logged with 'put'
+
+    def __setstate__(self, state):
+        self.__init__()  # Snapshots written before a field existed get its default
+        self.__dict__.update(state)
+
+    def apply(self, event):
+        op, *args = event
+        if op == 'queue':
+            url, priority = args
+            self.queued[url] = min(priority, self.queued.get(url, priority))
+        elif op == 'document':
+            key, doc_number = args
+            self.visited.add(key)
+            self.extra['documents_crawled'] = max(self.extra.get('documents_crawled', 0), doc_number)
+        elif op == 'put':
+            table, key, value = args
+            self.tables.setdefault(table, {})[key] = value
+        elif op == 'push':
+            url, wave_number, keyword_match, is_seed, timestamp = args
+            entry = self.frontier.get(url)
+            if entry:
+                entry[0] += 1
+                entry[2] = max(entry[2], keyword_match)
+            else:
+                self.frontier[url] = [1, wave_number, keyword_match, is_seed, timestamp]
+        elif op == 'pop':
+            self.frontier.pop(args[0], None)
+            self.queued.pop(args[0], None)
+        elif op == 'visit':
+            self.visited.add(args[0])
+        elif op == 'edge':
+            src, dst = args
+            self.out_links.setdefault(src, set()).add(dst)
+            self.in_links.setdefault(dst, set()).add(src)
+        elif op == 'count':
+            self.crawled_count = args[0]
+        elif op == 'set':
+            self.extra[args[0]] = args[1]
+        else:
+            raise ValueError(f"Unknown checkpoint event: {op}")
+
+
+class CheckpointLog:
+    """
+    Append-only write-ahead log of crawl events. Events go to numbered segments (wal_N.log, one json
+    array per line); once a segment holds `segment_events` events it is closed and a background thread
+    folds the closed segments into the previous snapshot, producing snapshot_N.pkl = state after every
+    segment below N. Recovery is the newest snapshot plus a replay of the segments after it; a torn
+    last line from a crash is ignored.
+    """
+
+    SEGMENT_RE = re.compile(r'wal_(\d+)\.log$')
+    SNAPSHOT_RE = re.compile(r'snapshot_(\d+)\.pkl$')
+
+    def __init__(self, directory, segment_events=200000, fsync=False):
+        self.directory = directory
+        self.segment_events = segment_events
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.compactor = None
+        self.file = None
+        self.events_in_segment = 0
+        os.makedirs(directory, exist_ok=True)
+        existing = self._numbered(self.SEGMENT_RE) + self._numbered(self.SNAPSHOT_RE)
+        self.segment_number = max(existing, default=0) + 1
+
+    def _numbered(self, pattern):
+        return sorted(int(m.group(1)) for m in map(pattern.match, os.listdir(self.directory)) if m)
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"wal_{number:08d}.log")
+
+    def _snapshot_path(self, number):
+        return os.path.join(self.directory, f"snapshot_{number:08d}.pkl")
+
+    def recover(self):
+        """Rebuild the CrawlState from the newest snapshot and the log tail. Returns None if there is nothing to recover."""
+        snapshots = self._numbered(self.SNAPSHOT_RE)
+        segments = self._numbered(self.SEGMENT_RE)
+        if not snapshots and not segments:
+            return None
+        state = CrawlState()
+        base = 0
+        if snapshots:
+            base = snapshots[-1]
+            with open(self._snapshot_path(base), 'rb') as f:
+                state = pickle.load(f)
+        for number in segments:
+            if number >= base:
+                self._replay(self._segment_path(number), state)
+        return state
+
+    def reset(self):
+        """
+        Start an empty log, for a fresh crawl in a directory an earlier one checkpointed to. The earlier
+        snapshots and segments are moved to previous/ (replacing the generation before them), so a crawl
+        restarted without resume by mistake can still be recovered with CheckpointLog(<dir>/previous).
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            snapshots, segments = self._numbered(self.SNAPSHOT_RE), self._numbered(self.SEGMENT_RE)
+            if snapshots or segments:
+                previous = os.path.join(self.directory, 'previous')
+                if os.path.isdir(previous):
+                    for name in os.listdir(previous):
+                        os.remove(os.path.join(previous, name))
+                os.makedirs(previous, exist_ok=True)
+                for path in [self._snapshot_path(n) for n in snapshots] + [self._segment_path(n) for n in segments]:
+                    os.replace(path, os.path.join(previous, os.path.basename(path)))
+                logging.info(f"Moved the earlier checkpoint to {previous}")
+            self.events_in_segment = 0
+            self.segment_number = 1
+
+    @staticmethod
+    def _replay(path, state):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Ignoring torn checkpoint record in {path}")
+                    break
+                state.apply(event)
+
+    def append(self, *event):
+        with self.lock:
+            if self.file is None:
+                self.file = open(self._segment_path(self.segment_number), 'a', encoding='utf-8')
+            self.file.write(json.dumps(event) + '\n')
+            self.events_in_segment += 1
+
+    def flush(self):
+        """Push buffered events to the OS, start a background compaction when the segment is full."""
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            if self.events_in_segment < self.segment_events:
+                return
+            if self.compactor and self.compactor.is_alive():
+                return  # Keep appending, the next flush retries
+            self.file.close()
+            self.file = None
+            self.events_in_segment = 0
+            upto = self.segment_number + 1
+            self.segment_number = upto
+        self.compactor = threading.Thread(target=self.compact, args=(upto,), daemon=True)
+        self.compactor.start()
+
+    def compact(self, upto):
+        """Fold every snapshot/segment below `upto` into snapshot_<upto>.pkl and delete what it replaces."""
+        start = time.time()
+        snapshots = [n for n in self._numbered(self.SNAPSHOT_RE) if n < upto]
+        segments = [n for n in self._numbered(self.SEGMENT_RE) if n < upto]
+        state = CrawlState()
+        if snapshots:
+            with open(self._snapshot_path(snapshots[-1]), 'rb') as f:
+                state = pickle.load(f)
+        for number in segments:
+            if not snapshots or number >= snapshots[-1]:
+                self._replay(self._segment_path(number), state)
+        tmp_path = self._snapshot_path(upto) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, self._snapshot_path(upto))
+        for number in snapshots:
+            os.remove(self._snapshot_path(number))
+        for number in segments:
+            os.remove(self._segment_path(number))
+        logging.info(f"Checkpoint snapshot {upto} written in {time.time() - start:.1f}s")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        if self.compactor:
+            self.compactor.join()
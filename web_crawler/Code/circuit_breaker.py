@@ -0,0 +1,97 @@
+import time
+from threading import Lock
+
+
+class HostCircuit:
+    __slots__ = ('failures', 'trips', 'open_until', 'dead')
+
+    def __init__(self):
+        self.failures = 0  # Consecutive timeouts / connection errors
+        self.trips = 0  # Times the circuit opened since the host last answered
+        self.open_until = 0.0
+        self.dead = False
+
+
+class HostCircuitBreaker:
+    """
+    Per-host circuit breaker. `failure_threshold` consecutive timeouts or connection errors open the
+    host's circuit: the host is parked for `base_park` seconds, doubling on each further trip up to
+    `max_park`. When the park runs out the next url is a probe; if it fails too the circuit opens again
+    straight away, if it succeeds the host is healthy again. A host that trips more than `max_trips`
+    times in a row is dead and its urls should be dropped. Counted in `metrics` as circuit_trips and
+    circuit_dead_hosts. Thread safe.
+    """
+
+    def __init__(self, failure_threshold=5, base_park=30.0, max_park=1800.0, max_trips=4, metrics=None):
+        self.failure_threshold = failure_threshold
+        self.base_park = base_park
+        self.max_park = max_park
+        self.max_trips = max_trips
+        self.metrics = metrics
+        self.hosts = {}
+        self.lock = Lock()
+
+    def record_success(self, host):
+        with self.lock:
+            circuit = self.hosts.pop(host, None)
+        if circuit is not None and circuit.trips and self.metrics is not None:
+            self.metrics.count('circuit_recoveries')
+
+    def record_failure(self, host):
+        """A timeout or connection error talking to `host`. Returns True if this opened its circuit."""
+        now = time.time()
+        with self.lock:
+            circuit = self.hosts.get(host)
+            if circuit is None:
+                circuit = self.hosts[host] = HostCircuit()
+            if circuit.dead:
+                return False
+            circuit.failures += 1
+            probe_failed = circuit.trips and now >= circuit.open_until
+            if circuit.failures < self.failure_threshold and not probe_failed:
+                return False
+            circuit.failures = 0
+            circuit.trips += 1
+            if circuit.trips > self.max_trips:
+                circuit.dead = True
+            else:
+                circuit.open_until = now + min(self.base_park * 2 ** (circuit.trips - 1), self.max_park)
+        if self.metrics is not None:
+            self.metrics.count('circuit_dead_hosts' if circuit.dead else 'circuit_trips')
+        return True
+
+    def park_remaining(self, host):
+        """Seconds the host's circuit stays open, 0 if it is closed."""
+        circuit = self.hosts.get(host)
+        if circuit is None or circuit.dead:
+            return 0
+        return max(circuit.open_until - time.time(), 0)
+
+    def is_dead(self, host):
+        circuit = self.hosts.get(host)
+        return circuit is not None and circuit.dead
+
+    def open_count(self):
+        now = time.time()
+        with self.lock:
+            return sum(1 for circuit in self.hosts.values() if not circuit.dead and circuit.open_until > now)
+
+    def dead_count(self):
+        with self.lock:
+            return sum(1 for circuit in self.hosts.values() if circuit.dead)
+
+    def snapshot(self, top=20):
+        """Open and dead hosts for the crawl stats, each with its trip count and seconds left open."""
+        now = time.time()
+        with self.lock:
+            items = list(self.hosts.items())
+        open_hosts = sorted(((host, circuit) for host, circuit in items if not circuit.dead and circuit.open_until > now),
+                            key=lambda item: item[1].open_until, reverse=True)
+        dead = [host for host, circuit in items if circuit.dead]
+        return {
+            "open": {host: {"trips": circuit.trips, "seconds_left": round(circuit.open_until - now, 1)}
+                     for host, circuit in open_hosts[:top]},
+            "open_hosts": len(open_hosts),
+            "dead": dead[:top],
+            "dead_hosts": len(dead),
+        }
@@ -1,41 +1,94 @@
-from bs4 import BeautifulSoup
-import requests, time, heapq, logging, os
+import argparse, requests, time, heapq, logging, os
 from fake_useragent import UserAgent
-from urllib.parse import urljoin, urlparse, urlunparse, unquote
-from urllib.robotparser import RobotFileParser
-from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse, urlunparse, unquote
 from urllib3.util import Retry
-from threading import Lock
+from threading import Event, Lock, Thread
 from concurrent.futures import ThreadPoolExecutor
+from mercator_frontier import MercatorFrontier
+from disk_frontier import DiskSpillingFrontier
+from seen_urls import make_seen_store
+from robots_cache import RobotsCache, session_fetcher
+from html_parse import parse_html
+from near_dup import NearDuplicateDetector
+from recrawl import HeaderIndex, content_hash
+from doc_store import SegmentedDocStore
+from link_graph import LinkGraphBuilder
+from telemetry import CrawlMetrics
+from url_filter import UrlFilter, LinkNormalizer
+from url_traps import TrapDetector
+from dns_cache import shared_cache
+from stream_fetch import stream_get, DEFAULT_MAX_BYTES, DEFAULT_DEADLINE
+from http_pool import make_session
+from checkpoint_log import CheckpointLog
+from host_rate import RateController
+from circuit_breaker import HostCircuitBreaker
+
+BLOCK_LIST = [".gif", ".svg", ".dmg", "search", ".webm", ".mov", "sidebar", ".xls", ".ogv", "tel:", "musiclearningsite", ".gz", "www.vatican.va", "avery.wellesley.edu", "caboodle.studio", "xlsx", "special", "mailto", "solidarityeconomy", "edit", "javascript", ".mp3", "amazon", ".jpg", ".mp4", "youtube", ".pptx", ".pdf", ".bin", "video", "cite", "footer", ".avi", ".png", ".zip", "books.google", ".exe", ".rar", ".ppt", ".7z"]
+
 
 class Frontier:
-    def __init__(self, keywords):
-        self.queue = []
+    def __init__(self, keywords, num_back_queues=32, spill_dir=None, max_in_memory=200000, metrics=None, politeness_delay=1.0,
+                 group_of=None):
+        # Priority front queue + per-host back queues, the front spills to disk when spill_dir is given.
+        # With group_of the back queues are per politeness group (server IP) instead of per host
+        front_queue = DiskSpillingFrontier(spill_dir, max_in_memory=max_in_memory) if spill_dir else None
+        self.queue = MercatorFrontier(num_back_queues, politeness_delay=politeness_delay, front_queue=front_queue, group_of=group_of)
         self.keywords = keywords  # List of keywords to prioritize
         self.lock = Lock()  # Ensure thread safety
         # Additional attributes for tracking links
         self.url_info = {}  # Stores metadata for each URL, including in-links and out-links
+        self.link_graph = LinkGraphBuilder()  # Whole-crawl graph as integer ids, saved as link_graph.bin
+        self.metrics = metrics if metrics is not None else CrawlMetrics()  # Per-host queue depth
+        self.checkpoint = None  # CheckpointLog that queued urls and links are logged to, set by the Crawler
     
     def add_url(self, url, wave_number, anchor_text="", is_seed=False, discovered_from=None):
         relevance = self.calculate_relevance(url, anchor_text)
         priority = self.calculate_priority(is_seed, relevance, wave_number)
 
-        # Initialize url_info entry if this is the first encounter
-        if url not in self.url_info:
-            self.url_info[url] = {"in_links": set(), "out_links": set(), "is_seed": is_seed}
-            
-        # If the URL was discovered from another page, update the link information
-        if discovered_from:
-            self.url_info[url]["in_links"].add(discovered_from)
-            self.url_info[discovered_from]["out_links"].add(url)
-            priority = self.calculate_priority(is_seed, relevance, wave_number, len(self.url_info[url]["in_links"]))
-        
+        with self.lock:
+            # Initialize url_info entry if this is the first encounter
+            if url not in self.url_info:
+                self.url_info[url] = {"in_links": set(), "out_links": set(), "is_seed": is_seed}
+
+            # If the URL was discovered from another page, update the link information
+            if discovered_from:
+                self.url_info[url]["in_links"].add(discovered_from)
+                # In a sharded crawl the linking page may belong to another worker
+                self.url_info.setdefault(discovered_from, {"in_links": set(), "out_links": set(), "is_seed": False})["out_links"].add(url)
+                self.link_graph.add_edge(discovered_from, url)
+                priority = self.calculate_priority(is_seed, relevance, wave_number, len(self.url_info[url]["in_links"]))
+
+        if self.checkpoint:
+            if discovered_from:
+                self.checkpoint.append('edge', discovered_from, url)
+            self.checkpoint.append('queue', url, priority)
         # Update in-link count for priority calculation based on the number of unique in-links
         # in_link_count = len(self.url_info[url]["in_links"])
-        entry = (priority, url)
-        heapq.heappush(self.queue, entry)
+        if self.queue.add(url, priority):
+            self.metrics.queued(self.queue.host_of(url))
             
     
+    def add_out_link(self, url, target):
+        """Record a link whose target is queued elsewhere (another shard of a sharded crawl)."""
+        with self.lock:
+            self.url_info.setdefault(url, {"in_links": set(), "out_links": set(), "is_seed": False})["out_links"].add(target)
+            self.link_graph.add_edge(url, target)
+        if self.checkpoint:
+            self.checkpoint.append('edge', url, target)
+
+    def restore(self, state):
+        """Refill queue, url_info and link graph from a checkpoint_log.CrawlState."""
+        with self.lock:
+            for src, targets in state.out_links.items():
+                self.url_info.setdefault(src, {"in_links": set(), "out_links": set(), "is_seed": False})["out_links"].update(targets)
+                for dst in targets:
+                    self.url_info.setdefault(dst, {"in_links": set(), "out_links": set(), "is_seed": False})["in_links"].add(src)
+                    self.link_graph.add_edge(src, dst)
+        for url, priority in state.queued.items():
+            self.url_info.setdefault(url, {"in_links": set(), "out_links": set(), "is_seed": False})
+            self.queue.add(url, priority)
+            self.metrics.queued(self.queue.host_of(url))
+
     def calculate_relevance(self, url, anchor_text):
         relevance_score = 0
         for keyword in self.keywords:
@@ -49,46 +102,82 @@ class Frontier:
             priority -= 10000  # Ensure seed URLs have the highest priority
         return priority
 
-    def get_next_url(self, last_crawled_domain=None):
-        with self.lock:
-            if not self.queue:
-                return None
-            
-            # Attempt to find the next URL from a different domain
-            for index, (_, url) in enumerate(self.queue):
-                domain = urlparse(url).netloc
-                if domain != last_crawled_domain:
-                    # Found a URL from a different domain, remove and return it
-                    return self.queue.pop(index)[1]
-            
-            # If all URLs are from the same domain or no different domain found, return the top URL
-            return heapq.heappop(self.queue)[1] if self.queue else None
+    def get_next_url(self, timeout=None):
+        """Block until some host is allowed to be fetched and return (url, domain), or None once the frontier is drained (or on timeout)."""
+        entry = self.queue.get(timeout)
+        if entry:
+            self.metrics.dequeued(self.queue.host_of(entry[0]))
+        return entry
+
+    def release_domain(self, domain, delay=None, fetched=True, park=False):
+        """Hand the domain back to the frontier after fetching, it becomes eligible again after `delay` (at least the politeness delay)."""
+        self.queue.release(domain, delay, fetched, park)
+
+    def drop_domain(self, domain):
+        """Discard the domain's queued urls and any added later (its back queue still needs release_domain). Returns how many were discarded from its back queue."""
+        dropped = self.queue.drop(domain)
+        self.metrics.forget_host(domain)
+        return dropped
     
 class Crawler:
-    def __init__(self, seed_urls, max_documents, output_dir, keywords):
-        self.frontier = Frontier(keywords)
-        self.visited_urls = set()
+    def __init__(self, seed_urls, max_documents, output_dir, keywords, max_frontier_in_memory=None, seen_store='set', html_parser='stream', use_doc_store=False, metrics_port=None,
+                 max_body_bytes=DEFAULT_MAX_BYTES, fetch_deadline=DEFAULT_DEADLINE, per_host_connections=4,
+                 checkpoint=True, checkpoint_interval=10, min_host_delay=0.25, max_host_delay=60.0,
+                 breaker_failures=5, breaker_park=30.0, breaker_max_trips=4, ip_politeness=False, resume=False):
+        self.html_parser = html_parser  # 'stream', 'lxml' or 'bs4', see html_parse.parse_html
+        # Fetches stop at the headers for non-HTML, and give up past max_body_bytes or fetch_deadline seconds
+        self.max_body_bytes = max_body_bytes
+        self.fetch_deadline = fetch_deadline
+        # Written to output_dir/crawl_metrics.json every 10s, and served on /metrics when metrics_port is set
+        self.metrics = CrawlMetrics('craw_new')
+        self.metrics_port = metrics_port
+        # With max_frontier_in_memory set, frontier overflow is spilled to output_dir/frontier
+        spill_dir = os.path.join(output_dir, "frontier") if max_frontier_in_memory else None
+        # Per-host delay from response time and 429/5xx errors, between min_host_delay and max_host_delay and
+        # never under robots crawl-delay; the frontier schedules each host's next fetch with it
+        self.rate = RateController(min_delay=min_host_delay, max_delay=max_host_delay)
+        self.metrics.gauge('backed_off_hosts', self.rate.backed_off_hosts)
+        # Process-wide DNS cache, hosts are resolved in the background when first enqueued and the session
+        # connects to the cached addresses. With ip_politeness virtual hosts on one server share a back queue,
+        # so one fetch at a time and one delay; rates, circuit breakers and drops stay per host
+        self.dns = shared_cache(metrics=self.metrics)
+        self.frontier = Frontier(keywords, spill_dir=spill_dir, max_in_memory=max_frontier_in_memory, metrics=self.metrics,
+                                 politeness_delay=min_host_delay, group_of=self.dns.group_of if ip_politeness else None)
+        # breaker_failures timeouts / connection errors in a row park a host for breaker_park seconds, doubling
+        # per trip; past breaker_max_trips its urls are dropped. State is in crawl_metrics.json
+        self.breaker = HostCircuitBreaker(breaker_failures, base_park=breaker_park, max_trips=breaker_max_trips, metrics=self.metrics)
+        self.metrics.gauge('open_circuits', self.breaker.open_count)
+        self.metrics.gauge('dead_hosts', self.breaker.dead_count)
+        self.metrics.report('circuit_breaker', self.breaker.snapshot)
+        self.visited_urls = make_seen_store(seen_store)  # 'set', 'bloom' or 'fingerprint'
         self.max_documents = max_documents
         self.documents_crawled = 0
+        self.near_duplicates = NearDuplicateDetector()  # .duplicates counts mirror/archive copies not written
         self.output_dir = output_dir
-        self.last_crawled_domain = None
         self.num_threads = os.cpu_count()
         self.wavenumber = 0
         self.lock = Lock()
-        self.block_list = [".gif", ".svg", ".dmg", "search", ".webm", ".mov", "sidebar", ".xls", ".ogv", "tel:", "musiclearningsite", ".gz", "www.vatican.va", "avery.wellesley.edu", "caboodle.studio", "xlsx", "special", "mailto", "solidarityeconomy", "edit", "javascript", ".mp3", "amazon", ".jpg", ".mp4", "youtube", ".pptx", ".pdf", ".bin", "video", "cite", "footer", ".avi", ".png", ".zip", "books.google", ".exe", ".rar", ".ppt", ".7z"]
+        self.block_list = list(BLOCK_LIST)
+        # Calendars, repeating paths and other endless url spaces are capped per pattern before the frontier
+        self.traps = TrapDetector(metrics=self.metrics)
+        self.metrics.report('traps', self.traps.snapshot)
+        # Block list compiled into one regex, canonical forms memoized across pages
+        self.link_normalizer = LinkNormalizer(self.canonicalize_url, UrlFilter(self.block_list, ignore_case=True), traps=self.traps)
 
-        self.robots_parsers = {}
         self.user_agent = UserAgent().random
-        self.session = requests.Session()  # Use session for persistent connections
+        # Timeouts and connection errors aren't retried here: each one counts towards the host's circuit breaker
         retry_strategy = Retry(
                 total=2,
+                connect=0,
+                read=0,
                 status_forcelist=[429, 500, 502, 503, 504],
                 allowed_methods=["HEAD", "GET", "OPTIONS"],
                 backoff_factor=0.5
             )
-        self.session.mount('http://', HTTPAdapter(max_retries=retry_strategy))
-        self.session.mount('https://', HTTPAdapter(max_retries=retry_strategy))
-        self.session.headers.update({'User-Agent': self.user_agent})
+        # Keep-alive pool per host, at most per_host_connections to each, pool hits/misses in the metrics
+        self.session = make_session(self.user_agent, retry_strategy, per_host=per_host_connections, metrics=self.metrics, resolver=self.dns)
+        # Shared robots.txt cache, fetched through the session and kept across runs
+        self.robots = RobotsCache(fetch=session_fetcher(self.session), cache_path=os.path.join(output_dir, "robots_cache.json"))
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
@@ -101,73 +190,240 @@ class Crawler:
         if not os.path.exists(output_dir + "/headers"):
             os.makedirs(output_dir + "/headers")
 
+        # With use_doc_store, documents, headers and links go to segment files in output_dir/doc_store
+        # instead of three small files per page
+        self.doc_store = SegmentedDocStore(os.path.join(output_dir, "doc_store")) if use_doc_store else None
+
+        # Frontier, visited urls, links, document numbers and header index entries are logged to
+        # output_dir/checkpoint as they change; a background thread flushes the log every checkpoint_interval
+        # seconds and closed segments are compacted into snapshots. With resume, a crawler created on the same
+        # output_dir picks up from it; otherwise an earlier crawl's checkpoint is moved to checkpoint/previous
+        # (recrawl() relies on that, a restored budget and frontier would end the refresh before it starts).
+        self.checkpoint = CheckpointLog(os.path.join(output_dir, "checkpoint")) if checkpoint else None
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_stop = Event()
+        state = self.checkpoint.recover() if self.checkpoint and resume else None
+        if self.checkpoint and not resume:
+            self.checkpoint.reset()
+        self.frontier.checkpoint = self.checkpoint
+
+        # Per-url ETag/Last-Modified and revisit schedule, used by recrawl()
+        self.header_index = HeaderIndex.load_or_build(output_dir, rebuild=state is None)
+        if self.checkpoint:
+            self.header_index.on_update = lambda url, entry: self.checkpoint.append('put', 'headers', url, entry)
+        self.refresh_mode = False
+
+        if state is not None:
+            self.restore_checkpoint(state)
         for url in seed_urls:
+            if state is not None and self.remove_http_protocol(url).lower() in self.visited_urls:
+                continue
+            self.prefetch_host(url)
             self.frontier.add_url(url, self.wavenumber, is_seed=True)
 
+    def restore_checkpoint(self, state):
+        started = time.time()
+        if self.frontier.queue.group_of:
+            # Queuing waits on each new host's politeness group, resolve the hosts in parallel first
+            for hostname in {urlparse(url).hostname for url in state.queued}:
+                self.dns.prefetch(hostname or '')
+        self.frontier.restore(state)
+        for key in state.visited:
+            self.visited_urls.add(key)
+        self.documents_crawled = state.extra.get('documents_crawled', 0)
+        self.wavenumber = state.extra.get('wavenumber', 0)
+        self.header_index.entries.update(state.tables.get('headers', {}))
+        logging.info(f"Resumed from checkpoint in {time.time() - started:.1f}s: {self.documents_crawled} documents, "
+                     f"{len(state.visited)} visited, {len(state.queued)} queued urls")
+
+    def checkpoint_loop(self):
+        """Background thread: make the logged events durable every checkpoint_interval seconds, workers never wait on it."""
+        while not self.checkpoint_stop.wait(self.checkpoint_interval):
+            self.save_checkpoint()
+
+    def save_checkpoint(self):
+        self.checkpoint.append('set', 'wavenumber', self.wavenumber)
+        self.checkpoint.flush()  # Starts a background compaction once the segment is full
+        self.robots.save()
+        if self.doc_store is not None:
+            self.doc_store.flush()
+
     def start_crawling(self):
+        self.metrics.start(os.path.join(self.output_dir, "crawl_metrics.json"), port=self.metrics_port)
+        if self.checkpoint:
+            self.checkpoint_stop.clear()
+            checkpointer = Thread(target=self.checkpoint_loop, daemon=True)
+            checkpointer.start()
+        self.crawl_threads()
+        if self.checkpoint:
+            self.checkpoint_stop.set()
+            checkpointer.join()
+            self.save_checkpoint()
+            self.checkpoint.close()
+        self.robots.save()
+        self.header_index.save()
+        if not self.refresh_mode:
+            self.frontier.link_graph.save(os.path.join(self.output_dir, "link_graph.bin"))
+        if self.doc_store is not None:
+            self.doc_store.flush()
+        self.metrics.stop()
+        logging.info(f"Crawl metrics: {self.metrics.summary()}")
+        logging.info(f"Connection pool: {self.session.pool_stats.snapshot()}")
+        logging.info(f"Host rates: {self.rate.snapshot()}")
+        logging.info(f"Trap urls suppressed: {self.traps.snapshot()}")
+
+    def crawl_threads(self):
+        """Run the crawl threads until the budget is used up or the frontier is drained."""
         with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
             futures = [executor.submit(self.crawl) for _ in range(self.num_threads)]
             for future in futures:
                 future.result()  # Wait for all threads to complete
 
-    def crawl(self):
-        while True:
-            current_url = self.frontier.get_next_url(self.last_crawled_domain)
-            if not current_url or self.documents_crawled >= self.max_documents:
-                break  # Exit if no URLs left or max documents reached
-            
-            domain = urlparse(current_url).netloc
-            protocol = urlparse(current_url).scheme
+    def recrawl(self, max_urls=None):
+        """
+        Incremental refresh of an earlier crawl in output_dir: revisit the urls that are due with
+        If-None-Match / If-Modified-Since. A 304 or an unchanged text is neither parsed further nor rewritten,
+        changed pages overwrite their existing document number, and every revisit reschedules the url by
+        its observed change rate. Create the Crawler with no seed urls for a pure refresh.
+        """
+        self.refresh_mode = True
+        for url in self.header_index.due_urls()[:max_urls]:
+            self.prefetch_host(url)
+            self.frontier.add_url(url, self.wavenumber, is_seed=True)
+        self.start_crawling()
+        logging.info(f"Re-crawl finished: {self.header_index.not_modified} not modified, {self.header_index.changed} changed")
 
-            if not domain or current_url in self.visited_urls or domain.isdigit():
-                continue
+    def done(self):
+        return self.documents_crawled >= self.max_documents
 
-            # Check robots.txt
-            if domain not in self.robots_parsers:
-                self.initialize_robots_parser(protocol, domain)
-            if domain in self.robots_parsers and not self.robots_parsers[domain].can_fetch(self.user_agent, current_url):
-                continue
-            
-            if domain == self.last_crawled_domain:
-                if self.robots_parsers[domain].crawl_delay(self.user_agent):
-                    time.sleep(self.robots_parsers[domain].crawl_delay(self.user_agent))
+    def next_url(self):
+        return self.frontier.get_next_url()
+
+    def next_document_number(self):
+        """Called with self.lock held."""
+        self.documents_crawled += 1
+        return self.documents_crawled
+
+    def prefetch_host(self, url):
+        """Warm robots.txt and DNS for the url's host before it is dequeued."""
+        self.robots.prefetch(url)
+        self.dns.prefetch(urlparse(url).hostname or '')
 
-            self.last_crawled_domain = domain
-            logging.info(f"Processing URL: {current_url} {self.documents_crawled}/{self.max_documents} {format(self.documents_crawled / self.max_documents * 100, '.2f')}%")
+    def enqueue_link(self, link, anchor_text, discovered_from):
+        self.prefetch_host(link)
+        self.frontier.add_url(link, self.wavenumber, anchor_text=anchor_text, discovered_from=discovered_from)
+
+    def crawl(self):
+        while True:
+            with self.metrics.timer('politeness_wait_seconds'):
+                next_entry = self.next_url()  # Blocks until some host's politeness delay has passed
+            if not next_entry:
+                break  # Exit if no URLs left
+            current_url, domain = next_entry
+            if self.done():
+                # Max documents reached, hand the checked out host back so other threads don't wait on it
+                self.release_host(current_url, domain, False)
+                break
+            fetched = False
             try:
-                response = self.session.get(current_url, timeout=5)
-                if response.status_code == 200 and self.is_html(response):
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    links = self.extract_links(soup, current_url)
-                    curr_low_link = self.remove_http_protocol(current_url).lower()
-                    for link, anchor_text in links:
-                        canonical_link = self.canonicalize_url(link)
-                        # Add link to frontier with discovered_from information
-                        can_low_link = self.remove_http_protocol(canonical_link).lower()
-                        if can_low_link not in self.visited_urls and not any(substring in can_low_link for substring in self.block_list) and can_low_link != curr_low_link:
-                            self.frontier.add_url(canonical_link, self.wavenumber,anchor_text=anchor_text, discovered_from=current_url)
-
-                    self.process_document(response, current_url)
-            except requests.RequestException as e:
-                print(f"Request failed for {current_url}: {e}")
-
-            with self.lock:
-                self.wavenumber += 1
-                
-    def initialize_robots_parser(self, protocol, domain):
-        robots_url = f"{protocol}://{domain}/robots.txt"
-        robots_parser = RobotFileParser()
+                fetched = self.crawl_url(current_url, domain)
+            finally:
+                self.release_host(current_url, domain, fetched)
+            self.url_done(current_url)
+
+    def release_host(self, current_url, domain, fetched):
+        """
+        Hand the back queue `domain` (the host, or its politeness group) back to the frontier: parked while
+        the host's circuit is open, the host's urls dropped once it is dead, else after the host's rate delay.
+        """
+        host = urlparse(current_url).netloc
+        if self.breaker.is_dead(host):
+            dropped = self.frontier.drop_domain(host)
+            self.metrics.count('circuit_dropped_urls', dropped)
+            logging.warning(f"Dropping {host}: no answer after {self.breaker.max_trips} circuit breaker trips, {dropped} queued urls discarded")
+        parked_for = self.breaker.park_remaining(host)
+        if parked_for:
+            self.frontier.release_domain(domain, parked_for, fetched, park=True)
+        else:
+            self.frontier.release_domain(domain, self.rate.delay(host, self.robots.crawl_delay(current_url, self.user_agent)), fetched)
+
+    def url_done(self, url):
+        """The url is off the frontier for good. Logged only once its page is handled, so a crash refetches it."""
+        if self.checkpoint:
+            self.checkpoint.append('pop', url)
+
+    def crawl_url(self, current_url, domain):
+        """Fetch and process one URL. Returns False if it was skipped without touching the host."""
+        if not self.should_fetch(current_url, urlparse(current_url).netloc):
+            return False
+        response = self.fetch(current_url)
+        if response is not None:
+            # Parse once, the same page feeds link extraction and process_document
+            with self.metrics.timer('parse_seconds'):
+                page = parse_html(response.text, parser=self.html_parser, skip_tags=("script", "style", "header"))
+            self.enqueue_links(current_url, page)
+            self.handle_page(current_url, response, page)
+        with self.lock:
+            self.wavenumber += 1
+        return True
+
+    def should_fetch(self, current_url, domain):
+        # visited_urls holds lowercased urls without the protocol, see process_document
+        if not domain or self.remove_http_protocol(current_url).lower() in self.visited_urls or domain.isdigit():
+            return False
+        return self.robots.can_fetch(current_url, self.user_agent)
+
+    def fetch(self, current_url):
+        """GET the url; returns the response if it is an HTML page to parse, None otherwise."""
+        logging.info(f"Processing URL: {current_url} {self.documents_crawled}/{self.max_documents} {format(self.documents_crawled / self.max_documents * 100, '.2f')}% (near-duplicates skipped: {self.near_duplicates.duplicates})")
         try:
-            response = self.session.get(robots_url, timeout=5)
-            response.encoding = 'utf-8'
-            robots_parser.parse(response.text.splitlines())
+            request_headers = self.header_index.conditional_headers(current_url) if self.refresh_mode else None
+            started = time.perf_counter()
+            with self.metrics.timer('fetch_seconds'):
+                response = stream_get(self.session, current_url, timeout=5, headers=request_headers,
+                                      max_bytes=self.max_body_bytes, deadline=self.fetch_deadline)
         except requests.RequestException as e:
-            print(f"Could not fetch or parse robots.txt for {robots_url}: {e}")
-            # Instead of setting to None, set a default parser that allows everything
-            robots_parser = RobotFileParser()
-            robots_parser.parse("User-agent: *\nDisallow:")  # This effectively allows all agents
-        with self.lock:
-            self.robots_parsers[domain] = robots_parser
+            host = urlparse(current_url).netloc
+            self.rate.record(host, time.perf_counter() - started)
+            if isinstance(e, (requests.ConnectionError, requests.Timeout)) and self.breaker.record_failure(host) and not self.breaker.is_dead(host):
+                logging.warning(f"Circuit open for {host} after repeated timeouts or connection errors, parked for {self.breaker.park_remaining(host):.1f}s")
+            self.metrics.record_error()
+            print(f"Request failed for {current_url}: {e}")
+            return None
+        host = urlparse(current_url).netloc
+        self.rate.record(host, time.perf_counter() - started, response.status_code, response.headers.get('Retry-After'))
+        if response.skipped == 'deadline':
+            self.breaker.record_failure(host)  # A host too slow to send a page in fetch_deadline is as good as down
+        else:
+            self.breaker.record_success(host)
+        self.metrics.record_response(response.status_code, response.bytes_read)
+        if response.skipped:
+            self.metrics.record_error(f"skipped_{response.skipped}")
+            logging.info(f"Skipped body of {current_url}: {response.skipped}")
+        elif response.status_code == 304:
+            # Unchanged since the stored copy, nothing to parse or write
+            self.header_index.record_revisit(current_url, changed=False)
+        elif response.status_code == 200 and self.is_html(response):
+            return response
+        return None
+
+    def enqueue_links(self, current_url, page):
+        if self.refresh_mode:
+            return  # A refresh revisits known urls only
+        curr_low_link = self.remove_http_protocol(current_url).lower()
+        for canonical_link, anchor_text in self.link_normalizer.normalize(current_url, page.links):
+            # Add link to frontier with discovered_from information
+            can_low_link = self.remove_http_protocol(canonical_link).lower()
+            if can_low_link not in self.visited_urls and can_low_link != curr_low_link:
+                self.enqueue_link(canonical_link, anchor_text, current_url)
+
+    def handle_page(self, current_url, response, page):
+        if self.refresh_mode:
+            changed = self.header_index.is_changed(current_url, page.text)
+            self.header_index.record_revisit(current_url, changed)
+            if not changed:
+                return
+        self.process_document(response, current_url, page)
 
     @staticmethod
     def canonicalize_url(url):
@@ -202,66 +458,99 @@ class Crawler:
 
         return canonical_url.rstrip('/')
 
-    @staticmethod
-    def extract_links(soup, base_url):
-        links = []
-        for a in soup.find_all('a', href=True):
-            url = a['href']
-            if not url.startswith('http'):
-                url = urljoin(base_url, a['href'])
-            anchor_text = a.text
-            links.append((url, anchor_text))
-        return links
-    
     @staticmethod
     def is_html(response):
         content_type = response.headers.get('Content-Type', '')
         return 'text/html' in content_type
 
-    def process_document(self, response, current_url):
-        soup = BeautifulSoup(response.text, 'html.parser')
-       
-        # Remove script and style elements
-        for data in soup(["script", "style", "header"]):
-            # Remove tags
-            data.decompose()
-        
-        # Extract title
-        if soup.find('title'):
-            title = soup.find('title').text.strip()  
-        else:
+    def process_document(self, response, current_url, page):
+        # Script, style and header text was already left out by the parse stage
+        if page.title is None:
             return
-
-        text = ' '.join(soup.stripped_strings)
+        title = page.title
+        text = page.text
 
         without_url = self.remove_http_protocol(current_url).lower()
+        # Hash outside the lock; the duplicate lookup and indexing happen with the visited/budget decision below
+        fingerprint = self.near_duplicates.fingerprint(text) if text and not self.refresh_mode else None
 
         with self.lock: 
             if not text or without_url in self.visited_urls:
                 return
             
-            self.documents_crawled += 1
+            # A refreshed page overwrites its existing document number
+            doc_number = self.header_index.doc_number(current_url) if self.refresh_mode else None
+            if doc_number is None and self.done():
+                return  # Budget already used up by other workers, left unvisited so a resumed crawl fetches it
+            original_url = self.near_duplicates.check_and_add(current_url, text, fingerprint) if fingerprint is not None else None
             self.visited_urls.add(without_url)
+            if original_url:
+                # Near-duplicate of a stored document, record the alias instead of writing it again
+                with open(os.path.join(self.output_dir, "aliases.txt"), "a", encoding='utf-8') as f:
+                    f.write(f"{current_url}\t{original_url}\n")
+            elif doc_number is None:
+                doc_number = self.next_document_number()
+
+        if original_url:
+            self.metrics.count('near_duplicates')
+            if self.checkpoint:
+                self.checkpoint.append('visit', without_url)
+            return
+
+        with self.metrics.timer('write_seconds'):
+            self.write_document(response, current_url, doc_number, title, text)
+        if self.checkpoint:
+            self.checkpoint.append('document', without_url, doc_number)  # Only once the document is on disk
+        self.metrics.record_document()
+
+    def write_document(self, response, current_url, doc_number, title, text):
+        if self.doc_store is not None:
+            self.store_document(response, current_url, doc_number, title, text)
+            self.header_index.record_fetch(current_url, response.headers, doc_number, content_hash(text))
+            return
 
         # Format and save the document
         document_content = f"<DOC>\n<DOCNO>{current_url}</DOCNO>\n<HEAD>{title}</HEAD>\n<TEXT>{text}</TEXT>\n</DOC>"
-        document_filename = f"document_{self.documents_crawled}.txt"
+        document_filename = f"document_{doc_number}.txt"
         document_path = os.path.join(self.output_dir + "/documents", document_filename)
 
         with open(document_path, 'w', encoding='utf-8') as f:
             f.write(document_content)
         
         # Store the HTTP response headers
-        headers_path = os.path.join(self.output_dir + "/headers", f"headers_{self.documents_crawled}.txt")
+        headers_path = os.path.join(self.output_dir + "/headers", f"headers_{doc_number}.txt")
         with open(headers_path, 'w', encoding='utf-8') as f:
             f.write(str(response.headers))
+        self.header_index.record_fetch(current_url, response.headers, doc_number, content_hash(text))
+
+        if self.refresh_mode:
+            return  # Keep the link graph of the original crawl
 
-        with open(os.path.join(self.output_dir + "/links", f"links_graph_{self.documents_crawled}.txt"), "w", encoding='utf-8') as file:  # Open in append mode
+        with open(os.path.join(self.output_dir + "/links", f"links_graph_{doc_number}.txt"), "w", encoding='utf-8') as file:  # Open in append mode
             outlinks = self.frontier.url_info[current_url]["out_links"]
             inlinks = self.frontier.url_info[current_url]["in_links"]
             line = f"Inlinks:" + ' '.join(inlinks) + ", Outlinks:" + ' '.join(outlinks)
             file.write(line)
        
+    def store_document(self, response, current_url, doc_number, title, text):
+        if self.refresh_mode:
+            # Keep the link graph of the original crawl
+            previous = self.doc_store.get(current_url, {})
+            in_links, out_links = previous.get("in_links", []), previous.get("out_links", [])
+        else:
+            with self.frontier.lock:
+                in_links = list(self.frontier.url_info[current_url]["in_links"])
+                out_links = list(self.frontier.url_info[current_url]["out_links"])
+        self.doc_store.put(current_url, {
+            "docno": current_url,
+            "doc_number": doc_number,
+            "title": title,
+            "text": text,
+            "headers": dict(response.headers),
+            "in_links": in_links,
+            "out_links": out_links,
+        })
+
     def remove_http_protocol(self, url):
         return url.replace('http://', '').replace('https://', '')
 
@@ -283,6 +572,9 @@ if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
     logging.getLogger("urllib3").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description="Focused crawl from the Cold War seed urls.")
+    parser.add_argument('--resume', action='store_true', help="continue the crawl checkpointed in the output directory")
+    args = parser.parse_args()
     output_directory = './Results/'
     seed_urls = ["http://en.wikipedia.org/wiki/Cold_War",
         "http://www.historylearningsite.co.uk/coldwar.htm",
@@ -290,7 +582,7 @@ if __name__ == '__main__':
         "https://www.marxists.org/history/international/comintern/sino-soviet-split/"]
     keywords = [keyword.lower() for url in seed_urls for keyword in extract_keyword(url)]
     keywords = list(set(keywords))
-    crawler = Crawler(seed_urls, 100000, output_directory, keywords)
+    crawler = Crawler(seed_urls, 100000, output_directory, keywords, resume=args.resume)
     crawler.start_crawling()  # Starts the crawling process
 
 
@@ -1,19 +1,45 @@
-from collections import defaultdict
+import asyncio
 import os
-from queue import PriorityQueue
 import re
-from langdetect import detect
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse, urlunparse
-from urllib.robotparser import RobotFileParser
+from urllib.parse import urlparse, urlunparse
 import time
 import pickle
 import logging
 import hashlib
+import json
+import threading
+from async_fetch import AsyncFetcher
+from priority_frontier import IndexedPriorityQueue
+from disk_frontier import SpillingIndexedFrontier
+from seen_urls import make_seen_store, load_seen_store
+from checkpoint_log import CheckpointLog
+from robots_cache import RobotsCache, session_fetcher
+from html_parse import parse_html
+from lang_filter import LanguageFilter
+from near_dup import NearDuplicateDetector
+from doc_store import SegmentedDocStore
+from link_graph import LinkGraphBuilder
+from telemetry import CrawlMetrics
+from url_filter import UrlFilter, LinkNormalizer
+from url_traps import TrapDetector
+from dns_cache import shared_cache
+from stream_fetch import stream_get, DEFAULT_MAX_BYTES, DEFAULT_DEADLINE
+from http_pool import make_session
+from host_rate import RateController
 
 logging.basicConfig(filename='crawler.log', level=logging.INFO, format='%(asctime)s %(message)s')
 
+URL_BLACKLIST = [
+    ".jpg", ".svg", ".png", ".pdf", ".gif",
+    "youtube", "edit", "footer", "sidebar", "cite",
+    "special", "mailto", "books.google", "tel:",
+    "javascript", "www.vatican.va", ".ogv", "amazon",
+    ".webm", ".mp3", ".mp4", ".avi", ".mov",
+    ".zip", ".bin", ".dmg", ".pptx", ".xls", ".ppt", "xlsx"
+]
+
+
 class FrontierItem:
     preferred_domains = {'projects.iq.harvard.edu': 5, 'direct.mit.edu': 5, 'www.marxists.org': 10}
 
@@ -25,7 +51,6 @@ class FrontierItem:
         self.keyword_match = keyword_match
         self.score = 0
         self.is_seed = is_seed
-        self.is_valid = True
         self.in_link_count = in_link_count
         self.update_score()
         self.raw_html = raw_html
@@ -41,113 +66,176 @@ class FrontierItem:
     
     def update_score(self):
         self.score = self.get_score()
+
+    def priority(self):
+        """Frontier ordering key: highest cached score first, older items break ties."""
+        return (-self.score, self.timestamp)
     
     def __lt__(self, other):
-        if self.get_score() == other.get_score():
-            return self.timestamp < other.timestamp
-        return self.get_score() > other.get_score()
+        return self.priority() < other.priority()
     
+def encode_frontier_item(item):
+    return json.dumps([item.url, item.in_link_count, item.wave_number, item.timestamp, item.domain, item.keyword_match, item.is_seed])
+
+def decode_frontier_item(payload):
+    url, in_link_count, wave_number, timestamp, domain, keyword_match, is_seed = json.loads(payload)
+    return FrontierItem(url, in_link_count, wave_number, timestamp, domain, keyword_match, is_seed)
+
 def calculate_keyword_matches(text):
     keywords = ['sino-soviet', 'split', 'cold', 'international', 'international communist movement', 'prc', 'ussr', 'war', 'comintern', 'split', 'history']
     match_count = sum(keyword in text for keyword in keywords)
     return match_count
 
 class WebCrawler:
-    def __init__(self, seed_urls):
-        self.frontier = PriorityQueue()
-        self.visited_urls = set()
+    def __init__(self, seed_urls, max_frontier_in_memory=None, seen_store='set', checkpoint_mode='pickle', html_parser='stream', doc_store_dir=None, metrics_port=None,
+                 max_body_bytes=DEFAULT_MAX_BYTES, fetch_deadline=DEFAULT_DEADLINE, per_host_connections=4,
+                 min_host_delay=0.25, max_host_delay=60.0, ip_politeness=False):
+        self.html_parser = html_parser  # 'stream', 'lxml' or 'bs4', see html_parse.parse_html
+        # Fetches stop at the headers for non-HTML, and give up past max_body_bytes or fetch_deadline seconds
+        self.max_body_bytes = max_body_bytes
+        self.fetch_deadline = fetch_deadline
+        # Written to crawl_metrics.json every 10s, and served on /metrics when metrics_port is set
+        self.metrics = CrawlMetrics('web_crawler')
+        self.metrics_port = metrics_port
+        # With doc_store_dir set, documents are appended to a SegmentedDocStore instead of one ap89/ file each
+        self.doc_store = SegmentedDocStore(doc_store_dir) if doc_store_dir else None
+        self.language_filter = LanguageFilter('en')
+        self.near_duplicates = NearDuplicateDetector()
+        self.max_frontier_in_memory = max_frontier_in_memory
+        self.frontier = self.new_frontier()
+        self.seen_store = seen_store
+        self.visited_urls = make_seen_store(seen_store)  # 'bloom' / 'fingerprint' keep it compact at millions of urls
+        self.checkpoint = None
         self.crawled_count = 0
         self.last_request_time = {}
-        self.robot_parsers = {}
-        self.url_to_frontier_item = defaultdict(lambda: FrontierItem(url='', in_link_count=0))
-        self.in_links_dict = defaultdict(set)
-        self.out_links_dict = defaultdict(set)
+        # Async mode: results are handled on a worker thread while the event loop pops the frontier
+        self.state_lock = threading.Lock()
+        self.dispatched = set()  # Popped and handed to the fetcher, marked visited once handled
+        # Per-host spacing adapted to response time and 429/5xx errors, robots crawl-delay as the floor
+        self.rate = RateController(min_delay=min_host_delay, max_delay=max_host_delay)
+        self.metrics.gauge('backed_off_hosts', self.rate.backed_off_hosts)
+        # Process-wide DNS cache warmed on enqueue, connections go to its addresses. With ip_politeness the
+        # fetch spacing is per server IP (the host's group is pinned on first use), rates stay per host
+        self.dns = shared_cache(metrics=self.metrics)
+        self.ip_politeness = ip_politeness
+        self.host_groups = {}
+        # Keep-alive pool per host instead of a new connection per requests.get, robots.txt goes through it too
+        self.session = make_session(per_host=per_host_connections, metrics=self.metrics, resolver=self.dns)
+        self.robots = RobotsCache(fetch=session_fetcher(self.session), cache_path='robots_cache.json')
+        self.link_graph = LinkGraphBuilder()  # Interned url ids and edge arrays, saved as link_graph.bin
         for url in seed_urls:
             self.add_url_to_frontier(url, 0, is_seed=True)
+        # 'pickle' rewrites the full state every 200 pages, 'wal' appends events to checkpoint/ and compacts in the background
+        if checkpoint_mode == 'wal':
+            self.checkpoint = CheckpointLog('checkpoint')
         self.load_state()
 
-        self.url_blacklist = set([
-            ".jpg", ".svg", ".png", ".pdf", ".gif",
-            "youtube", "edit", "footer", "sidebar", "cite",
-            "special", "mailto", "books.google", "tel:",
-            "javascript", "www.vatican.va", ".ogv", "amazon",
-            ".webm", ".mp3", ".mp4", ".avi", ".mov",
-            ".zip", ".bin", ".dmg", ".pptx", ".xls", ".ppt", "xlsx"
-        ])
+        self.url_blacklist = set(URL_BLACKLIST)
+        # Block list compiled into one regex, canonical forms memoized across pages
+        self.url_filter = UrlFilter(self.url_blacklist)
+        # canonicalize_url keeps the query string, so session ids and facets would flood the frontier uncapped
+        self.traps = TrapDetector(metrics=self.metrics)
+        self.metrics.report('traps', self.traps.snapshot)
+        self.link_normalizer = LinkNormalizer(self.canonicalize_url, self.url_filter, self.is_valid_url, traps=self.traps)
         
+    def new_frontier(self):
+        """One entry per unique url, re-prioritized in place. With a memory budget the overflow spills to frontier_spill/."""
+        if self.max_frontier_in_memory:
+            return SpillingIndexedFrontier('frontier_spill', self.max_frontier_in_memory, encode_frontier_item, decode_frontier_item,
+                                           lambda item: item.url)
+        return IndexedPriorityQueue()
+
     def add_url_to_frontier(self, url, wave_number, keyword_match=0, is_seed=False):
-        existing_item = self.url_to_frontier_item.get(url)
+        existing_item = self.frontier.get(url)
+        if self.checkpoint:
+            self.checkpoint.append('push', url, wave_number, keyword_match, is_seed, time.time())
         if existing_item:
-            existing_item.is_valid = False 
-        in_link_count = existing_item.in_link_count + 1 if existing_item else 1
-        new_item = FrontierItem(url, in_link_count, wave_number, keyword_match, is_seed=is_seed)
-        new_item.update_score()
-        self.url_to_frontier_item[url] = new_item
-        self.frontier.put((-new_item.score, new_item))
-
-    def process_links_found(self, parent_item, soup, parent_url): 
-        """Process the links found in URLs"""
+            # Another in-link to a queued url, raise its priority in place
+            existing_item.in_link_count += 1
+            existing_item.keyword_match = max(existing_item.keyword_match, keyword_match)
+            existing_item.update_score()
+            self.frontier.update(url, existing_item.priority())
+            return
+        self.robots.prefetch(url)  # New url, warm robots.txt and DNS for its host before it is dequeued
+        self.dns.prefetch(urlparse(url).hostname or '')
+        new_item = FrontierItem(url, 1, wave_number, keyword_match=keyword_match, is_seed=is_seed)
+        self.frontier.push(url, new_item, new_item.priority())
+        self.metrics.queued(new_item.domain)
+
+    def process_links_found(self, parent_item, links, parent_url): 
+        """Process the (href, anchor text) links found in URLs"""
         wave_number = parent_item.wave_number + 1
-        for link in soup.find_all('a', href=True):
-            absolute_link = self.canonicalize_url(urljoin(parent_item.url, link['href']))
-            if self.is_valid_url(absolute_link) and absolute_link not in self.visited_urls and not any(keyword in absolute_link for keyword in self.url_blacklist):
-                keyword_match = calculate_keyword_matches(link.text)
-                self.add_url_to_frontier(absolute_link, wave_number, keyword_match)
-                self.in_links_dict[absolute_link].add(parent_url)
-                self.out_links_dict[parent_url].add(absolute_link)
-
-    def politeness_policy(self, domain):
+        links = list(self.link_normalizer.normalize(parent_item.url, links))
+        with self.state_lock:
+            for absolute_link, anchor_text in links:
+                if absolute_link not in self.visited_urls:
+                    keyword_match = calculate_keyword_matches(anchor_text)
+                    self.add_url_to_frontier(absolute_link, wave_number, keyword_match)
+                    self.link_graph.add_edge(parent_url, absolute_link)
+                    if self.checkpoint:
+                        self.checkpoint.append('edge', parent_url, absolute_link)
+
+    def politeness_group(self, host):
+        """Key the fetch spacing is kept under: the host, or with ip_politeness its server IP as of the host's first fetch."""
+        if not self.ip_politeness:
+            return host
+        group = self.host_groups.get(host)
+        if group is None:
+            group = self.host_groups[host] = self.dns.group_of(host)
+        return group
+
+    def politeness_policy(self, domain, url):
         current_time = time.time()
         if domain in self.last_request_time:
             time_since_last_request = current_time - self.last_request_time[domain]
-            if time_since_last_request < 1:
-                time.sleep(1 - time_since_last_request)
+            delay = self.rate.delay(urlparse(url).netloc, self.robots.crawl_delay(url))
+            if time_since_last_request < delay:
+                time.sleep(delay - time_since_last_request)
         self.last_request_time[domain] = time.time()
+        self.metrics.observe('politeness_wait_seconds', self.last_request_time[domain] - current_time)
         
     def robot_parser(self, url):
-        """Ensure robots.txt is fetched with a specific timeout. Setup and return a RobotFileParser for the given URL."""
-        parsed_url = urlparse(url)
-        domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        if domain not in self.robot_parsers:
-            robots_url = f"{domain}/robots.txt"
-            parser = RobotFileParser(robots_url)
-            try:
-                parser.read()
-            except Exception as e:
-                logging.error(f"Failed to fetch or parse {robots_url}: {e}")
-            self.robot_parsers[domain] = parser
-        return self.robot_parsers[domain]
+        """Return the RobotFileParser for the URL's domain from the shared robots cache (fetched with a timeout, prefetched on enqueue)."""
+        return self.robots.get_parser(url)
     
     def can_fetch(self, url):
         """Check if URL can be fetched according to robots.txt using domain's RobotFileParser"""
         parser = self.robot_parser(url)
-        return parser.can_fetch("*", url)
+        return parser is not None and parser.can_fetch("*", url)
     
-    def crawl(self):
+    def pop_frontier(self):
+        item = self.frontier.pop()
+        self.metrics.dequeued(item.domain)
+        if self.checkpoint:
+            self.checkpoint.append('pop', item.url)
+        return item
+
+    def mark_visited(self, url):
+        self.visited_urls.add(url)
+        if self.checkpoint:
+            self.checkpoint.append('visit', url)
+
+    def crawl(self, max_pages=40000):
         """Main craw method. Continues until a specific number of URLs processed. Loop throught URLs in frontier."""
-        while not self.frontier.empty() and self.crawled_count < 40000:  # Example limit for testing
-            _, current_item = self.frontier.get()
+        self.metrics.start('crawl_metrics.json', port=self.metrics_port)
+        while not self.frontier.empty() and self.crawled_count < max_pages:
+            current_item = self.pop_frontier()
             current_url = current_item.url
-            if current_url in self.visited_urls or any(keyword in current_url for keyword in self.url_blacklist):
+            if current_url in self.visited_urls or self.url_filter.matches(current_url):
                 continue
-            self.visited_urls.add(current_url)
+            self.mark_visited(current_url)
             if self.can_fetch(current_url):
                 self.process_url(current_item)
             if self.crawled_count % 200 == 0:
                 self.save_state()
             self.crawled_count += 1
             #logging.info(f"Crawled {self.crawled_count} Scored {current_item.score}: {current_url}")
+        self.finish()
         
-    def extract_text(self, soup):
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.decompose()
-        text = soup.get_text()
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        return text
-    
     def write_ap89_doc(self, docno, title, text):
+        if self.doc_store is not None:
+            self.doc_store.put(docno, {"docno": docno, "title": title, "text": text})
+            return
         filename_hash = hashlib.sha256(docno.encode('utf-8')).hexdigest()
         directory_path = 'ap89'
         file_path = os.path.join(directory_path, f"{filename_hash}.txt")
@@ -163,6 +251,10 @@ class WebCrawler:
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(document_formated)
 
+    def write_alias(self, url, original_url):
+        with open('aliases.txt', 'a', encoding='utf-8') as f:
+            f.write(f'{url}\t{original_url}\n')
+
     # def write_raw_html(self, url, raw_html):
     #     try:
     #         filename_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
@@ -178,33 +270,117 @@ class WebCrawler:
         """Process the content of URL, checked for visited, robots.txt, canonicalize, politeness."""
         url = frontier_item.url
         domain = urlparse(url).netloc
-        self.politeness_policy(domain)
+        self.politeness_policy(self.politeness_group(domain), url)
+        started = time.perf_counter()
         try:
-            response = requests.get(url, timeout=5)
-            if not response.content:
-                logging.info(f"No content returned for URL: {url}")
+            with self.metrics.timer('fetch_seconds'):
+                response = stream_get(self.session, url, timeout=5, max_bytes=self.max_body_bytes, deadline=self.fetch_deadline)
+            self.rate.record(domain, time.perf_counter() - started, response.status_code, response.headers.get('Retry-After'))
+            self.metrics.record_response(response.status_code, response.bytes_read)
+            if response.skipped:
+                self.metrics.record_error(f"skipped_{response.skipped}")
+                logging.info(f"Skipped body of {url}: {response.skipped}")
                 return
-            final_url = response.url
-            if response.status_code == 200 and 'text/html' in response.headers.get('Content-Type', ''):
-                if any(keyword in url for keyword in self.url_blacklist):
-                    logging.info(f"Skipping blacklisted url: {url}")
-                    return
-                content = response.content.decode('utf-8', 'ignore')
-                # self.raw_html = response.text
-                lang = detect(content)
-                if lang != 'en':
-                    logging.info(f"Skipping non-English page: {url}")
-                    return
-                soup = BeautifulSoup(response.content, 'html.parser')
-                title = soup.find('title').text if soup.find('title') else 'No title'
-                text = self.extract_text(soup)
-                
-                self.write_ap89_doc(final_url, title, text)
-                # self.write_raw_html(final_url, self.raw_html)
-                self.process_links_found(frontier_item, soup, final_url)
+            self.handle_response(frontier_item, response.url, response.status_code, response.headers, response.text)
         except requests.RequestException as e:
+            self.rate.record(domain, time.perf_counter() - started)
+            self.metrics.record_error()
             logging.error(f"Failed to fetch URL {url}: {e}")
-    
+
+    def handle_response(self, frontier_item, final_url, status_code, headers, content):
+        """Parse a fetched page (already decoded), write it out and push its links. Shared by the blocking and asyncio fetch paths."""
+        url = frontier_item.url
+        if not content:
+            logging.info(f"No content returned for URL: {url}")
+            return
+        if status_code == 200 and 'text/html' in headers.get('Content-Type', ''):
+            if self.url_filter.matches(url):
+                logging.info(f"Skipping blacklisted url: {url}")
+                return
+            # self.raw_html = response.text
+            # One pass gives title, visible text and links
+            with self.metrics.timer('parse_seconds'):
+                page = parse_html(content, parser=self.html_parser)
+            # Content-Language / <html lang> / per-domain verdict first, langdetect on a text sample only as a fallback
+            if not self.language_filter.accepts(frontier_item.domain, headers.get('Content-Language', ''), page.lang, page.text):
+                logging.info(f"Skipping non-English page: {url}")
+                return
+            title = page.title or 'No title'
+            text = page.text
+
+            original_url = self.near_duplicates.check_and_add(final_url, text)
+            with self.metrics.timer('write_seconds'):
+                if original_url:
+                    # Mirror or archive copy: keep its links, but record it as an alias instead of another document
+                    self.write_alias(final_url, original_url)
+                    self.metrics.count('near_duplicates')
+                else:
+                    self.write_ap89_doc(final_url, title, text)
+                    self.metrics.record_document()
+            # self.write_raw_html(final_url, self.raw_html)
+            self.process_links_found(frontier_item, page.links, final_url)
+
+    def crawl_async(self, max_pages=40000, concurrency=200):
+        """Asyncio crawl: many hosts in flight at once, still one request per second per domain."""
+        fetcher = AsyncFetcher(concurrency=concurrency, deadline=self.fetch_deadline, max_bytes=self.max_body_bytes, metrics=self.metrics,
+                               rate=self.rate, group_of=self.politeness_group if self.ip_politeness else None, resolver=self.dns)
+        self.metrics.start('crawl_metrics.json', port=self.metrics_port)
+        asyncio.run(fetcher.run(self.next_fetchable_item, self.handle_fetch_result, lambda: self.crawled_count >= max_pages,
+                                requeue=self.requeue_item, budget=lambda: max_pages - self.crawled_count))
+        self.finish()
+
+    async def next_fetchable_item(self):
+        """Pop frontier items until one passes the visited, blacklist and robots.txt checks."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.state_lock:
+                if self.frontier.empty():
+                    return None
+                current_item = self.pop_frontier()
+                current_url = current_item.url
+                if current_url in self.visited_urls or current_url in self.dispatched or self.url_filter.matches(current_url):
+                    continue
+                self.dispatched.add(current_url)
+            # robots.txt fetches block, keep them off the event loop
+            if await loop.run_in_executor(None, self.can_fetch, current_url):
+                if self.ip_politeness:
+                    # Pin the host's group off the event loop (it may wait on DNS), the fetcher's dispatch only reads it
+                    await loop.run_in_executor(None, self.politeness_group, urlparse(current_url).netloc)
+                self.rate.set_crawl_delay(urlparse(current_url).netloc, self.robots.crawl_delay(current_url))  # The fetcher's floor
+                return current_item
+            with self.state_lock:
+                self.dispatched.discard(current_url)
+                self.mark_visited(current_url)
+
+    def requeue_item(self, frontier_item):
+        """Put back an item the fetcher still held when the crawl stopped, so a resumed crawl fetches it."""
+        url = frontier_item.url
+        with self.state_lock:
+            self.dispatched.discard(url)
+            if self.frontier.get(url):
+                return
+            if self.checkpoint:
+                self.checkpoint.append('push', url, frontier_item.wave_number, frontier_item.keyword_match, frontier_item.is_seed, frontier_item.timestamp)
+            self.frontier.push(url, frontier_item, frontier_item.priority())
+            self.metrics.queued(frontier_item.domain)
+
+    def handle_fetch_result(self, frontier_item, result):
+        with self.state_lock:
+            self.dispatched.discard(frontier_item.url)
+            self.mark_visited(frontier_item.url)
+        if result is None:
+            self.metrics.record_error()
+        else:
+            self.metrics.record_response(result.status_code, result.bytes_read)
+            if result.skipped:
+                self.metrics.record_error(f"skipped_{result.skipped}")
+            else:
+                self.handle_response(frontier_item, result.final_url, result.status_code, result.headers, result.text)
+        if self.crawled_count % 200 == 0:
+            with self.state_lock:
+                self.save_state()
+        self.crawled_count += 1
+
     def index_document(self, document):
         self.es.index(index="web_crawl", document=document)
 
@@ -231,8 +407,10 @@ class WebCrawler:
         return canonical_url
 
     def save_links_to_txt(self):
-        self.save_dict_to_txt(self.in_links_dict, 'in_links.txt')
-        self.save_dict_to_txt(self.out_links_dict, 'out_links.txt')
+        graph = self.link_graph.build()
+        in_degree, out_degree = graph.in_degree(), graph.out_degree()
+        self.save_dict_to_txt({url: set(graph.in_link_urls(url)) for node, url in enumerate(graph.urls) if in_degree[node]}, 'in_links.txt')
+        self.save_dict_to_txt({url: set(graph.out_link_urls(url)) for node, url in enumerate(graph.urls) if out_degree[node]}, 'out_links.txt')
 
     def save_dict_to_txt(self, dict_data, file_name):
         with open(file_name, 'w') as file:
@@ -241,45 +419,100 @@ class WebCrawler:
 
     # These two functions help saving the state of the crawler, allow the crawler process to resume from where it paused before.
     def save_state(self):
-        frontier_data = [(item.score, item.url, item.in_link_count, item.wave_number, item.keyword_match, item.timestamp, item.domain) for _, item in self.frontier.queue]
+        self.robots.save()
+        if self.doc_store is not None:
+            self.doc_store.flush()
+        if self.checkpoint:
+            # Everything is already in the log, just record progress and make it durable
+            self.checkpoint.append('count', self.crawled_count)
+            self.checkpoint.flush()
+            logging.info(f"Crawled {self.crawled_count}, near-duplicates skipped {self.near_duplicates.duplicates}")
+            return
+        frontier_data = [(item.score, item.url, item.in_link_count, item.wave_number, item.keyword_match, item.timestamp, item.domain) for item in self.frontier.items()]
+        # Compact seen-url stores go to their own binary file instead of the pickle
+        visited = self.visited_urls if isinstance(self.visited_urls, set) else None
+        if visited is None:
+            self.visited_urls.save('visited_urls.bin')
         with open('crawler_state.pkl', 'wb') as f:
-            pickle.dump((frontier_data, self.visited_urls, self.crawled_count), f)
+            pickle.dump((frontier_data, visited, self.crawled_count), f)
         self.save_links_state() # Save the in-links and out-links state
         self.save_links_to_txt()
-        logging.info(f"Crawled {self.crawled_count}")
+        logging.info(f"Crawled {self.crawled_count}, near-duplicates skipped {self.near_duplicates.duplicates}")
         logging.info("Crawler state and in&out link state saved.")
 
     def load_state(self):
         logging.info("Attempting to load previous state...")
+        if self.checkpoint:
+            self.load_checkpoint_log()
+            return
         try:
             with open('crawler_state.pkl', 'rb') as f:
-                frontier_data, self.visited_urls, self.crawled_count = pickle.load(f)
+                frontier_data, visited, self.crawled_count = pickle.load(f)
+                self.visited_urls = visited if visited is not None else load_seen_store('visited_urls.bin')
                 
-                self.frontier = PriorityQueue()
+                self.frontier = self.new_frontier()
+                self.metrics.host_queue_depth.clear()
                 for data in frontier_data:
                     score, url, in_link_count, wave_number, keyword_match, timestamp, domain = data
                     item = FrontierItem(url, in_link_count, wave_number, timestamp, domain, keyword_match)
                     item.score = score
-                    self.frontier.put((-item.score, item))
-                    self.url_to_frontier_item[url] = item
+                    self.frontier.push(url, item, item.priority())
+                    self.metrics.queued(domain)
+                if os.path.exists('link_graph.bin'):
+                    self.link_graph = LinkGraphBuilder.load('link_graph.bin')
                 
                 logging.info("Previous crawler state loaded, starting from the latest state.")
         except FileNotFoundError:
             logging.info("No previous state found. Starting a fresh crawler.")
 
+    def load_checkpoint_log(self):
+        state = self.checkpoint.recover()
+        if state is None:
+            # Fresh crawl, the seeds were queued before the log existed
+            for item in self.frontier.items():
+                self.checkpoint.append('push', item.url, item.wave_number, item.keyword_match, item.is_seed, item.timestamp)
+            logging.info("No previous state found. Starting a fresh crawler.")
+            return
+        self.frontier = self.new_frontier()
+        self.metrics.host_queue_depth.clear()
+        for url, (in_link_count, wave_number, keyword_match, is_seed, timestamp) in state.frontier.items():
+            item = FrontierItem(url, in_link_count, wave_number, timestamp, keyword_match=keyword_match, is_seed=is_seed)
+            self.frontier.push(url, item, item.priority())
+            self.metrics.queued(item.domain)
+        self.visited_urls = make_seen_store(self.seen_store)
+        for url in state.visited:
+            self.visited_urls.add(url)
+        self.crawled_count = state.crawled_count
+        for src, targets in state.out_links.items():
+            for dst in targets:
+                self.link_graph.add_edge(src, dst)
+        logging.info("Previous crawler state recovered from checkpoint log.")
+
+    def finish(self):
+        """End of crawl: write the final checkpoint and the text link files the indexer reads."""
+        self.save_state()
+        if self.checkpoint:
+            self.save_links_state()
+            self.save_links_to_txt()
+            self.checkpoint.close()
+        if self.doc_store is not None:
+            self.doc_store.close()
+        self.metrics.stop()
+        logging.info(f"Crawl metrics: {self.metrics.summary()}")
+        logging.info(f"Connection pool: {self.session.pool_stats.snapshot()}")
+        logging.info(f"Host rates: {self.rate.snapshot()}")
+        logging.info(f"Trap urls suppressed: {self.traps.snapshot()}")
+
     def get_in_links(self, url):
         """Retrieve the set of URLs that link to the given URL."""
-        return self.in_links_dict.get(url, set())
+        return set(self.link_graph.build().in_link_urls(url))
     
     def get_out_links(self, url):
         """Retrieve the set of URLs that the given URL links out to."""
-        return self.out_links_dict.get(url, set())
+        return set(self.link_graph.build().out_link_urls(url))
     
     def save_links_state(self):
-        with open('in_links_state.pkl', 'wb') as f:
-            pickle.dump(dict(self.in_links_dict), f)
-        with open('out_links_state.pkl', 'wb') as f:
-            pickle.dump(dict(self.out_links_dict), f)
+        self.link_graph.save('link_graph.bin')  # CSR + transpose, page_rank/ and the indexers mmap it
         logging.info("In-links and Out-links state saved.")
 
 
@@ -293,6 +526,7 @@ if __name__ == "__main__":
 
     crawler = WebCrawler(seed_urls)
     crawler.crawl()
+    # crawler.crawl_async(concurrency=200)  # asyncio fetch mode, many hosts in flight
 
     # for each in seed_urls:
     #     print("In link set: /n")
@@ -0,0 +1,272 @@
+import heapq
+import itertools
+import os
+import uuid
+from priority_frontier import IndexedPriorityQueue
+
+
+def parse_record(line):
+    """(priority tuple, payload) of one segment line."""
+    size, rest = line.rstrip('\n').split('\t', 1)
+    *priority, payload = rest.split('\t', int(size))
+    return tuple(float(p) for p in priority), payload
+
+
+class SegmentCursor:
+    """Sequential reader over one sorted segment file, holding only its current record in memory."""
+
+    def __init__(self, path, buffer_size=1 << 16):
+        self.path = path
+        self.file = open(path, 'r', encoding='utf-8', buffering=buffer_size)
+        self.current = None
+        self.advance()
+
+    def advance(self):
+        line = self.file.readline()
+        if not line:
+            self.current = None
+            return
+        self.current = parse_record(line)
+
+    def remaining(self):
+        """Yield the current record and the rest of the segment without moving the cursor."""
+        if self.current is None:
+            return
+        yield self.current
+        with open(self.path, 'r', encoding='utf-8') as f:
+            f.seek(self.file.tell())
+            for line in f:
+                yield parse_record(line)
+
+    def close(self, delete=False):
+        self.file.close()
+        if delete:
+            os.remove(self.path)
+
+
+class DiskSpillingFrontier:
+    """
+    Priority frontier with a bounded in-memory head. When the head holds more than `max_in_memory`
+    entries, its worst half is sorted and written to an on-disk segment; pops merge the head with
+    the segment cursors, so ordering stays exact while only the head and one record per segment
+    live in RAM. Call `flush` before shutting down to persist the head too; with `resume` the segments
+    left in `spill_dir` are picked up again on restart (a partly consumed segment is replayed from its
+    start), otherwise they are deleted so a fresh crawl doesn't inherit an old one's urls.
+
+    Priorities are numbers or tuples of numbers (lower pops first). Payloads are strings without
+    newlines, e.g. a url or a json-encoded frontier item.
+    """
+
+    SEGMENT_SUFFIX = '.seg'
+
+    def __init__(self, spill_dir, max_in_memory=200000, max_segments=16, refill_batch=10000, resume=False):
+        self.spill_dir = spill_dir
+        self.max_in_memory = max_in_memory
+        self.max_segments = max_segments
+        self.refill_batch = refill_batch
+        self.head = []  # (priority, seq, payload)
+        self.seq = itertools.count()
+        self.disk_count = 0
+        os.makedirs(spill_dir, exist_ok=True)
+        self.cursors = []
+        for name in sorted(os.listdir(spill_dir)):
+            path = os.path.join(spill_dir, name)
+            if name.endswith(self.SEGMENT_SUFFIX) and resume:
+                self._open_segment(path)
+            elif name.endswith((self.SEGMENT_SUFFIX, self.SEGMENT_SUFFIX + '.tmp')):
+                os.remove(path)
+
+    def __len__(self):
+        return len(self.head) + self.disk_count
+
+    def empty(self):
+        return not self.head and not self.disk_count
+
+    @staticmethod
+    def _key(priority):
+        return priority if isinstance(priority, tuple) else (priority,)
+
+    def push(self, priority, payload):
+        heapq.heappush(self.head, (self._key(priority), next(self.seq), payload))
+        if len(self.head) > self.max_in_memory:
+            self.spill()
+
+    def pop(self):
+        """Return (priority, payload) with the lowest priority across memory and disk."""
+        if len(self.head) < self.refill_batch // 2:
+            self.refill()
+        best_cursor = min((c for c in self.cursors if c.current), key=lambda c: c.current[0], default=None)
+        if best_cursor and (not self.head or best_cursor.current[0] < self.head[0][0]):
+            priority, payload = best_cursor.current
+            self._advance(best_cursor)
+            return priority, payload
+        priority, _, payload = heapq.heappop(self.head)
+        return priority, payload
+
+    def peek(self):
+        """Lowest priority currently queued, or None when empty."""
+        candidates = [c.current[0] for c in self.cursors if c.current]
+        if self.head:
+            candidates.append(self.head[0][0])
+        return min(candidates, default=None)
+
+    def records(self):
+        """Every queued (priority, payload), in memory and on disk, in no particular order. Nothing is consumed."""
+        for priority, _, payload in self.head:
+            yield priority, payload
+        for cursor in self.cursors:
+            yield from cursor.remaining()
+
+    def refill(self):
+        """Pull the best on-disk entries back into the head while it has room."""
+        room = min(self.refill_batch, self.max_in_memory - len(self.head))
+        while room > 0 and self.disk_count:
+            cursor = min((c for c in self.cursors if c.current), key=lambda c: c.current[0])
+            priority, payload = cursor.current
+            heapq.heappush(self.head, (priority, next(self.seq), payload))
+            self._advance(cursor)
+            room -= 1
+
+    def spill(self):
+        """Write the worse half of the head to a new sorted segment."""
+        entries = sorted(self.head)
+        keep = len(entries) // 2
+        self.head = entries[:keep]  # A sorted list is already a valid heap
+        self.push_sorted((p, payload) for p, _, payload in entries[keep:])
+
+    def push_sorted(self, records):
+        """Write already sorted (priority, payload) records straight to a new segment."""
+        self._write_segment((self._key(p), payload) for p, payload in records)
+        if len(self.cursors) > self.max_segments:
+            self.compact()
+
+    def flush(self):
+        """Move the whole in-memory head to disk."""
+        entries = sorted(self.head)
+        self.head = []
+        if entries:
+            self.push_sorted((p, payload) for p, _, payload in entries)
+
+    def compact(self):
+        """Merge every segment's unread tail into a single segment."""
+        cursors, self.cursors = self.cursors, []
+        self.disk_count = 0
+
+        def remaining(cursor):
+            while cursor.current:
+                yield cursor.current
+                cursor.advance()
+
+        merged = heapq.merge(*(remaining(c) for c in cursors), key=lambda record: record[0])
+        self._write_segment(merged)
+        for cursor in cursors:
+            cursor.close(delete=True)
+
+    def _write_segment(self, records):
+        path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}{self.SEGMENT_SUFFIX}")
+        tmp_path = path + '.tmp'
+        count = 0
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for priority, payload in records:
+                f.write(f"{len(priority)}\t" + '\t'.join(repr(float(p)) for p in priority) + '\t' + payload + '\n')
+                count += 1
+        os.replace(tmp_path, path)
+        self._open_segment(path, count)
+
+    def _open_segment(self, path, count=None):
+        cursor = SegmentCursor(path)
+        if cursor.current is None:
+            cursor.close(delete=True)
+            return
+        if count is None:
+            # Segment from a previous run, count the records so len() stays exact
+            with open(path, 'rb') as f:
+                count = sum(1 for _ in f)
+        self.disk_count += count
+        self.cursors.append(cursor)
+
+    def _advance(self, cursor):
+        cursor.advance()
+        self.disk_count -= 1
+        if cursor.current is None:
+            cursor.close(delete=True)
+            self.cursors.remove(cursor)
+
+    def close(self):
+        for cursor in self.cursors:
+            cursor.close()
+        self.cursors = []
+
+
+class SpillingIndexedFrontier:
+    """
+    Drop-in for IndexedPriorityQueue with a memory budget. Up to `max_in_memory` urls stay in the
+    indexed heap where their priority can still be raised in place; the worse half is moved to a
+    DiskSpillingFrontier whenever the budget is exceeded. Spilled keys stay indexed with their encoded
+    item, so a url re-discovered while on disk is found by `get`, which moves it back into memory to be
+    updated there; its disk record is then stale and skipped when it comes up. The crawler's own state
+    restores the whole frontier, so spill segments from an earlier run are discarded.
+    """
+
+    def __init__(self, spill_dir, max_in_memory, encode, decode, key_of):
+        self.memory = IndexedPriorityQueue()
+        self.disk = DiskSpillingFrontier(spill_dir, max_in_memory=max(1000, max_in_memory // 10))
+        self.spilled = {}  # key -> (priority, payload) of its live disk record
+        self.max_in_memory = max_in_memory
+        self.encode = encode  # item -> payload string
+        self.decode = decode  # payload string -> item
+        self.key_of = key_of  # item -> key
+
+    def __len__(self):
+        return len(self.memory) + len(self.spilled)
+
+    def __contains__(self, key):
+        return key in self.memory or key in self.spilled
+
+    def empty(self):
+        return self.memory.empty() and not self.spilled
+
+    def get(self, key, default=None):
+        if key in self.spilled:
+            self._unspill(key)
+        return self.memory.get(key, default)
+
+    def _unspill(self, key):
+        # Back into the indexed heap, the disk record goes stale. The next push enforces the budget again.
+        priority, payload = self.spilled.pop(key)
+        self.memory.push(key, self.decode(payload), priority)
+
+    def items(self):
+        """Every queued item, the spilled ones decoded."""
+        return itertools.chain(self.memory.items(), (self.decode(payload) for _, payload in self.spilled.values()))
+
+    def update(self, key, priority):
+        if key in self.spilled:
+            self._unspill(key)
+        self.memory.update(key, priority)
+
+    def push(self, key, item, priority):
+        self.spilled.pop(key, None)
+        self.memory.push(key, item, priority)
+        if len(self.memory) > self.max_in_memory:
+            evicted = self.memory.remove_worst(len(self.memory) // 2)
+            records = [(priority, self.encode(item)) for priority, _, item in evicted]
+            for (_, key, _), record in zip(evicted, records):
+                self.spilled[key] = record
+            self.disk.push_sorted(records)
+
+    def pop(self):
+        while True:
+            disk_top = self.disk.peek()
+            if disk_top is None or (not self.memory.empty() and disk_top >= self.memory.peek_priority()):
+                return self.memory.pop()
+            payload = self.disk.pop()[1]
+            item = self.decode(payload)
+            key = self.key_of(item)
+            record = self.spilled.get(key)
+            if record is not None and record[1] == payload:
+                del self.spilled[key]
+                return item
+
+    def flush(self):
+        self.disk.flush()
@@ -0,0 +1,146 @@
+import ipaddress
+import logging
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+_shared = None
+_shared_lock = Lock()
+
+
+def is_ip_literal(host):
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+def split_host(netloc):
+    """Host part of a netloc, without userinfo and port."""
+    host = netloc.rpartition('@')[2]
+    if host.startswith('['):
+        return host[1:host.find(']')]
+    return host.partition(':')[0]
+
+
+class DnsCache:
+    """
+    Process-wide caching resolver. Lookups are cached for `ttl` seconds, failures (NXDOMAIN, timeouts)
+    for `negative_ttl`; the system resolver does not report record TTLs, so one fixed TTL stands in.
+    `prefetch` resolves a host on a small thread pool, meant for when a host first shows up in the
+    frontier, so its first fetch doesn't wait on DNS. Concurrent lookups of the same host share one
+    in-flight resolution. Nothing is patched globally: http_pool.make_session(resolver=...) and
+    async_fetch.CachedResolver hand the cached addresses to the connections they open.
+    """
+
+    def __init__(self, ttl=300, negative_ttl=60, resolve=None, max_workers=8, max_entries=100000, metrics=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.resolve = resolve or (lambda host: socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM))
+        self.max_entries = max_entries
+        self.metrics = metrics  # Optional telemetry.CrawlMetrics, counts dns_hits / dns_misses / dns_failures
+        self.entries = {}  # host -> (expires_at, addrinfo list or the resolver's exception)
+        self.in_flight = {}  # host -> Future
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dns')
+
+    def _count(self, name):
+        if self.metrics is not None:
+            self.metrics.count(name)
+
+    def _cached(self, host):
+        entry = self.entries.get(host)
+        if entry is not None and entry[0] > time.time():
+            return entry
+        return None
+
+    def _load(self, host):
+        try:
+            try:
+                result = self.resolve(host)
+                expires = time.time() + self.ttl
+            except (OSError, ValueError) as e:  # ValueError: names the idna codec rejects, e.g. a label over 63 characters
+                result = e
+                expires = time.time() + self.negative_ttl
+                self._count('dns_failures')
+            with self.lock:
+                if len(self.entries) >= self.max_entries:
+                    now = time.time()
+                    self.entries = {h: entry for h, entry in self.entries.items() if entry[0] > now}
+                self.entries[host] = (expires, result)
+        finally:
+            with self.lock:
+                self.in_flight.pop(host, None)
+        return result
+
+    def _submit(self, host):
+        with self.lock:
+            future = self.in_flight.get(host)
+            if future is None:
+                future = self.executor.submit(self._load, host)
+                self.in_flight[host] = future
+            return future
+
+    def prefetch(self, host):
+        """Start resolving `host` in the background unless it is cached or already being resolved."""
+        host = host.lower()
+        if is_ip_literal(host) or self._cached(host):
+            return
+        self._submit(host)
+
+    def lookup(self, host):
+        """
+        getaddrinfo results for `host` (any port), from the cache or a fresh resolution. Raises the cached
+        error (OSError, or ValueError for an invalid name) for a failed host.
+        """
+        host = host.lower()
+        entry = self._cached(host)
+        if entry is not None:
+            self._count('dns_hits')
+            result = entry[1]
+        else:
+            self._count('dns_misses')
+            # Wait for a prefetch already under way, else resolve on this thread rather than queue behind other prefetches
+            future = self.in_flight.get(host)
+            result = future.result() if future is not None else self._load(host)
+        if isinstance(result, Exception):
+            raise type(result)(*result.args)  # A fresh copy, re-raising the cached one would keep growing its traceback
+        return result
+
+    def address(self, host):
+        """First address of a resolved host without blocking; None if it is not cached (or failed)."""
+        if is_ip_literal(host):
+            return host.strip('[]')
+        entry = self._cached(host.lower())
+        if entry is None or isinstance(entry[1], Exception) or not entry[1]:
+            return None
+        return entry[1][0][4][0]
+
+    def group_of(self, host):
+        """
+        Politeness group of a host (a netloc is fine): its server's IP address, so virtual hosts sharing a
+        server share one group; the host itself if it doesn't resolve. Waits for the resolution (joining a
+        prefetch under way) so the group doesn't depend on timing; call it outside locks and off the event loop.
+        """
+        try:
+            return self.connect_address(split_host(host))
+        except (OSError, ValueError):
+            return host
+
+    def connect_address(self, host):
+        """Address to open a connection to `host` (a name or an IP literal) on, resolving it through the cache if needed."""
+        if is_ip_literal(host):
+            return host.strip('[]')
+        return self.lookup(host)[0][4][0]
+
+
+def shared_cache(metrics=None, **kwargs):
+    """The process-wide DnsCache, created on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = DnsCache(metrics=metrics, **kwargs)
+            logging.info(f"DNS cache created (ttl {_shared.ttl}s, negative ttl {_shared.negative_ttl}s)")
+        return _shared
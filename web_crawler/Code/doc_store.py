@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import struct
+import zlib
+from threading import Lock
+
+RECORD_MAGIC = b'DOC1'
+RECORD_HEADER = struct.Struct('<4sQI')  # magic, url hash, compressed payload length
+INDEX_ENTRY = struct.Struct('<QIQI')  # url hash, segment number, record offset, record length
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class SegmentedDocStore:
+    """
+    Append-only document store: records (json dicts, zlib-compressed) are appended to large numbered
+    segment files instead of one small file per page, and index.bin maps each url hash to the segment
+    and offset of its newest record. Writing the same key again supersedes the old record.
+
+    `get(key)` is one seek and read; `scan()` streams the live records segment by segment in write
+    order, which is what the indexers use. Opening a store also indexes any records a crash left in
+    a segment after its last index entry. Records only ever go to higher (segment, offset) positions,
+    so the highest position seen for a key is its newest record.
+    """
+
+    def __init__(self, directory, segment_bytes=256 * 1024 * 1024, compression_level=6):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compression_level = compression_level
+        self.index = {}  # url hash -> (segment, offset, length)
+        self.indexed_end = {}  # segment -> end of its last indexed record, superseded ones included
+        self.lock = Lock()
+        self.writer = None
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, 'index.bin')
+        self._load_index()
+        segments = self.segments()
+        self.segment_number = segments[-1] if segments else 1
+        for segment in segments:
+            self._recover_tail(segment)
+        self.index_file = open(self.index_path, 'ab')
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key_hash(key) in self.index
+
+    def segments(self):
+        return sorted(int(name[len('segment_'):-len('.dat')]) for name in os.listdir(self.directory)
+                      if name.startswith('segment_') and name.endswith('.dat'))
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"segment_{number:06d}.dat")
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_ENTRY.size  # Drop a torn last entry
+        for entry in INDEX_ENTRY.iter_unpack(data[:usable]):
+            self._index_entry(*entry)
+
+    def _index_entry(self, h, segment, offset, length):
+        current = self.index.get(h)
+        if current is None or current[:2] < (segment, offset):
+            self.index[h] = (segment, offset, length)
+        self.indexed_end[segment] = max(self.indexed_end.get(segment, 0), offset + length)
+
+    def _recover_tail(self, segment):
+        indexed_end = self.indexed_end.get(segment, 0)
+        path = self._segment_path(segment)
+        if indexed_end >= os.path.getsize(path):
+            return
+        recovered = []
+        with open(path, 'rb') as f:
+            f.seek(indexed_end)
+            offset = indexed_end
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                magic, h, length = RECORD_HEADER.unpack(header)
+                if magic != RECORD_MAGIC or len(f.read(length)) < length:
+                    break
+                recovered.append((h, segment, offset, RECORD_HEADER.size + length))
+                offset += RECORD_HEADER.size + length
+        if offset < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)  # Cut a half-written record
+        if recovered:
+            with open(self.index_path, 'ab') as f:
+                for entry in recovered:
+                    f.write(INDEX_ENTRY.pack(*entry))
+                    self._index_entry(*entry)
+
+    def put(self, key, record):
+        """Append a record (json-serializable dict) under `key`, normally the document url."""
+        payload = zlib.compress(json.dumps(record).encode('utf-8'), self.compression_level)
+        h = key_hash(key)
+        data = RECORD_HEADER.pack(RECORD_MAGIC, h, len(payload)) + payload
+        with self.lock:
+            if self.writer is None:
+                self.writer = open(self._segment_path(self.segment_number), 'ab')
+            if self.writer.tell() and self.writer.tell() + len(data) > self.segment_bytes:
+                self.writer.close()
+                self.index_file.flush()  # The closed segment's entries, so only the newest segment can trail the index
+                self.segment_number += 1
+                self.writer = open(self._segment_path(self.segment_number), 'ab')
+            offset = self.writer.tell()
+            self.writer.write(data)
+            self.index_file.write(INDEX_ENTRY.pack(h, self.segment_number, offset, len(data)))
+            self.index[h] = (self.segment_number, offset, len(data))
+            self.indexed_end[self.segment_number] = offset + len(data)
+
+    def flush(self):
+        with self.lock:
+            if self.writer:
+                self.writer.flush()
+            self.index_file.flush()
+
+    def get(self, key, default=None):
+        location = self.index.get(key_hash(key))
+        if location is None:
+            return default
+        segment, offset, length = location
+        self.flush()
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        return self._decode(data[RECORD_HEADER.size:])
+
+    @staticmethod
+    def _decode(payload):
+        return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+    def scan(self):
+        """Yield every live (newest per key) record in write order, reading each segment sequentially."""
+        self.flush()
+        for segment in self.segments():
+            with open(self._segment_path(segment), 'rb') as f:
+                offset = 0
+                while True:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    magic, h, length = RECORD_HEADER.unpack(header)
+                    payload = f.read(length)
+                    if magic != RECORD_MAGIC or len(payload) < length:
+                        break
+                    if self.index.get(h, (None, None))[:2] == (segment, offset):
+                        yield self._decode(payload)
+                    offset += RECORD_HEADER.size + length
+
+    def close(self):
+        with self.lock:
+            if self.writer:
+                self.writer.close()
+                self.writer = None
+            self.index_file.close()
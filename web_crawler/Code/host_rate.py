@@ -0,0 +1,122 @@
+import time
+from email.utils import parsedate_to_datetime
+from threading import Lock
+
+BACKOFF_STATUSES = (429, 500, 502, 503, 504)
+
+
+def retry_after_seconds(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date), None if absent or unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - (now or time.time()), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HostRate:
+    __slots__ = ('latency', 'error_rate', 'backoff', 'crawl_delay', 'retry_until', 'fetches', 'errors')
+
+    def __init__(self):
+        self.latency = None  # Response time EWMA in seconds, None before the first response
+        self.error_rate = 0.0  # EWMA of 429/5xx/connection failures
+        self.backoff = 1.0
+        self.crawl_delay = None  # robots.txt crawl-delay
+        self.retry_until = 0.0  # Retry-After of the last 429/503
+        self.fetches = 0
+        self.errors = 0
+
+
+class RateController:
+    """
+    Adaptive per-host fetch spacing. The delay after a fetch is `latency_factor` times the host's
+    response time EWMA (a host that answers in 20 ms can take a request every quarter second, one that
+    takes 2 s gets 8 s of room), multiplied by a backoff that doubles on every 429, 5xx or connection
+    failure and shrinks back towards 1 on each success. The result is clamped to [min_delay, max_delay],
+    never drops below the host's robots.txt crawl-delay and waits out any Retry-After. A host not
+    fetched yet gets `initial_delay`, the old fixed one-second rule. Thread safe.
+    """
+
+    def __init__(self, min_delay=0.25, max_delay=60.0, initial_delay=1.0, latency_factor=4.0, alpha=0.3,
+                 backoff_factor=2.0, recovery=0.75):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.latency_factor = latency_factor
+        self.alpha = alpha  # EWMA weight of the newest sample
+        self.backoff_factor = backoff_factor
+        self.recovery = recovery
+        self.hosts = {}
+        self.lock = Lock()
+
+    def _host(self, host):
+        rate = self.hosts.get(host)
+        if rate is None:
+            rate = self.hosts[host] = HostRate()
+        return rate
+
+    def record(self, host, latency, status=None, retry_after=None):
+        """
+        One finished request: `latency` in seconds, `status` the HTTP status or None for a connection
+        error / timeout, `retry_after` the raw Retry-After header if any.
+        """
+        failed = status is None or status in BACKOFF_STATUSES
+        wait = retry_after_seconds(retry_after) if status in (429, 503) else None
+        with self.lock:
+            rate = self._host(host)
+            rate.fetches += 1
+            if status is not None:
+                # A timeout says little about response time, and would pin the EWMA to the deadline
+                rate.latency = latency if rate.latency is None else self.alpha * latency + (1 - self.alpha) * rate.latency
+            rate.error_rate = self.alpha * failed + (1 - self.alpha) * rate.error_rate
+            if failed:
+                rate.errors += 1
+                rate.backoff = min(rate.backoff * self.backoff_factor, self.max_delay / self.min_delay)
+            else:
+                rate.backoff = max(rate.backoff * self.recovery, 1.0)
+            if wait:
+                rate.retry_until = time.time() + min(wait, self.max_delay)
+
+    def set_crawl_delay(self, host, crawl_delay):
+        with self.lock:
+            self._host(host).crawl_delay = crawl_delay
+
+    def delay(self, host, crawl_delay=None):
+        """
+        Seconds until `host` may be fetched again. A non-None `crawl_delay` (robots.txt) is remembered,
+        so callers that don't have it at hand still get it as the floor.
+        """
+        with self.lock:
+            rate = self._host(host)
+            if crawl_delay is not None:
+                rate.crawl_delay = crawl_delay
+            if rate.latency is None:
+                delay = self.initial_delay * rate.backoff
+            else:
+                delay = self.latency_factor * rate.latency * rate.backoff
+            delay = min(max(delay, self.min_delay), self.max_delay)
+            if rate.crawl_delay:
+                delay = max(delay, rate.crawl_delay)
+            return max(delay, rate.retry_until - time.time())
+
+    def backed_off_hosts(self):
+        with self.lock:
+            return sum(1 for rate in self.hosts.values() if rate.backoff > 1.0)
+
+    def snapshot(self, top=10):
+        """Summary for the crawl log: hosts seen, hosts backed off, and the slowest hosts' state."""
+        with self.lock:
+            items = list(self.hosts.items())
+        slowest = sorted((item for item in items if item[1].latency is not None),
+                         key=lambda item: item[1].latency * item[1].backoff, reverse=True)[:top]
+        return {
+            "hosts": len(items),
+            "backed_off": sum(1 for _, rate in items if rate.backoff > 1.0),
+            "slowest": {host: {"latency": round(rate.latency, 3), "error_rate": round(rate.error_rate, 3),
+                               "backoff": round(rate.backoff, 2), "fetches": rate.fetches, "errors": rate.errors}
+                        for host, rate in slowest},
+        }
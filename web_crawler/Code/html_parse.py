@@ -0,0 +1,113 @@
+from html.parser import HTMLParser
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional, the streaming parser needs only the standard library
+    lxml = None
+
+
+class ParsedPage:
+    def __init__(self, title, text, links, lang=None):
+        self.title = title  # None if the page has no <title>
+        self.text = text  # visible text, whitespace-trimmed pieces joined by a space
+        self.links = links  # [(href, anchor_text)] in document order, hrefs as written in the page
+        self.lang = lang  # <html lang="..."> if present
+
+
+class StreamingExtractor(HTMLParser):
+    """Collect title, visible text and (href, anchor text) pairs in a single tokenizer pass, without building a tree."""
+
+    def __init__(self, skip_tags):
+        super().__init__(convert_charrefs=True)
+        self.skip_tags = skip_tags
+        self.skip_depth = 0
+        self.in_title = False
+        self.title_parts = None
+        self.text_parts = []
+        self.links = []
+        self.open_anchors = []  # [href, text parts] for <a> tags not closed yet
+        self.lang = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.skip_tags:
+            self.skip_depth += 1
+        elif tag == 'a':
+            href = dict(attrs).get('href')
+            if href is not None:
+                self.open_anchors.append([href, []])
+        elif tag == 'title' and self.title_parts is None:
+            self.in_title = True
+            self.title_parts = []
+        elif tag == 'html' and self.lang is None:
+            self.lang = dict(attrs).get('lang')
+
+    def handle_endtag(self, tag):
+        if tag in self.skip_tags:
+            if self.skip_depth:
+                self.skip_depth -= 1
+        elif tag == 'a':
+            if self.open_anchors:
+                href, parts = self.open_anchors.pop()
+                self.links.append((href, ''.join(parts)))
+        elif tag == 'title':
+            self.in_title = False
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title_parts.append(data)
+        for anchor in self.open_anchors:
+            anchor[1].append(data)
+        if not self.skip_depth:
+            stripped = data.strip()
+            if stripped:
+                self.text_parts.append(stripped)
+
+    def result(self):
+        # Anchors left open at end of document still count, like BeautifulSoup's find_all('a')
+        for href, parts in self.open_anchors:
+            self.links.append((href, ''.join(parts)))
+        title = ''.join(self.title_parts).strip() if self.title_parts is not None else None
+        return ParsedPage(title, ' '.join(self.text_parts), self.links, self.lang)
+
+
+def parse_stream(html, skip_tags):
+    extractor = StreamingExtractor(skip_tags)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.result()
+
+
+def parse_lxml(html, skip_tags):
+    root = lxml.html.fromstring(html)
+    title_el = root.find('.//title')
+    title = title_el.text_content().strip() if title_el is not None else None
+    links = [(a.get('href'), a.text_content()) for a in root.iter('a') if a.get('href') is not None]
+    for element in list(root.iter(*skip_tags)):
+        element.drop_tree()
+    text = ' '.join(s.strip() for s in root.itertext() if s.strip())
+    return ParsedPage(title, text, links, root.get('lang'))
+
+
+def parse_bs4(html, skip_tags):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.get_text().strip() if soup.title else None
+    links = [(a['href'], a.text) for a in soup.find_all('a', href=True)]
+    html_tag = soup.find('html')
+    for element in soup(list(skip_tags)):
+        element.decompose()
+    return ParsedPage(title, ' '.join(soup.stripped_strings), links, html_tag.get('lang') if html_tag else None)
+
+
+PARSERS = {'stream': parse_stream, 'lxml': parse_lxml, 'bs4': parse_bs4}
+
+
+def parse_html(html, parser='stream', skip_tags=('script', 'style')):
+    """
+    Single parse stage for the crawlers: returns a ParsedPage with title, visible text and links.
+    `parser` picks the backend: 'stream' (stdlib tokenizer, default), 'lxml' (fastest, needs lxml) or
+    'bs4' (the previous BeautifulSoup path). Text inside `skip_tags` is left out, links are always kept.
+    """
+    if parser == 'lxml' and lxml is None:
+        parser = 'stream'
+    return PARSERS[parser](html, tuple(skip_tags))
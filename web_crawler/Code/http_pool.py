@@ -0,0 +1,127 @@
+from collections import Counter
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError
+
+
+class PoolStats:
+    """
+    Connection pool counters: `checkouts` (connections taken from a pool for a request), `connects`
+    (TCP/TLS connections actually opened, a new one or a reconnect after the server closed a kept-alive
+    one) and `waits` (checkouts that had to wait for the host's limit). Reused connections are
+    checkouts - connects. Also forwarded to CrawlMetrics counters as pool_<name>.
+    """
+
+    def __init__(self, metrics=None):
+        self.counts = Counter()
+        self.connects_by_host = Counter()
+        self.metrics = metrics
+        self.lock = Lock()
+
+    def add(self, key, host=None):
+        with self.lock:
+            self.counts[key] += 1
+            if key == 'connects' and host:
+                self.connects_by_host[host] += 1
+        if self.metrics is not None:
+            self.metrics.count(f"pool_{key}")
+
+    def snapshot(self):
+        with self.lock:
+            checkouts, connects = self.counts['checkouts'], self.counts['connects']
+            return {
+                "checkouts": checkouts,
+                "connects": connects,
+                "reused": checkouts - connects,
+                "hit_rate": round((checkouts - connects) / checkouts, 3) if checkouts else None,
+                "waits": self.counts['waits'],
+                "top_connect_hosts": dict(self.connects_by_host.most_common(10)),
+            }
+
+
+def counting_pool_class(base, stats, resolver=None):
+    """
+    Subclass of a urllib3 pool class whose checkouts and connects are counted in `stats`. With `resolver`
+    (a dns_cache.DnsCache) new connections go to its cached address; Host, SNI and certificate checks
+    still use the name.
+    """
+
+    class CountingConnection(base.ConnectionCls):
+        def connect(self):
+            stats.add('connects', self.host)
+            super().connect()
+
+        def _new_conn(self):
+            if resolver is None:
+                return super()._new_conn()
+            name = self._dns_host
+            try:
+                self._dns_host = resolver.connect_address(name)
+            except (OSError, ValueError) as e:  # Resolution failures, cached ones and invalid names included
+                raise NameResolutionError(self.host, self, e) from e
+            try:
+                return super()._new_conn()
+            finally:
+                self._dns_host = name
+
+    class CountingPool(base):
+        ConnectionCls = CountingConnection
+
+        def _get_conn(self, timeout=None):
+            if self.block and self.pool is not None and self.pool.empty():
+                stats.add('waits')  # Every connection of this host is in use
+            conn = super()._get_conn(timeout)
+            stats.add('checkouts')
+            return conn
+
+    return CountingPool
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that keeps a keep-alive pool for each of up to `max_hosts` hosts, instead of requests'
+    default 10 (a crawl touching more hosts than that evicts and reconnects constantly), with at most
+    `per_host` connections per host: a request beyond that waits for a connection to come back
+    (pool_block) rather than opening more. Reusing a pooled connection also reuses its TLS session,
+    and new connections share requests' preloaded SSLContext. `resolver` is passed to counting_pool_class.
+    """
+
+    def __init__(self, max_hosts=1024, per_host=4, max_retries=0, stats=None, resolver=None):
+        self.stats = stats or PoolStats()
+        self.resolver = resolver
+        super().__init__(pool_connections=max_hosts, pool_maxsize=per_host, max_retries=max_retries, pool_block=True)
+
+    def counting(self, manager):
+        manager.pool_classes_by_scheme = {
+            'http': counting_pool_class(HTTPConnectionPool, self.stats, self.resolver),
+            'https': counting_pool_class(HTTPSConnectionPool, self.stats, self.resolver),
+        }
+        return manager
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.counting(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        new = proxy not in self.proxy_manager
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        return self.counting(manager) if new else manager
+
+
+def make_session(user_agent=None, max_retries=0, max_hosts=1024, per_host=4, metrics=None, resolver=None):
+    """
+    requests.Session for a crawler: one PooledAdapter for http and https, counted in `metrics` (a CrawlMetrics),
+    connecting through `resolver` (a dns_cache.DnsCache) when given.
+    """
+    session = requests.Session()
+    adapter = PooledAdapter(max_hosts=max_hosts, per_host=per_host, max_retries=max_retries, stats=PoolStats(metrics),
+                            resolver=resolver)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if user_agent:
+        session.headers.update({'User-Agent': user_agent})
+    session.pool_stats = adapter.stats
+    return session
@@ -5,6 +5,8 @@ import re
 from nltk.tokenize import word_tokenize
 from nltk.stem import PorterStemmer
 import hashlib
+from doc_store import SegmentedDocStore
+from link_graph import LinkGraph
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,6 +31,9 @@ class Indexer:
         self.output_dir = output_dir
         self.es = Elasticsearch(es_host, api_key=api_key)
         self.index_name = index_name
+        # The crawl's final link graph, when saved, replaces the per-document links files
+        graph_path = os.path.join(output_dir, "link_graph.bin")
+        self.link_graph = LinkGraph.open(graph_path) if os.path.exists(graph_path) else None
         self.create_index()
 
     def create_index(self):
@@ -70,10 +75,34 @@ class Indexer:
             self.es.indices.delete(index=self.index_name)
         self.es.indices.create(index=self.index_name, body=settings)
 
+    def build_action(self, url, title, text, in_links, out_links, header_content):
+        return {
+            "_index": self.index_name,
+            "_id": hashlib.sha256(url.encode('utf-8')).hexdigest(),
+            "_source": {
+                "url": url,
+                "title": title,
+                "text": ' '.join(tokenize_text(text)),
+                "in_links": list(in_links),
+                "out_links": list(out_links),
+                "header": header_content,
+            }
+        }
+
     def index_documents(self):
+        # A sharded crawl (sharded_crawl.py) writes one output directory per worker
+        shard_dirs = sorted(name for name in os.listdir(self.output_dir) if name.startswith("shard_"))
+        for output_dir in [os.path.join(self.output_dir, name) for name in shard_dirs] or [self.output_dir]:
+            self.index_output_dir(output_dir)
+
+    def index_output_dir(self, output_dir):
+        store_path = os.path.join(output_dir, "doc_store")
+        if os.path.isdir(store_path):
+            self.index_doc_store(store_path)
+            return
         actions = []
-        documents_path = os.path.join(self.output_dir, "documents")
-        links_path = os.path.join(self.output_dir, "links")
+        documents_path = os.path.join(output_dir, "documents")
+        links_path = os.path.join(output_dir, "links")
 
         for filename in os.listdir(documents_path):
             if filename.endswith('.txt'):
@@ -88,10 +117,8 @@ class Indexer:
                 url = url_match.group(1).strip() if url_match else ""
                 title = title_match.group(1).strip() if title_match else ""
                 text = text_match.group(1).strip() if text_match else ""
-                cleaned_text = ' '.join(tokenize_text(text))
-                url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
                 links_file = os.path.join(links_path, f"links_graph_{doc_id.split('_')[-1]}.txt")
-                headers_path = os.path.join(self.output_dir, "headers")
+                headers_path = os.path.join(output_dir, "headers")
                 header_file_path = os.path.join(headers_path, f"headers_{doc_id}.txt")
                 try:
                     with open(header_file_path, 'r', encoding='utf-8') as header_file:
@@ -100,27 +127,18 @@ class Indexer:
                     logger.error(f"Header file not found for document {doc_id}: {header_file_path}")
                     header_content = ""
 
-                try:
-                    in_links, out_links = self.read_links(links_file)
-                    logging.info("Links found")
-                except FileNotFoundError:
-                    #logger.error(f"Links file not found for document {doc_id}: {links_file}. Skipping document.")
-                    in_links, out_links = [], []
-                    continue
-
-                action = {
-                    "_index": self.index_name,
-                    "_id": url_hash,
-                    "_source": {
-                        "url": url,
-                        "title": title,
-                        "text": cleaned_text,
-                        "in_links": list(in_links),
-                        "out_links": list(out_links),
-                        "header": header_content,
-                    }
-                }
-                actions.append(action)
+                if self.link_graph is not None:
+                    in_links, out_links = self.link_graph.in_link_urls(url), self.link_graph.out_link_urls(url)
+                else:
+                    try:
+                        in_links, out_links = self.read_links(links_file)
+                        logging.info("Links found")
+                    except FileNotFoundError:
+                        #logger.error(f"Links file not found for document {doc_id}: {links_file}. Skipping document.")
+                        in_links, out_links = [], []
+                        continue
+
+                actions.append(self.build_action(url, title, text, in_links, out_links, header_content))
 
                 if len(actions) == 500:
                     helpers.bulk(self.es, actions)
@@ -129,6 +147,23 @@ class Indexer:
         if actions:
             helpers.bulk(self.es, actions)
 
+    def index_doc_store(self, store_path):
+        """Index a crawl written with Crawler(use_doc_store=True), reading the segments sequentially."""
+        store = SegmentedDocStore(store_path)
+        actions = []
+        for record in store.scan():
+            in_links, out_links = record["in_links"], record["out_links"]
+            if self.link_graph is not None:
+                in_links, out_links = self.link_graph.in_link_urls(record["docno"]), self.link_graph.out_link_urls(record["docno"])
+            actions.append(self.build_action(record["docno"], record["title"], record["text"],
+                                             in_links, out_links, str(record["headers"])))
+            if len(actions) == 500:
+                helpers.bulk(self.es, actions)
+                actions = []
+        if actions:
+            helpers.bulk(self.es, actions)
+        store.close()
+
     @staticmethod
     def read_links(links_file):
         in_links = set()
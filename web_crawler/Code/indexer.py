@@ -10,6 +10,8 @@ from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from elasticsearch7.exceptions import ElasticsearchException
+from doc_store import SegmentedDocStore
+from link_graph import LinkGraph
 
 nltk.download('punkt', quiet=True)
 nltk.download('stopwords', quiet=True)
@@ -44,6 +46,9 @@ def process_file(index_name, file_path, in_links_dict, out_links_dict):
     docno = re.search(r'<DOCNO>(.*?)</DOCNO>', content).group(1).strip()
     title = re.search(r'<HEAD>(.*?)</HEAD>', content).group(1).strip() if re.search(r'<HEAD>(.*?)</HEAD>', content) else ""
     text = re.search(r'<TEXT>(.*?)</TEXT>', content, re.DOTALL).group(1).strip()
+    return process_record(index_name, docno, title, text, in_links_dict, out_links_dict)
+
+def process_record(index_name, docno, title, text, in_links_dict, out_links_dict):
     cleaned_text = ' '.join(tokenize_text(text))
     term_positions = get_term_positions(text)
     in_link = in_links_dict.get(docno.strip(), [])
@@ -137,10 +142,23 @@ def main():
     directory_path = './ap89/'
     state_dict = './'
     # in_links_dict, out_links_dict = load_links_state(state_dict)
-    in_links_dict, out_links_dict = load_links_state_from_txt(state_dict)
+    if os.path.exists(os.path.join(state_dict, 'link_graph.bin')):
+        # Memory-mapped CSR graph saved by the crawler, looked up per document instead of parsing the txt files
+        graph = LinkGraph.open(os.path.join(state_dict, 'link_graph.bin'))
+        in_links_dict, out_links_dict = graph.adjacency('in'), graph.adjacency('out')
+    else:
+        in_links_dict, out_links_dict = load_links_state_from_txt(state_dict)
     index_name = "webcrawl_xu2"
     es = Elasticsearch("https://9e930bc5172546d9ab5ee4754db5a0c8.us-central1.gcp.cloud.es.io:443", api_key=api_key)
     create_index(es, index_name)
+    if os.path.isdir('./doc_store'):
+        # Crawled with WebCrawler(doc_store_dir='doc_store'): stream the segments instead of listing ap89/
+        store = SegmentedDocStore('./doc_store')
+        for record in store.scan():
+            action = process_record(index_name, record["docno"].strip(), record["title"].strip(), record["text"].strip(), in_links_dict, out_links_dict)
+            bulk_index_documents(es, index_name, action)
+        store.close()
+        return
     for filename in os.listdir(directory_path):
         if filename.endswith('.txt'):
             action = process_file(index_name, os.path.join(directory_path, filename), in_links_dict, out_links_dict)
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from langdetect import DetectorFactory, detect
+from langdetect.lang_detect_exception import LangDetectException
+
+DetectorFactory.seed = 0  # langdetect is randomized, make its answers repeatable
+
+
+def primary_language(tag):
+    """'en-US' / 'en_GB' / 'EN' -> 'en'; None for empty or missing tags. Only the first of a comma list is used."""
+    if not tag:
+        return None
+    tag = tag.split(',')[0].strip().replace('_', '-')
+    return tag.split('-')[0].lower() or None
+
+
+class LanguageFilter:
+    """
+    Per-page language check that keeps langdetect off the hot path. Cheap signals are used first
+    (Content-Language header, then <html lang>); once a host has returned the same language for
+    `stable_after` pages in a row that verdict is cached and used for the host's later pages that carry
+    no signal. Only then does it fall back to langdetect, on the first `sample_chars` of visible text.
+    """
+
+    def __init__(self, target='en', sample_chars=2000, stable_after=20):
+        self.target = target
+        self.sample_chars = sample_chars
+        self.stable_after = stable_after
+        self.domain_verdicts = {}  # domain -> language, once stable
+        self.streaks = defaultdict(lambda: [None, 0])  # domain -> [last language, pages in a row]
+        self.stats = defaultdict(int)  # which signal decided, for the crawl log
+
+    def language_of(self, domain, content_language='', html_lang=None, text=''):
+        lang = primary_language(content_language)
+        source = 'header'
+        if lang is None:
+            lang, source = primary_language(html_lang), 'html_lang'
+        if lang is None and domain in self.domain_verdicts:
+            lang, source = self.domain_verdicts[domain], 'domain_cache'
+        if lang is None:
+            lang, source = self.detect(text[:self.sample_chars]), 'langdetect'
+        self.stats[source] += 1
+        if source != 'domain_cache':
+            self.observe(domain, lang)
+        return lang
+
+    def detect(self, sample):
+        try:
+            return detect(sample)
+        except LangDetectException:
+            return None  # No usable text
+
+    def observe(self, domain, lang):
+        if lang is None:
+            return  # langdetect found no usable text, which says nothing about the host's language
+        if domain in self.domain_verdicts:
+            if self.domain_verdicts[domain] != lang:
+                # The host serves more than one language, stop trusting the cached verdict
+                del self.domain_verdicts[domain]
+                self.streaks[domain] = [lang, 1]
+            return
+        streak = self.streaks[domain]
+        if streak[0] == lang:
+            streak[1] += 1
+        else:
+            streak[0], streak[1] = lang, 1
+        if streak[1] >= self.stable_after:
+            self.domain_verdicts[domain] = lang
+            del self.streaks[domain]
+
+    def accepts(self, domain, content_language='', html_lang=None, text=''):
+        return self.language_of(domain, content_language, html_lang, text) == self.target
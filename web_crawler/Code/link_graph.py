@@ -0,0 +1,194 @@
+import os
+import struct
+from array import array
+from threading import RLock
+
+import numpy as np
+
+MAGIC = b'LGR1'
+HEADER = struct.Struct('<4sIQQ4x')  # magic, version, nodes, edges; padded to 32 bytes so the arrays stay aligned
+
+
+class LinkGraphBuilder:
+    """
+    Link graph collected during the crawl. Urls are interned to consecutive integer ids the first time
+    they are seen and edges are buffered as two uint32 arrays, so the crawl holds one string per url
+    instead of a set of url strings per page. `build()` dedupes the edges and turns them into a LinkGraph.
+    """
+
+    def __init__(self):
+        self.ids = {}  # url -> id
+        self.urls = []  # id -> url
+        self.src = array('I')
+        self.dst = array('I')
+        self.lock = RLock()
+        self.graph = None  # Last build(), reused until an edge is added
+
+    def __len__(self):
+        return len(self.urls)
+
+    def intern(self, url):
+        node = self.ids.get(url)
+        if node is None:
+            with self.lock:
+                node = self.ids.get(url)
+                if node is None:
+                    node = self.ids[url] = len(self.urls)
+                    self.urls.append(url)
+        return node
+
+    def add_edge(self, src_url, dst_url):
+        src, dst = self.intern(src_url), self.intern(dst_url)
+        with self.lock:
+            self.src.append(src)
+            self.dst.append(dst)
+            self.graph = None
+
+    def compact(self):
+        """Drop duplicate edges from the buffers, pages are often linked many times from the same page."""
+        with self.lock:
+            edges = np.unique((np.frombuffer(self.src, dtype=np.uint32).astype(np.uint64) << np.uint64(32))
+                              | np.frombuffer(self.dst, dtype=np.uint32))
+            self.src = array('I', (edges >> np.uint64(32)).astype(np.uint32).tobytes())
+            self.dst = array('I', (edges & np.uint64(0xFFFFFFFF)).astype(np.uint32).tobytes())
+        return edges
+
+    def build(self):
+        with self.lock:
+            if self.graph is None:
+                edges = self.compact()  # Sorted by source, then target
+                src = (edges >> np.uint64(32)).astype(np.uint32)
+                dst = (edges & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+                n = len(self.urls)
+                order = np.lexsort((src, dst))  # Transpose: sorted by target, then source
+                self.graph = LinkGraph(list(self.urls),
+                                       csr_offsets(src, n), dst,
+                                       csr_offsets(dst, n), src[order])
+            return self.graph
+
+    def save(self, path):
+        self.build().save(path)
+
+    @classmethod
+    def load(cls, path):
+        """Builder holding the urls and edges of a saved graph, to continue a resumed crawl."""
+        builder = cls()
+        graph = LinkGraph.open(path, mmap=False)
+        builder.urls = list(graph.urls)
+        builder.ids = {url: node for node, url in enumerate(builder.urls)}
+        builder.src = array('I', np.repeat(np.arange(graph.num_nodes, dtype=np.uint32), np.diff(graph.out_offsets)).tobytes())
+        builder.dst = array('I', np.asarray(graph.out_targets, dtype=np.uint32).tobytes())
+        return builder
+
+
+def csr_offsets(rows, n):
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=offsets[1:])
+    return offsets
+
+
+class LinkGraph:
+    """
+    Compressed sparse row adjacency of the link graph plus its transpose. Out-links of node i are
+    out_targets[out_offsets[i]:out_offsets[i + 1]], in-links the same with in_offsets / in_sources.
+
+    On disk `path` holds a 32 byte header followed by out_offsets, in_offsets (int64, nodes + 1 each),
+    out_targets and in_sources (uint32, edges each); `path + '.urls'` has the url of id i on line i.
+    `open()` memory-maps the arrays so PageRank and the indexers don't load the graph into memory.
+    """
+
+    def __init__(self, urls, out_offsets, out_targets, in_offsets, in_sources):
+        self.urls = urls
+        self.out_offsets = out_offsets
+        self.out_targets = out_targets
+        self.in_offsets = in_offsets
+        self.in_sources = in_sources
+        self.ids = None
+
+    @property
+    def num_nodes(self):
+        return len(self.out_offsets) - 1
+
+    @property
+    def num_edges(self):
+        return len(self.out_targets)
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 1, self.num_nodes, self.num_edges))
+            for values, dtype in ((self.out_offsets, np.int64), (self.in_offsets, np.int64),
+                                  (self.out_targets, np.uint32), (self.in_sources, np.uint32)):
+                f.write(np.asarray(values, dtype=dtype).tobytes())
+        with open(path + '.urls.tmp', 'w', encoding='utf-8') as f:
+            for url in self.urls:
+                f.write(url + '\n')
+        os.replace(path + '.urls.tmp', path + '.urls')
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        with open(path, 'rb') as f:
+            magic, version, n, m = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a link graph file")
+        with open(path + '.urls', 'r', encoding='utf-8') as f:
+            urls = f.read().split('\n')[:n]
+        arrays = []
+        offset = HEADER.size
+        for dtype, count in ((np.int64, n + 1), (np.int64, n + 1), (np.uint32, m), (np.uint32, m)):
+            if mmap:
+                arrays.append(np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,)) if count else np.zeros(0, dtype))
+            else:
+                arrays.append(np.fromfile(path, dtype=dtype, count=count, offset=offset))
+            offset += count * np.dtype(dtype).itemsize
+        out_offsets, in_offsets, out_targets, in_sources = arrays
+        return cls(urls, out_offsets, out_targets, in_offsets, in_sources)
+
+    def id_of(self, url):
+        if self.ids is None:
+            self.ids = {u: node for node, u in enumerate(self.urls)}
+        return self.ids.get(url)
+
+    def out_links(self, node):
+        return self.out_targets[self.out_offsets[node]:self.out_offsets[node + 1]]
+
+    def in_links(self, node):
+        return self.in_sources[self.in_offsets[node]:self.in_offsets[node + 1]]
+
+    def out_degree(self):
+        return np.diff(self.out_offsets)
+
+    def in_degree(self):
+        return np.diff(self.in_offsets)
+
+    def out_link_urls(self, url):
+        node = self.id_of(url)
+        return [] if node is None else [self.urls[i] for i in self.out_links(node)]
+
+    def in_link_urls(self, url):
+        node = self.id_of(url)
+        return [] if node is None else [self.urls[i] for i in self.in_links(node)]
+
+    def adjacency(self, direction='in'):
+        """dict-like url -> list of urls view, for code written against the old in/out link dicts."""
+        return AdjacencyView(self, direction)
+
+
+class AdjacencyView:
+    def __init__(self, graph, direction):
+        self.lookup = graph.in_link_urls if direction == 'in' else graph.out_link_urls
+        self.graph = graph
+
+    def get(self, url, default=None):
+        if self.graph.id_of(url) is None:
+            return default
+        return self.lookup(url)
+
+    def __getitem__(self, url):
+        if self.graph.id_of(url) is None:
+            raise KeyError(url)
+        return self.lookup(url)
+
+    def __contains__(self, url):
+        return self.graph.id_of(url) is not None
@@ -0,0 +1,186 @@
+import heapq
+import itertools
+import time
+from collections import deque
+from threading import Condition
+from urllib.parse import urlparse
+
+
+class MemoryFrontQueue:
+    """Default in-memory priority front queue; DiskSpillingFrontier has the same interface."""
+
+    def __init__(self):
+        self.heap = []  # (priority, seq, url), lower priority value is fetched first
+        self.seq = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def empty(self):
+        return not self.heap
+
+    def push(self, priority, url):
+        heapq.heappush(self.heap, (priority, next(self.seq), url))
+
+    def pop(self):
+        priority, _, url = heapq.heappop(self.heap)
+        return priority, url
+
+
+class MercatorFrontier:
+    """
+    Mercator-style frontier. URLs enter a priority front queue; a bounded set of per-host back queues
+    is refilled from it, and a heap keyed by each host's next allowed fetch time picks the next host.
+    `get` checks a host out, and the caller hands it back with `release` once the fetch is done, so a
+    host is never fetched by two workers at once. Dequeue costs O(log hosts) and every method is thread safe.
+    With `group_of` (host -> politeness group, e.g. dns_cache.DnsCache.group_of) back queues, delays and
+    checkouts are per group instead, and the "host" `get` returns is the group. A host's group is looked
+    up outside the frontier lock (it may wait on DNS) and pinned when its first url is added, so its urls
+    never split across two groups. Dropping stays per host.
+    """
+
+    def __init__(self, num_back_queues=32, politeness_delay=1.0, front_queue=None, max_back_queue_len=1000, group_of=None):
+        self.front = front_queue if front_queue is not None else MemoryFrontQueue()
+        self.back_queues = {}  # host -> deque of urls, at most max_back_queue_len each
+        self.ready_heap = []  # (next_fetch_time, host) for hosts with queued urls that are not checked out
+        self.checked_out = set()
+        self.parked = set()  # Hosts released with park=True, their back queues don't count against num_back_queues
+        self.dropped_hosts = set()  # Hosts given up on, their urls are discarded
+        self.next_fetch_time = {}  # host -> earliest time it may be fetched again, kept after its back queue is dropped
+        self.num_back_queues = num_back_queues
+        self.politeness_delay = politeness_delay
+        self.max_back_queue_len = max_back_queue_len
+        self.group_of = group_of
+        self.host_groups = {}  # host -> its pinned politeness group
+        self.cond = Condition()
+
+    def __len__(self):
+        with self.cond:
+            return len(self.front) + sum(len(q) for q in self.back_queues.values())
+
+    @staticmethod
+    def host_of(url):
+        return urlparse(url).netloc
+
+    def key_of(self, host):
+        """Back queue key of a host: the host itself, or its politeness group (pinned, once it has one)."""
+        if not self.group_of:
+            return host
+        group = self.host_groups.get(host)
+        return group if group is not None else self.group_of(host)
+
+    def add(self, url, priority):
+        """Queue the url; returns False if its host was dropped."""
+        host = self.host_of(url)
+        group = self.group_of(host) if self.group_of and host not in self.host_groups else None
+        with self.cond:
+            if host in self.dropped_hosts:
+                return False
+            if group is not None:
+                self.host_groups.setdefault(host, group)
+            key = self.key_of(host)
+            if key in self.back_queues and len(self.back_queues[key]) < self.max_back_queue_len:
+                # Host already has a back queue, keep its urls together
+                self._append(key, host, url)
+            else:
+                self.front.push(priority, url)
+                self._refill()
+            self.cond.notify()
+            return True
+
+    def _refill(self):
+        # Move urls from the front queue into back queues until every back queue slot is in use.
+        # Urls whose back queue is full go back to the front queue; the scan gives up after
+        # num_back_queues of them so a front queue full of such urls isn't walked on every add.
+        held = []
+        while not self.front.empty() and len(self.back_queues) - len(self.parked) < self.num_back_queues:
+            priority, url = self.front.pop()
+            host = self.host_of(url)
+            if host in self.dropped_hosts:
+                continue
+            key = self.key_of(host)
+            if key in self.back_queues:
+                if len(self.back_queues[key]) >= self.max_back_queue_len:
+                    held.append((priority, url))
+                    if len(held) >= self.num_back_queues:
+                        break
+                    continue
+                self._append(key, host, url)
+                continue
+            self.back_queues[key] = deque()
+            self._append(key, host, url)
+            heapq.heappush(self.ready_heap, (self.next_fetch_time.get(key, 0), key))
+        for priority, url in held:
+            self.front.push(priority, url)
+
+    def _append(self, key, host, url):
+        self.back_queues[key].append(url)
+        if self.group_of:
+            self.host_groups.setdefault(host, key)
+
+    def get(self, timeout=None):
+        """Return the next (url, host) whose host may be fetched now, or None if the frontier is drained."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.cond:
+            while True:
+                if self.ready_heap:
+                    ready_at, host = self.ready_heap[0]
+                    wait = ready_at - time.time()
+                    if wait <= 0:
+                        heapq.heappop(self.ready_heap)
+                        self.checked_out.add(host)
+                        if host in self.parked:
+                            # The park is over, the host takes a regular slot again
+                            self.parked.discard(host)
+                        return self.back_queues[host].popleft(), host
+                elif not self.checked_out:
+                    # Nothing queued and nobody fetching who could add more
+                    return None
+                else:
+                    wait = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.cond.wait(wait)
+
+    def release(self, host, delay=None, fetched=True, park=False):
+        """
+        Hand a checked-out host back; it becomes ready again after `delay` (default politeness delay).
+        Pass fetched=False when the url was skipped without a request so the host keeps its current slot.
+        With park=True (a long delay, e.g. an open circuit) the host's back queue stops counting against
+        num_back_queues, so another host is refilled in its place meanwhile.
+        """
+        with self.cond:
+            self.checked_out.discard(host)
+            if fetched or park:
+                delay = self.politeness_delay if delay is None else max(delay, self.politeness_delay)
+                self.next_fetch_time[host] = time.time() + delay
+            self.next_fetch_time.setdefault(host, 0)
+            if self.back_queues.get(host):
+                heapq.heappush(self.ready_heap, (self.next_fetch_time[host], host))
+                if park:
+                    self.parked.add(host)
+                    self._refill()
+            else:
+                self.back_queues.pop(host, None)
+                self._refill()
+            self.cond.notify_all()
+
+    def drop(self, host):
+        """
+        Give up on a host whose back queue is checked out: its urls are taken out of that queue, and
+        those still in the front queue or added later are skipped. The back queue itself (shared with the
+        rest of the host's group) is still handed back with `release`. Returns the number of urls discarded here.
+        """
+        with self.cond:
+            self.dropped_hosts.add(host)
+            queue = self.back_queues.get(self.key_of(host))
+            if not queue:
+                return 0
+            kept = deque(url for url in queue if self.host_of(url) != host)
+            dropped = len(queue) - len(kept)
+            queue.clear()
+            queue.extend(kept)
+            return dropped
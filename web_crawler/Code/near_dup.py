@@ -0,0 +1,77 @@
+import hashlib
+import re
+from threading import Lock
+
+import numpy as np
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def simhash(text, shingle_size=3):
+    """64-bit SimHash over word shingles of the text."""
+    tokens = TOKEN_RE.findall(text.lower())
+    if len(tokens) < shingle_size:
+        shingles = [' '.join(tokens)]
+    else:
+        shingles = {' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)}
+    hashes = np.frombuffer(b''.join(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in shingles), dtype=np.uint8)
+    # One row of 64 bits per shingle; a fingerprint bit is set when most shingles have it set
+    bits = np.unpackbits(hashes.reshape(-1, 8), axis=1, bitorder='little')
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority, bitorder='little').tobytes(), 'little')
+
+
+class NearDuplicateDetector:
+    """
+    SimHash fingerprints in a banded LSH index. The 64 bits are cut into `max_distance + 1` bands, so
+    any two fingerprints within `max_distance` bits share at least one band exactly (pigeonhole) and a
+    lookup only compares against the few documents in the matching band buckets.
+    """
+
+    def __init__(self, max_distance=3, shingle_size=3, min_tokens=30):
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.min_tokens = min_tokens  # Very short pages collide too easily, they are never flagged
+        self.num_bands = max_distance + 1
+        self.band_bits = 64 // self.num_bands
+        self.bands = [{} for _ in range(self.num_bands)]  # band value -> [(fingerprint, doc id)]
+        self.lock = Lock()
+        self.documents = 0
+        self.duplicates = 0
+
+    def _band_values(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (i * self.band_bits)) & mask for i in range(self.num_bands)]
+
+    def find(self, fingerprint):
+        """Doc id of an indexed near-duplicate of the fingerprint, or None."""
+        for band, value in zip(self.bands, self._band_values(fingerprint)):
+            for other, doc_id in band.get(value, ()):
+                if bin(fingerprint ^ other).count('1') <= self.max_distance:
+                    return doc_id
+        return None
+
+    def fingerprint(self, text):
+        """SimHash of the text, None if it is too short to be flagged."""
+        if len(TOKEN_RE.findall(text)) < self.min_tokens:
+            return None
+        return simhash(text, self.shingle_size)
+
+    def check_and_add(self, doc_id, text, fingerprint=None):
+        """
+        Return the doc id this text duplicates, or index it under `doc_id` and return None.
+        A `fingerprint` already computed with `fingerprint(text)` is used instead of hashing the text again.
+        """
+        if fingerprint is None:
+            fingerprint = self.fingerprint(text)
+        if fingerprint is None:
+            return None
+        with self.lock:
+            original = self.find(fingerprint)
+            if original is not None:
+                self.duplicates += 1
+                return original
+            for band, value in zip(self.bands, self._band_values(fingerprint)):
+                band.setdefault(value, []).append((fingerprint, doc_id))
+            self.documents += 1
+            return None
@@ -0,0 +1,181 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from threading import Condition, Lock, Thread
+from urllib.parse import urlparse
+
+from craw_new import Crawler, extract_keyword
+from html_parse import parse_html
+
+SKIP_TAGS = ("script", "style", "header")
+
+
+class PipelinedCrawler(Crawler):
+    """
+    craw_new.Crawler split into stages joined by bounded queues:
+
+        fetch threads -> fetched queue -> parse threads -> process pool -> store queue -> writer thread
+
+    Fetch threads only do network I/O, parsing runs in `parse_workers` processes so it no longer holds the
+    GIL against the fetchers, and a single writer appends documents in batches. A full queue blocks the
+    stage in front of it, so a slow disk or a busy pool slows fetching instead of piling pages up in
+    memory. Each stage is sized on its own; queue depths and pages in the pool are reported as metric
+    gauges (fetched_queue_depth, parsing, store_queue_depth).
+    """
+
+    def __init__(self, seed_urls, max_documents, output_dir, keywords, fetch_threads=16, parse_workers=None,
+                 parse_threads=None, fetch_queue_size=64, store_queue_size=64, write_batch=32, **crawler_kwargs):
+        super().__init__(seed_urls, max_documents, output_dir, keywords, **crawler_kwargs)
+        self.fetch_threads = fetch_threads
+        self.parse_workers = parse_workers or os.cpu_count()
+        # Two submitters per process keep every process busy while the other page's links are queued
+        self.parse_threads = parse_threads or 2 * self.parse_workers
+        self.write_batch = write_batch
+        self.fetched = queue.Queue(fetch_queue_size)
+        self.to_store = queue.Queue(store_queue_size)
+        self.in_flight = 0  # Pages fetched whose links are not in the frontier yet
+        self.in_flight_lock = Lock()
+        self.parsed = Condition(self.in_flight_lock)  # Notified when a page's links are queued or it leaves in_flight
+        self.parsing = 0
+        self.metrics.gauge('fetched_queue_depth', self.fetched.qsize)
+        self.metrics.gauge('parsing', lambda: self.parsing)
+        self.metrics.gauge('store_queue_depth', self.to_store.qsize)
+
+    def crawl_threads(self):
+        # forkserver: forking this process would copy its locks while the fetch threads hold them
+        context = multiprocessing.get_context('forkserver')
+        with ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context) as pool:
+            fetchers = [Thread(target=self.fetch_stage) for _ in range(self.fetch_threads)]
+            parsers = [Thread(target=self.parse_stage, args=(pool,)) for _ in range(self.parse_threads)]
+            writer = Thread(target=self.write_stage)
+            for thread in fetchers + parsers + [writer]:
+                thread.start()
+            for thread in fetchers:
+                thread.join()
+            for _ in parsers:
+                self.fetched.put(None)
+            for thread in parsers:
+                thread.join()
+            self.to_store.put(None)
+            writer.join()
+
+    def next_url(self):
+        while not self.done():
+            entry = self.frontier.get_next_url(timeout=0.2)
+            if entry:
+                return entry
+            # Drained only if no host is being fetched and no fetched page still has links to add. Under the
+            # lock a zero count means every counted page's links are already queued, and fetch_stage counts a
+            # page before it hands the host back
+            with self.in_flight_lock:
+                if len(self.frontier.queue) == 0 and not self.frontier.queue.checked_out:
+                    if self.in_flight == 0:
+                        return None
+                    # get() returns at once on an empty frontier, wait for the parse stage to queue links
+                    self.parsed.wait(0.2)
+        return None
+
+    def fetch_stage(self):
+        while True:
+            with self.metrics.timer('politeness_wait_seconds'):
+                next_entry = self.next_url()
+            if not next_entry:
+                break
+            current_url, domain = next_entry
+            if self.done():
+                self.release_host(current_url, domain, False)
+                break
+            response, fetched = None, False
+            try:
+                if self.should_fetch(current_url, urlparse(current_url).netloc):
+                    fetched = True
+                    response = self.fetch(current_url)
+                    if response is not None:
+                        with self.in_flight_lock:
+                            self.in_flight += 1
+            finally:
+                self.release_host(current_url, domain, fetched)
+            if response is not None:
+                self.fetched.put((current_url, response))  # Blocks while the parse stage is behind
+            else:
+                self.url_done(current_url)
+            if fetched:
+                with self.lock:
+                    self.wavenumber += 1
+
+    def parse_stage(self, pool):
+        while True:
+            item = self.fetched.get()
+            if item is None:
+                return
+            current_url, response = item
+            try:
+                started = time.perf_counter()
+                with self.in_flight_lock:
+                    self.parsing += 1
+                try:
+                    page = pool.submit(parse_html, response.text, self.html_parser, SKIP_TAGS).result()
+                finally:
+                    with self.in_flight_lock:
+                        self.parsing -= 1
+                self.metrics.observe('parse_seconds', time.perf_counter() - started)
+                self.enqueue_links(current_url, page)
+                with self.parsed:
+                    self.parsed.notify_all()
+                self.to_store.put((current_url, response, page))  # Blocks while the writer is behind
+            except Exception as e:
+                self.metrics.record_error('parse_error')
+                logging.error(f"Failed to parse {current_url}: {e}")
+                self.url_done(current_url)
+            finally:
+                with self.in_flight_lock:
+                    self.in_flight -= 1
+                    self.parsed.notify_all()
+
+    def write_stage(self):
+        finished = False
+        while not finished:
+            batch = [self.to_store.get()]
+            while len(batch) < self.write_batch:
+                try:
+                    batch.append(self.to_store.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is None:
+                    finished = True
+                elif not self.done():  # Pages still queued when the budget runs out are dropped, a resumed crawl refetches them
+                    current_url, response, page = item
+                    self.handle_page(current_url, response, page)
+                    self.url_done(current_url)
+            if self.doc_store is not None:
+                self.doc_store.flush()  # One flush per batch, not per document
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description="Crawl with separate fetch, parse and write stages.")
+    parser.add_argument('--fetch-threads', type=int, default=16)
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count(), help="parse processes")
+    parser.add_argument('--fetch-queue', type=int, default=64, help="fetched pages waiting for the parse stage")
+    parser.add_argument('--store-queue', type=int, default=64, help="parsed pages waiting for the writer")
+    parser.add_argument('--write-batch', type=int, default=32)
+    parser.add_argument('--max-documents', type=int, default=100000)
+    parser.add_argument('--doc-store', action='store_true')
+    parser.add_argument('--resume', action='store_true', help="continue the crawl checkpointed in the output directory")
+    parser.add_argument('--output', default='./Results/')
+    parser.add_argument('seeds', nargs='*', default=["http://en.wikipedia.org/wiki/Cold_War",
+                                                     "http://www.historylearningsite.co.uk/coldwar.htm",
+                                                     "http://en.wikipedia.org/wiki/Sino-Soviet_split",
+                                                     "https://www.marxists.org/history/international/comintern/sino-soviet-split/"])
+    args = parser.parse_args()
+    keywords = list({keyword.lower() for url in args.seeds for keyword in extract_keyword(url)})
+    crawler = PipelinedCrawler(args.seeds, args.max_documents, args.output, keywords, fetch_threads=args.fetch_threads,
+                               parse_workers=args.parse_workers, fetch_queue_size=args.fetch_queue,
+                               store_queue_size=args.store_queue, write_batch=args.write_batch, use_doc_store=args.doc_store, resume=args.resume)
+    crawler.start_crawling()
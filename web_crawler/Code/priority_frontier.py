@@ -0,0 +1,100 @@
+class IndexedPriorityQueue:
+    """
+    Binary min-heap with a key -> heap position index, so an entry's priority can be changed in place
+    instead of pushing a duplicate. Holds exactly one entry per key; lower priority values pop first.
+    """
+
+    def __init__(self):
+        self.heap = []  # [priority, key, item]
+        self.position = {}  # key -> index in heap
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, key):
+        return key in self.position
+
+    def empty(self):
+        return not self.heap
+
+    def get(self, key, default=None):
+        index = self.position.get(key)
+        return default if index is None else self.heap[index][2]
+
+    def items(self):
+        """All queued items, in heap (not priority) order."""
+        return [entry[2] for entry in self.heap]
+
+    def peek_priority(self):
+        return self.heap[0][0]
+
+    def push(self, key, item, priority):
+        """Add a new key, or move an existing key to `priority` and replace its item."""
+        if key in self.position:
+            index = self.position[key]
+            self.heap[index][2] = item
+            self.update(key, priority)
+            return
+        self.heap.append([priority, key, item])
+        self.position[key] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def update(self, key, priority):
+        index = self.position[key]
+        old_priority = self.heap[index][0]
+        self.heap[index][0] = priority
+        if priority < old_priority:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
+
+    def pop(self):
+        """Remove and return the item with the lowest priority value."""
+        top = self.heap[0]
+        last = self.heap.pop()
+        del self.position[top[1]]
+        if self.heap:
+            self.heap[0] = last
+            self.position[last[1]] = 0
+            self._sift_down(0)
+        return top[2]
+
+    def remove_worst(self, count):
+        """Remove the `count` entries with the highest priority values, returned as sorted [priority, key, item]."""
+        entries = sorted(self.heap, key=lambda entry: entry[0])
+        keep = len(entries) - count
+        self.heap = entries[:keep]  # A sorted list is already a valid heap
+        self.position = {entry[1]: index for index, entry in enumerate(self.heap)}
+        return entries[keep:]
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.position[heap[i][1]] = i
+        self.position[heap[j][1]] = j
+
+    def _sift_up(self, index):
+        heap = self.heap
+        while index > 0:
+            parent = (index - 1) // 2
+            if heap[index][0] < heap[parent][0]:
+                self._swap(index, parent)
+                index = parent
+            else:
+                break
+
+    def _sift_down(self, index):
+        heap = self.heap
+        size = len(heap)
+        while True:
+            smallest = index
+            left = 2 * index + 1
+            right = left + 1
+            if left < size and heap[left][0] < heap[smallest][0]:
+                smallest = left
+            if right < size and heap[right][0] < heap[smallest][0]:
+                smallest = right
+            if smallest == index:
+                return
+            self._swap(index, smallest)
+            index = smallest
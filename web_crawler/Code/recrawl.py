@@ -0,0 +1,159 @@
+import ast
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from threading import Lock
+from doc_store import SegmentedDocStore
+
+DOCNO_RE = re.compile(r'<DOCNO>(.*?)</DOCNO>')
+TEXT_RE = re.compile(r'<TEXT>(.*?)</TEXT>', re.DOTALL)
+
+
+def header_value(headers, name):
+    """Case-insensitive header lookup on a plain dict."""
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class HeaderIndex:
+    """
+    Per-url validators (ETag / Last-Modified), output document number, content hash and revisit schedule
+    for craw_new's output directory. Each revisit updates an estimate of how often the page changes
+    (changes per second of observation), and the next visit is scheduled about one expected change later,
+    clamped to [min_interval, max_interval].
+    """
+
+    def __init__(self, path, min_interval=6 * 3600, max_interval=90 * 24 * 3600):
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.entries = {}  # url -> dict
+        self.lock = Lock()
+        self.not_modified = 0
+        self.changed = 0
+        self.on_update = None  # callable(url, entry) after every change, e.g. to log it to a checkpoint
+
+    @classmethod
+    def load_or_build(cls, output_dir, rebuild=True, **kwargs):
+        """
+        Load output_dir/header_index.json, or rebuild it from the documents/ and headers/ files of an earlier
+        crawl. With rebuild=False a missing file gives an empty index (a resumed crawl restores its entries
+        from the checkpoint log instead).
+        """
+        index = cls(os.path.join(output_dir, "header_index.json"), **kwargs)
+        if os.path.exists(index.path):
+            with open(index.path, 'r', encoding='utf-8') as f:
+                index.entries = json.load(f)
+        elif rebuild:
+            index.build_from_output(output_dir)
+        return index
+
+    def build_from_output(self, output_dir):
+        store_path = os.path.join(output_dir, "doc_store")
+        if os.path.isdir(store_path):
+            self.build_from_store(SegmentedDocStore(store_path))
+        documents_path = os.path.join(output_dir, "documents")
+        headers_path = os.path.join(output_dir, "headers")
+        for filename in os.listdir(documents_path):
+            if not filename.startswith('document_') or not filename.endswith('.txt'):
+                continue
+            doc_number = int(filename[len('document_'):-len('.txt')])
+            with open(os.path.join(documents_path, filename), 'r', encoding='utf-8') as f:
+                content = f.read()
+            match = DOCNO_RE.search(content)
+            text_match = TEXT_RE.search(content)
+            if not match or not text_match:
+                continue
+            headers = {}
+            header_file = os.path.join(headers_path, f"headers_{doc_number}.txt")
+            try:
+                with open(header_file, 'r', encoding='utf-8') as f:
+                    headers = ast.literal_eval(f.read())  # Written as str() of the response headers dict
+            except (FileNotFoundError, ValueError, SyntaxError):
+                logging.warning(f"Could not read {header_file}, {match.group(1)} will be fetched unconditionally")
+            fetched_at = os.path.getmtime(os.path.join(documents_path, filename))
+            self.record_fetch(match.group(1).strip(), headers, doc_number, content_hash(text_match.group(1)), fetched_at)
+        logging.info(f"Header index rebuilt from {output_dir}: {len(self.entries)} urls")
+
+    def build_from_store(self, store):
+        fetched_at = os.path.getmtime(store.index_path)  # Records carry no fetch time, use the store's
+        for record in store.scan():
+            self.record_fetch(record["docno"], record["headers"], record["doc_number"], content_hash(record["text"]), fetched_at)
+        store.close()
+
+    def record_fetch(self, url, headers, doc_number, text_hash, fetched_at=None):
+        """Remember validators and content hash of a freshly written document."""
+        now = fetched_at or time.time()
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                entry = self.entries[url] = {"first_seen": now, "checks": 0, "changes": 0}
+            entry.update({
+                "etag": header_value(headers, 'ETag'),
+                "last_modified": header_value(headers, 'Last-Modified'),
+                "doc_number": doc_number,
+                "hash": text_hash,
+                "fetched_at": now,
+            })
+            entry.setdefault("next_visit", now + self.min_interval)
+            if self.on_update:
+                self.on_update(url, dict(entry))
+
+    def conditional_headers(self, url):
+        entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers['If-None-Match'] = entry["etag"]
+            if entry.get("last_modified"):
+                headers['If-Modified-Since'] = entry["last_modified"]
+        return headers
+
+    def doc_number(self, url):
+        entry = self.entries.get(url)
+        return entry["doc_number"] if entry else None
+
+    def is_changed(self, url, text):
+        entry = self.entries.get(url)
+        return entry is None or entry.get("hash") != content_hash(text)
+
+    def record_revisit(self, url, changed):
+        """Update the change-rate estimate after a revisit and schedule the next one."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return
+            entry["checks"] += 1
+            if changed:
+                entry["changes"] += 1
+                self.changed += 1
+            else:
+                self.not_modified += 1
+            observed = max(now - entry["first_seen"], self.min_interval)
+            rate = (entry["changes"] + 0.5) / observed  # +0.5 keeps never-changed pages on a finite schedule
+            entry["next_visit"] = now + min(max(1 / rate, self.min_interval), self.max_interval)
+            if self.on_update:
+                self.on_update(url, dict(entry))
+
+    def due_urls(self, now=None):
+        now = now or time.time()
+        return sorted((url for url, entry in self.entries.items() if entry.get("next_visit", 0) <= now),
+                      key=lambda url: self.entries[url]["next_visit"])
+
+    def save(self):
+        with self.lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
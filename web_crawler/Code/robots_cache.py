@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from threading import Lock
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+
+def urllib_fetch(robots_url, timeout):
+    """Default fetcher: (status_code, text) for a robots.txt url, with a real timeout unlike RobotFileParser.read()."""
+    try:
+        with urllib.request.urlopen(robots_url, timeout=timeout) as response:
+            return response.status, response.read().decode('utf-8', 'ignore')
+    except urllib.error.HTTPError as e:
+        return e.code, ''
+
+
+def session_fetcher(session):
+    """Fetcher backed by a requests.Session, so robots.txt reuses the crawler's connections and headers."""
+    def fetch(robots_url, timeout):
+        response = session.get(robots_url, timeout=timeout)
+        response.encoding = 'utf-8'
+        return response.status_code, response.text
+    return fetch
+
+
+class RobotsCache:
+    """
+    Shared robots.txt cache keyed by origin (scheme://host). Fetches run on a small thread pool with a
+    timeout, concurrent lookups of the same origin share one in-flight fetch, and entries expire after
+    `ttl` seconds. `prefetch` is meant to be called when a host first shows up in the frontier so the
+    parser is usually ready before the host's first url is dequeued; at most `max_pending` prefetches are
+    queued, and a lookup whose fetch is still queued runs it inline. The cache can be saved to and
+    loaded from a json file across restarts.
+    """
+
+    def __init__(self, ttl=24 * 3600, error_ttl=3600, timeout=5, fetch=urllib_fetch, cache_path=None, max_workers=8,
+                 max_pending=None):
+        self.ttl = ttl
+        self.error_ttl = error_ttl  # Unreachable robots.txt is retried sooner
+        self.timeout = timeout
+        self.fetch = fetch
+        self.cache_path = cache_path
+        self.entries = {}  # origin -> (fetched_at, status, robots text)
+        self.parsers = {}  # origin -> RobotFileParser built from the entry
+        self.in_flight = {}  # origin -> Future
+        self.max_pending = max_pending or max_workers * 16  # Bound on queued prefetches, lookups fetch on demand past it
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='robots')
+        if cache_path and os.path.exists(cache_path):
+            self.load(cache_path)
+
+    @staticmethod
+    def origin(url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _expired(self, fetched_at, status):
+        return time.time() - fetched_at >= (self.error_ttl if status is None else self.ttl)
+
+    def _fresh(self, origin):
+        entry = self.entries.get(origin)
+        return entry is not None and not self._expired(entry[0], entry[1])
+
+    def prefetch(self, url):
+        """Start fetching the url's robots.txt in the background unless it is cached or already in flight."""
+        origin = self.origin(url)
+        if origin in self.parsers and self._fresh(origin):
+            return
+        if len(self.in_flight) >= self.max_pending:
+            return
+        self._submit(origin)
+
+    def _submit(self, origin):
+        with self.lock:
+            future = self.in_flight.get(origin)
+            if future is None:
+                future = self.executor.submit(self._load_origin, origin)
+                self.in_flight[origin] = future
+            return future
+
+    def _load_origin(self, origin):
+        robots_url = f"{origin}/robots.txt"
+        try:
+            status, text = self.fetch(robots_url, self.timeout)
+        except Exception as e:
+            logging.error(f"Failed to fetch or parse {robots_url}: {e}")
+            status, text = None, ''
+        parser = self._build_parser(status, text)
+        with self.lock:
+            self.entries[origin] = (time.time(), status, text)
+            self.parsers[origin] = parser
+            self.in_flight.pop(origin, None)
+        return parser
+
+    @staticmethod
+    def _build_parser(status, text):
+        # Same status handling as RobotFileParser.read(): 401/403 block the site, other errors allow everything
+        parser = RobotFileParser()
+        if status in (401, 403):
+            parser.disallow_all = True
+        elif status is None or status >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(text.splitlines())
+        parser.modified()
+        return parser
+
+    def _load_inline(self, origin, queued):
+        # The queued fetch was cancelled before a pool worker got to it; other waiters pick up `claim` instead
+        claim = Future()
+        claim.set_running_or_notify_cancel()
+        with self.lock:
+            if self.in_flight.get(origin) is queued:
+                self.in_flight[origin] = claim
+        try:
+            parser = self._load_origin(origin)
+        except Exception as e:
+            claim.set_exception(e)
+            raise
+        claim.set_result(parser)
+        return parser
+
+    def get_parser(self, url):
+        """
+        Return the RobotFileParser for the url's origin, fetching (or waiting on the in-flight fetch) if needed.
+        None if the fetch did not finish in time.
+        """
+        origin = self.origin(url)
+        parser = self.parsers.get(origin)
+        if parser is not None and self._fresh(origin):
+            return parser
+        while True:
+            future = self._submit(origin)
+            if future.cancel():
+                # Still queued behind other prefetches, fetch it on this thread rather than wait for a worker
+                return self._load_inline(origin, future)
+            try:
+                return future.result(timeout=self.timeout * 2)
+            except CancelledError:
+                continue  # Another lookup took over the queued fetch, wait on its claim
+            except Exception as e:
+                logging.error(f"robots.txt lookup for {origin} did not finish: {e}")
+                return parser  # A stale parser if there is one, otherwise None
+
+    def can_fetch(self, url, user_agent='*'):
+        """Whether robots.txt allows the url; False if its robots.txt could not be looked up in time."""
+        parser = self.get_parser(url)
+        return parser is not None and parser.can_fetch(user_agent, url)
+
+    def crawl_delay(self, url, user_agent='*'):
+        """Robots crawl-delay for the url's origin, None if not cached yet (never blocks)."""
+        parser = self.parsers.get(self.origin(url))
+        return parser.crawl_delay(user_agent) if parser else None
+
+    def save(self, path=None):
+        path = path or self.cache_path
+        with self.lock:
+            data = {origin: list(entry) for origin, entry in self.entries.items()}
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self.lock:
+            for origin, (fetched_at, status, text) in data.items():
+                if not self._expired(fetched_at, status):
+                    self.entries[origin] = (fetched_at, status, text)
+                    self.parsers[origin] = self._build_parser(status, text)
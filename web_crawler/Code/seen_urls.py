@@ -0,0 +1,213 @@
+import hashlib
+import math
+import struct
+from threading import Lock
+
+import numpy as np
+
+
+def url_fingerprint(url):
+    """64-bit fingerprint of a url, 0 is reserved as the empty slot marker."""
+    fingerprint = int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+    return fingerprint or 1
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, url):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        # Kirsch-Mitzenmacher double hashing
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, url):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(url))
+
+    def add(self, url):
+        """Set the url's bits, return True if it was not already (probably) present."""
+        bits = self.bits
+        added = False
+        for p in self._positions(url):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that adds a larger, tighter filter each time the current one fills up, so the
+    overall false-positive rate stays under `error_rate` however many urls are added.
+    """
+
+    MAGIC = b'SBF1'
+
+    def __init__(self, initial_capacity=1000000, error_rate=0.001, growth=2, tightening=0.5):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = []
+        self.lock = Lock()
+
+    def __len__(self):
+        return sum(f.count for f in self.filters)
+
+    def __contains__(self, url):
+        return any(url in f for f in self.filters)
+
+    def add(self, url):
+        with self.lock:
+            if url in self:
+                return
+            if not self.filters or self.filters[-1].count >= self.filters[-1].capacity:
+                capacity = self.initial_capacity * self.growth ** len(self.filters)
+                error_rate = self.error_rate * (1 - self.tightening) * self.tightening ** len(self.filters)
+                self.filters.append(BloomFilter(capacity, error_rate))
+            self.filters[-1].add(url)
+
+    def save(self, path):
+        with self.lock, open(path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack('<QddI', self.initial_capacity, self.growth, self.tightening, len(self.filters)))
+            f.write(struct.pack('<d', self.error_rate))
+            for bloom in self.filters:
+                f.write(struct.pack('<QdQQI', bloom.capacity, bloom.error_rate, bloom.count, bloom.num_bits, bloom.num_hashes))
+                f.write(bloom.bits)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(4) != cls.MAGIC:
+                raise ValueError(f"{path} is not a scalable bloom filter file")
+            initial_capacity, growth, tightening, num_filters = struct.unpack('<QddI', f.read(struct.calcsize('<QddI')))
+            error_rate, = struct.unpack('<d', f.read(8))
+            store = cls(initial_capacity, error_rate, growth, tightening)
+            for _ in range(num_filters):
+                capacity, bloom_error, count, num_bits, num_hashes = struct.unpack('<QdQQI', f.read(struct.calcsize('<QdQQI')))
+                bloom = BloomFilter(capacity, bloom_error)
+                bloom.num_bits, bloom.num_hashes, bloom.count = num_bits, num_hashes, count
+                bloom.bits = bytearray(f.read((num_bits + 7) // 8))
+                store.filters.append(bloom)
+        return store
+
+
+class FingerprintSet:
+    """
+    Set of 64-bit url fingerprints in a NumPy open-addressing table (8 bytes per slot, load factor
+    at most 1/2). The false-positive rate is about n / 2**64, i.e. negligible for a crawl.
+    """
+
+    MAGIC = b'FPS1'
+
+    def __init__(self, initial_capacity=1 << 20):
+        capacity = 1 << max(4, (initial_capacity * 2 - 1).bit_length())
+        self.table = np.zeros(capacity, dtype=np.uint64)
+        self.count = 0
+        self.lock = Lock()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, url):
+        table = self.table  # Readers keep working on the old table while a resize swaps it out
+        mask = len(table) - 1
+        fingerprint = url_fingerprint(url)
+        slot = fingerprint & mask
+        while True:
+            value = int(table[slot])
+            if value == fingerprint:
+                return True
+            if value == 0:
+                return False
+            slot = (slot + 1) & mask
+
+    def add(self, url):
+        fingerprint = url_fingerprint(url)
+        with self.lock:
+            if (self.count + 1) * 2 > len(self.table):
+                self.table = self._build_table(self.fingerprints(), len(self.table) * 2)
+            table = self.table
+            mask = len(table) - 1
+            slot = fingerprint & mask
+            while True:
+                value = int(table[slot])
+                if value == fingerprint:
+                    return
+                if value == 0:
+                    table[slot] = fingerprint
+                    self.count += 1
+                    return
+                slot = (slot + 1) & mask
+
+    def fingerprints(self):
+        return self.table[self.table != 0]
+
+    @staticmethod
+    def _build_table(fingerprints, capacity):
+        """Vectorized linear-probing insert of distinct fingerprints into a fresh table."""
+        table = np.zeros(capacity, dtype=np.uint64)
+        mask = np.uint64(capacity - 1)
+        pending = fingerprints
+        slots = pending & mask
+        while pending.size:
+            free = table[slots] == 0
+            # Where several pending fingerprints want the same free slot only the last write wins,
+            # the others see the slot taken and probe onwards next round.
+            table[slots[free]] = pending[free]
+            placed = table[slots] == pending
+            pending = pending[~placed]
+            slots = (slots[~placed] + np.uint64(1)) & mask
+        return table
+
+    def save(self, path):
+        """Only the sorted fingerprints are written, 8 bytes per url."""
+        with self.lock, open(path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack('<Q', self.count))
+            f.write(np.sort(self.fingerprints()).astype('<u8').tobytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(4) != cls.MAGIC:
+                raise ValueError(f"{path} is not a url fingerprint file")
+            count, = struct.unpack('<Q', f.read(8))
+            fingerprints = np.frombuffer(f.read(count * 8), dtype='<u8').astype(np.uint64)
+        store = cls(max(count, 1))
+        store.table = cls._build_table(fingerprints, len(store.table))
+        store.count = count
+        return store
+
+
+def make_seen_store(kind='set', capacity=1000000, error_rate=0.001):
+    """Visited-url store for the crawlers: 'set' (exact, plain python), 'bloom' or 'fingerprint'."""
+    if kind == 'set':
+        return set()
+    if kind == 'bloom':
+        return ScalableBloomFilter(capacity, error_rate)
+    if kind == 'fingerprint':
+        return FingerprintSet(capacity)
+    raise ValueError(f"Unknown seen-url store: {kind}")
+
+
+def load_seen_store(path):
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic == ScalableBloomFilter.MAGIC:
+        return ScalableBloomFilter.load(path)
+    if magic == FingerprintSet.MAGIC:
+        return FingerprintSet.load(path)
+    raise ValueError(f"Unknown seen-url store file: {path}")
@@ -0,0 +1,229 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import zlib
+from threading import Event, Lock, Thread
+from urllib.parse import urlparse
+
+import numpy as np
+
+from craw_new import Crawler, extract_keyword
+from link_graph import LinkGraph, LinkGraphBuilder
+
+
+def shard_of(url, num_shards):
+    """Worker that owns the url's host. crc32 rather than hash(), which differs between processes."""
+    return zlib.crc32(urlparse(url).netloc.lower().encode('utf-8')) % num_shards
+
+
+class ShardWorkerCrawler(Crawler):
+    """
+    craw_new.Crawler restricted to the hosts of one shard. Links to other shards' hosts are buffered
+    per destination and sent in batches; batches from other workers are drained into the local frontier
+    by a background thread. The crawl ends when the shared document budget is used up or the
+    coordinator sees every worker idle with no batch in flight.
+    """
+
+    def __init__(self, shard, shared, max_documents, output_dir, keywords, threads=4, batch_size=200,
+                 flush_interval=0.2, **crawler_kwargs):
+        if crawler_kwargs.get("metrics_port") is not None:
+            crawler_kwargs["metrics_port"] += shard  # One metrics endpoint per worker: port, port + 1, ...
+        # The document budget and url ownership are shared between workers, a single shard can't resume on its own
+        crawler_kwargs.setdefault("checkpoint", False)
+        super().__init__([], max_documents, output_dir, keywords, **crawler_kwargs)
+        self.shard = shard
+        self.shared = shared
+        self.num_shards = len(shared["inboxes"])
+        self.num_threads = threads
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.outboxes = [[] for _ in range(self.num_shards)]
+        self.outbox_lock = Lock()
+        self.arrived = Event()  # Set when a batch added urls, wakes crawl threads waiting for work
+
+    def done(self):
+        return self.shared["stop"].is_set() or self.shared["documents"].value >= self.max_documents
+
+    def next_document_number(self):
+        with self.shared["documents"].get_lock():
+            self.shared["documents"].value += 1
+        return super().next_document_number()
+
+    def next_url(self):
+        while not self.done():
+            entry = self.frontier.get_next_url(timeout=self.flush_interval)
+            if entry:
+                return entry
+            self.arrived.wait(self.flush_interval)  # Drained for now, other shards may still send links
+            self.arrived.clear()
+        return None
+
+    def enqueue_link(self, link, anchor_text, discovered_from):
+        shard = shard_of(link, self.num_shards)
+        if shard == self.shard:
+            super().enqueue_link(link, anchor_text, discovered_from)
+            return
+        self.frontier.add_out_link(discovered_from, link)
+        with self.outbox_lock:
+            self.outboxes[shard].append((link, anchor_text, discovered_from, self.wavenumber))
+            full = len(self.outboxes[shard]) >= self.batch_size
+        if full:
+            self.flush_outbox(shard)
+
+    def flush_outbox(self, shard):
+        with self.outbox_lock:
+            batch, self.outboxes[shard] = self.outboxes[shard], []
+        if batch:
+            with self.shared["sent"].get_lock():
+                self.shared["sent"].value += 1
+            self.shared["inboxes"][shard].put(batch)
+
+    def add_batch(self, batch):
+        for url, anchor_text, discovered_from, wave_number in batch:
+            if discovered_from is None:
+                self.frontier.add_url(url, wave_number, is_seed=True)
+            else:
+                self.frontier.add_url(url, wave_number, anchor_text=anchor_text, discovered_from=discovered_from)
+            self.prefetch_host(url)
+        self.arrived.set()
+
+    def is_idle(self):
+        with self.outbox_lock:
+            pending = any(self.outboxes)
+        return not pending and len(self.frontier.queue) == 0 and not self.frontier.queue.checked_out
+
+    def exchange(self):
+        """Background thread: receive batches, flush partial outboxes, report idleness to the coordinator."""
+        inbox = self.shared["inboxes"][self.shard]
+        while not self.done():
+            try:
+                batch = inbox.get(timeout=self.flush_interval)
+            except queue.Empty:
+                batch = None
+            if batch is not None:
+                self.add_batch(batch)
+                with self.shared["received"].get_lock():
+                    self.shared["received"].value += 1  # Only after the urls are in the frontier
+            for shard in range(self.num_shards):
+                self.flush_outbox(shard)
+            self.shared["idle"][self.shard] = self.is_idle()
+        self.shared["idle"][self.shard] = True
+
+    def run(self):
+        exchanger = Thread(target=self.exchange, daemon=True)
+        exchanger.start()
+        self.start_crawling()
+        exchanger.join()
+        if self.doc_store is not None:
+            self.doc_store.close()
+
+
+def run_worker(shard, shared, max_documents, output_dir, keywords, worker_kwargs):
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - shard {shard} - %(levelname)s - %(message)s')
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+    worker = ShardWorkerCrawler(shard, shared, max_documents, os.path.join(output_dir, f"shard_{shard:02d}"),
+                                keywords, **worker_kwargs)
+    worker.run()
+    for inbox in shared["inboxes"]:
+        inbox.cancel_join_thread()  # Nobody drains the queues after the stop, don't block exit on unsent batches
+    logging.info(f"Shard {shard} finished with {worker.documents_crawled} documents")
+
+
+class ShardedCrawl:
+    """
+    Multi-process craw_new crawl. Hosts are assigned to `num_workers` processes by a hash of the host name,
+    so each process owns the frontier, politeness state, robots cache and output directory
+    (output_dir/shard_NN) of its hosts and nothing is shared but the document counter and the link queues.
+    """
+
+    def __init__(self, seed_urls, max_documents, output_dir, keywords, num_workers=None, **worker_kwargs):
+        self.seed_urls = seed_urls
+        self.max_documents = max_documents
+        self.output_dir = output_dir
+        self.keywords = keywords
+        self.num_workers = num_workers or os.cpu_count()
+        self.worker_kwargs = worker_kwargs
+        self.check_interval = 0.5
+
+    def start_crawling(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        ctx = multiprocessing.get_context()
+        shared = {
+            "inboxes": [ctx.Queue() for _ in range(self.num_workers)],
+            "documents": ctx.Value('l', 0),
+            "sent": ctx.Value('l', 0),
+            "received": ctx.Value('l', 0),
+            "idle": ctx.Array('b', self.num_workers),
+            "stop": ctx.Event(),
+        }
+        seeds = [[] for _ in range(self.num_workers)]
+        for url in self.seed_urls:
+            seeds[shard_of(url, self.num_workers)].append((url, "", None, 0))
+        for shard, batch in enumerate(seeds):
+            if batch:
+                shared["sent"].value += 1
+                shared["inboxes"][shard].put(batch)
+
+        start = time.time()
+        workers = [ctx.Process(target=run_worker, args=(shard, shared, self.max_documents, self.output_dir,
+                                                        self.keywords, self.worker_kwargs))
+                   for shard in range(self.num_workers)]
+        for worker in workers:
+            worker.start()
+        self.wait_until_finished(shared, workers)
+        for worker in workers:
+            worker.join()
+        elapsed = time.time() - start
+        documents = shared["documents"].value
+        logging.info(f"Sharded crawl finished: {documents} documents in {elapsed:.1f}s "
+                     f"({documents / elapsed:.1f} pages/s, {self.num_workers} workers)")
+        self.merge_link_graphs()
+        return documents
+
+    def wait_until_finished(self, shared, workers):
+        previous = None
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(self.check_interval)
+            if shared["documents"].value >= self.max_documents:
+                break
+            # Quiet means every worker idle and every batch received; it has to hold for two checks in a row
+            # because an idle flag can be up to one exchange round stale
+            snapshot = (shared["sent"].value, shared["received"].value, all(shared["idle"]))
+            if snapshot[2] and snapshot[0] == snapshot[1] and snapshot == previous:
+                break
+            previous = snapshot
+        shared["stop"].set()
+
+    def merge_link_graphs(self):
+        """Combine the shards' link_graph.bin files into output_dir/link_graph.bin."""
+        merged = LinkGraphBuilder()
+        for shard in range(self.num_workers):
+            path = os.path.join(self.output_dir, f"shard_{shard:02d}", "link_graph.bin")
+            if not os.path.exists(path):
+                continue
+            graph = LinkGraph.open(path, mmap=False)
+            ids = np.array([merged.intern(url) for url in graph.urls], dtype=np.uint32)
+            sources = np.repeat(np.arange(graph.num_nodes), np.diff(graph.out_offsets))
+            merged.src.frombytes(ids[sources].tobytes())
+            merged.dst.frombytes(ids[graph.out_targets].tobytes())
+        merged.save(os.path.join(self.output_dir, "link_graph.bin"))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Crawl with one process per host shard.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', type=int, default=4, help="fetch threads per worker")
+    parser.add_argument('--max-documents', type=int, default=100000)
+    parser.add_argument('--output', default='./Results/')
+    parser.add_argument('seeds', nargs='*', default=["http://en.wikipedia.org/wiki/Cold_War",
+                                                     "http://www.historylearningsite.co.uk/coldwar.htm",
+                                                     "http://en.wikipedia.org/wiki/Sino-Soviet_split",
+                                                     "https://www.marxists.org/history/international/comintern/sino-soviet-split/"])
+    args = parser.parse_args()
+    keywords = list({keyword.lower() for url in args.seeds for keyword in extract_keyword(url)})
+    crawl = ShardedCrawl(args.seeds, args.max_documents, args.output, keywords, num_workers=args.workers, threads=args.threads)
+    crawl.start_crawling()
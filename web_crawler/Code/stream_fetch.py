@@ -0,0 +1,121 @@
+import codecs
+import re
+import time
+
+import requests
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_DEADLINE = 30
+CHUNK_SIZE = 64 * 1024
+META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+
+def is_html_type(content_type):
+    return 'text/html' in content_type or 'application/xhtml' in content_type
+
+
+def charset_from_content_type(content_type):
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            return value.strip().strip('"\'') or None
+    return None
+
+
+def body_chunks(response):
+    """
+    Whatever body bytes have arrived, up to CHUNK_SIZE at a time. iter_content blocks until a full chunk
+    is in, so a slow trickle would hold the deadline check back; urllib3 2's read1 returns early.
+    """
+    raw = response.raw
+    if not hasattr(raw, 'read1'):
+        yield from response.iter_content(CHUNK_SIZE)
+        return
+    while True:
+        chunk = raw.read1(CHUNK_SIZE, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
+
+
+def capped_chunks(response, result, started, max_bytes, deadline):
+    """body_chunks counted into result.bytes_read, stopping with result.skipped set past `max_bytes` or `deadline`."""
+    for chunk in body_chunks(response):
+        result.bytes_read += len(chunk)
+        if result.bytes_read > max_bytes:
+            result.skipped = 'too_large'
+            return
+        if time.monotonic() - started > deadline:
+            result.skipped = 'deadline'
+            return
+        yield chunk
+
+
+def incremental_decoder(content_type, first_chunk):
+    """Decoder for the Content-Type charset, else a <meta charset> in the first chunk, else UTF-8."""
+    charset = charset_from_content_type(content_type)
+    if charset is None:
+        match = META_CHARSET.search(first_chunk[:4096])
+        charset = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return codecs.getincrementaldecoder(charset)(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+
+class StreamedResponse:
+    """
+    The parts of a requests.Response the crawlers use. An HTML body is only kept decoded, in `text`;
+    `bytes_read` counts body bytes after content decoding, so the cap also stops gzip bombs. `skipped` says why the body was not read: 'content_type'
+    (not HTML), 'too_large' (over max_bytes, declared or counted) or 'deadline'.
+    """
+
+    def __init__(self, url, status_code, headers, content=b'', text='', skipped=None, bytes_read=0):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.text = text
+        self.skipped = skipped
+        self.bytes_read = bytes_read
+
+
+def stream_get(session, url, timeout=5, headers=None, max_bytes=DEFAULT_MAX_BYTES, deadline=DEFAULT_DEADLINE):
+    """
+    GET that looks at the headers before downloading anything. Non-HTML responses and responses declaring
+    more than `max_bytes` are closed right away; HTML is read in chunks, decoded as it arrives, and dropped
+    if it grows past `max_bytes` or the whole fetch takes longer than `deadline` seconds (`timeout` alone
+    only bounds each socket read, a slow trickle never trips it). Non-200 bodies get the same limits.
+    """
+    started = time.monotonic()
+    response = (session or requests).get(url, timeout=timeout, headers=headers, stream=True)
+    try:
+        content_type = response.headers.get('Content-Type', '')
+        result = StreamedResponse(response.url, response.status_code, response.headers)
+        if response.status_code != 200:
+            # Error and 304 bodies are kept as bytes, under the same cap and deadline as pages
+            content = b''.join(capped_chunks(response, result, started, max_bytes, deadline))
+            if not result.skipped:
+                result.content = content
+            return result
+        if not is_html_type(content_type):
+            result.skipped = 'content_type'
+            return result
+        declared = response.headers.get('Content-Length', '')
+        if declared.isdigit() and int(declared) > max_bytes:
+            result.skipped = 'too_large'
+            return result
+        parts, decoder = [], None
+        for chunk in capped_chunks(response, result, started, max_bytes, deadline):
+            if decoder is None:
+                decoder = incremental_decoder(content_type, chunk)
+            parts.append(decoder.decode(chunk))
+        if result.skipped:
+            return result
+        if decoder is not None:
+            parts.append(decoder.decode(b'', final=True))
+        result.text = ''.join(parts)
+        return result
+    finally:
+        # An unread body can't go back to the pool, closing drops the connection instead of draining it
+        response.close()
@@ -0,0 +1,214 @@
+import argparse
+import bisect
+import itertools
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import urlparse
+
+WORDS = ("cold war soviet union china split treaty missile berlin wall summit detente embargo alliance doctrine "
+         "proxy conflict nuclear arms race diplomacy communist movement international history party congress "
+         "border dispute ideology revision leadership moscow beijing washington korea vietnam cuba crisis").split()
+
+
+def zipf_cdf(n, alpha):
+    weights = [1 / (rank ** alpha) for rank in range(1, n + 1)]
+    total = sum(weights)
+    return list(itertools.accumulate(w / total for w in weights))
+
+
+class SyntheticWeb:
+    """
+    Deterministic generated web for crawler benchmarks. `num_hosts` hosts with `pages_per_host` pages each;
+    every page's links are drawn from a Zipf distribution over hosts and pages, so in-degree follows a power
+    law. Pages are generated from (seed, host, page) on request, nothing is stored.
+
+    Hosts are either loopback addresses (127.1.x.y, reachable on Linux without any client setup) or, with
+    host_mode='proxy', names like site12.synthetic.test that clients reach by using the server as their
+    HTTP proxy (HTTP_PROXY=http://127.0.0.1:port). Per-host behaviour, all drawn from the seed:
+    latency (lognormal around latency_ms), robots.txt with a disallowed /private/ path and optional
+    Crawl-delay, 301 redirects (/r/N -> /p/N), non-HTML responses (/doc/N is a PDF, /data/N is JSON) and
+    crawler traps on `trap_fraction` of the hosts (an endless calendar, repeating path segments and
+    session-id query strings).
+    """
+
+    def __init__(self, num_hosts=200, pages_per_host=200, seed=0, port=8800, host_mode='loopback',
+                 latency_ms=50, links_per_page=12, internal_link_ratio=0.7, alpha=1.1,
+                 redirect_ratio=0.05, non_html_ratio=0.05, robots_disallow_ratio=0.2, crawl_delay_ratio=0.05,
+                 trap_fraction=0.02, words_per_page=300):
+        self.num_hosts = num_hosts
+        self.pages_per_host = pages_per_host
+        self.seed = seed
+        self.port = port
+        self.host_mode = host_mode
+        self.links_per_page = links_per_page
+        self.internal_link_ratio = internal_link_ratio
+        self.redirect_ratio = redirect_ratio
+        self.non_html_ratio = non_html_ratio
+        self.words_per_page = words_per_page
+        self.host_cdf = zipf_cdf(num_hosts, alpha)
+        self.page_cdf = zipf_cdf(pages_per_host, alpha)
+        self.word_cdf = zipf_cdf(len(WORDS), 1.0)
+        self.hosts = []
+        for index in range(num_hosts):
+            rnd = random.Random(f"{seed}-host-{index}")
+            self.hosts.append({
+                "latency": rnd.lognormvariate(0, 0.5) * latency_ms / 1000,
+                "disallow": rnd.random() < robots_disallow_ratio,
+                "crawl_delay": 2 if rnd.random() < crawl_delay_ratio else None,
+                "no_robots": rnd.random() < 0.1,  # robots.txt answers 404
+                "trap": rnd.random() < trap_fraction,
+            })
+        self.requests = 0
+
+    def host_name(self, index):
+        if self.host_mode == 'proxy':
+            return f"site{index}.synthetic.test"
+        return f"127.1.{index // 250}.{index % 250 + 1}:{self.port}"
+
+    def host_index(self, host):
+        host = host.split(':')[0]
+        if self.host_mode == 'proxy':
+            match = re.match(r'site(\d+)\.synthetic\.test$', host)
+            index = int(match.group(1)) if match else -1
+        else:
+            parts = host.split('.')
+            index = int(parts[2]) * 250 + int(parts[3]) - 1 if len(parts) == 4 and parts[:2] == ['127', '1'] else -1
+        return index if 0 <= index < self.num_hosts else None
+
+    def url(self, host, page, kind='p'):
+        return f"http://{self.host_name(host)}/{kind}/{page}"
+
+    def seed_urls(self, count=4):
+        """The most linked-to hosts' front pages."""
+        return [self.url(host, 0) for host in range(min(count, self.num_hosts))]
+
+    def links(self, host, page, path, rnd):
+        links = []
+        for _ in range(self.links_per_page):
+            target_host = host if rnd.random() < self.internal_link_ratio else bisect.bisect_left(self.host_cdf, rnd.random())
+            target_page = bisect.bisect_left(self.page_cdf, rnd.random())
+            roll = rnd.random()
+            if roll < self.redirect_ratio:
+                kind = 'r'
+            elif roll < self.redirect_ratio + self.non_html_ratio:
+                kind = rnd.choice(('doc', 'data'))
+            elif roll < self.redirect_ratio + self.non_html_ratio + 0.03 and self.hosts[target_host]["disallow"]:
+                kind = 'private'
+            else:
+                kind = 'p'
+            links.append(self.url(target_host, min(target_page, self.pages_per_host - 1), kind))
+        if self.hosts[host]["trap"]:
+            name = self.host_name(host)
+            links.append(f"http://{name}/calendar/{2000 + page % 30}/1")
+            # Repeating segments: every page under /a/ links one level deeper
+            links.append(f"http://{name}{path}/a/b" if path.startswith('/a/') else f"http://{name}/a/b/{page}")
+            links.append(f"http://{name}/p/{page}?sid={rnd.getrandbits(48):x}")
+        return links
+
+    def page_html(self, host, page, path):
+        rnd = random.Random(f"{self.seed}-{host}-{path}")
+        words = [WORDS[bisect.bisect_left(self.word_cdf, rnd.random())] for _ in range(self.words_per_page)]
+        anchors = ' '.join(f'<a href="{link}">{rnd.choice(WORDS)} {rnd.choice(WORDS)}</a>' for link in self.links(host, page, path, rnd))
+        title = f"{self.host_name(host)} {path}"
+        return (f'<!DOCTYPE html><html lang="en"><head><title>{title}</title>'
+                f'<script>var x = 1;</script></head><body><h1>{title}</h1><p>{" ".join(words)}</p>'
+                f'<nav>{anchors}</nav></body></html>')
+
+    def respond(self, host, path):
+        """(status, headers, body) for a request; None host means an unknown name."""
+        if host is None:
+            return 404, {}, b''
+        info = self.hosts[host]
+        if path == '/robots.txt':
+            if info["no_robots"]:
+                return 404, {'Content-Type': 'text/plain'}, b'not found'
+            lines = ["User-agent: *"]
+            lines.append("Disallow: /private/" if info["disallow"] else "Disallow:")
+            if info["crawl_delay"]:
+                lines.append(f"Crawl-delay: {info['crawl_delay']}")
+            return 200, {'Content-Type': 'text/plain'}, ('\n'.join(lines) + '\n').encode()
+        parsed = urlparse(path)
+        parts = [part for part in parsed.path.split('/') if part]
+        kind = parts[0] if parts else 'p'
+        page = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+        if kind == 'r':
+            return 301, {'Location': self.url(host, page)}, b''
+        if kind == 'doc':
+            return 200, {'Content-Type': 'application/pdf'}, b'%PDF-1.4\n' + random.Random(path).randbytes(20000)
+        if kind == 'data':
+            return 200, {'Content-Type': 'application/json'}, b'{"synthetic": true}'
+        if kind == 'calendar' and info["trap"] and len(parts) >= 3 and parts[1].isdigit() and parts[2].isdigit():
+            # Every month links to the next one, forever
+            year, month = int(parts[1]), int(parts[2])
+            next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            name = self.host_name(host)
+            body = (f'<html lang="en"><head><title>Calendar {year}-{month}</title></head><body><p>Events {year} {month}</p>'
+                    f'<a href="http://{name}/calendar/{next_year}/{next_month}">next</a></body></html>')
+            return 200, {'Content-Type': 'text/html; charset=utf-8'}, body.encode()
+        if kind not in ('p', 'private', 'a', 'calendar') or page >= self.pages_per_host:
+            return 404, {'Content-Type': 'text/html'}, b'<html><head><title>Not found</title></head></html>'
+        body = self.page_html(host, page, parsed.path).encode()
+        return 200, {'Content-Type': 'text/html; charset=utf-8', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}, body
+
+    def handler(self):
+        web = self
+
+        class SyntheticHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                web.requests += 1
+                if self.path.startswith('http://'):
+                    # Proxy request: absolute url in the request line
+                    parsed = urlparse(self.path)
+                    host, path = parsed.netloc, parsed.path + (f"?{parsed.query}" if parsed.query else '')
+                else:
+                    host, path = self.headers.get('Host', ''), self.path
+                index = web.host_index(host)
+                if index is not None:
+                    time.sleep(web.hosts[index]["latency"])
+                status, headers, body = web.respond(index, path)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Crawlers hang up after the headers of bodies they don't want
+
+            def log_message(self, format, *args):
+                pass
+
+        return SyntheticHandler
+
+    def serve(self, background=False):
+        server = ThreadingHTTPServer(('0.0.0.0', self.port), self.handler())
+        server.daemon_threads = True
+        if background:
+            Thread(target=server.serve_forever, daemon=True).start()
+            return server
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a generated multi-host web for crawler benchmarks.")
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--hosts', type=int, default=200)
+    parser.add_argument('--pages-per-host', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--trap-fraction', type=float, default=0.02)
+    parser.add_argument('--host-mode', choices=('loopback', 'proxy'), default='loopback')
+    args = parser.parse_args()
+    web = SyntheticWeb(args.hosts, args.pages_per_host, args.seed, args.port, args.host_mode,
+                       latency_ms=args.latency_ms, trap_fraction=args.trap_fraction)
+    print(f"Serving {args.hosts} hosts x {args.pages_per_host} pages on port {args.port}, seeds: {' '.join(web.seed_urls())}")
+    web.serve()
@@ -0,0 +1,272 @@
+import bisect
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus style), an observation is one bisect and two additions."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.lock = Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """Estimate from the buckets, interpolating linearly inside the bucket that holds the quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class CrawlMetrics:
+    """
+    Crawl telemetry shared by both crawlers: fetch / parse / write / politeness-wait histograms, bytes
+    downloaded, response status counts, documents written, pages per second and per-host queue depth.
+    `start()` writes a JSON snapshot every `interval` seconds and, with a port, serves /metrics
+    (Prometheus text) and /metrics.json.
+    """
+
+    HISTOGRAMS = ("fetch_seconds", "parse_seconds", "write_seconds", "politeness_wait_seconds")
+
+    def __init__(self, name='crawler', top_hosts=20):
+        self.name = name
+        self.top_hosts = top_hosts
+        self.histograms = {key: Histogram() for key in self.HISTOGRAMS}
+        self.status_counts = Counter()
+        self.host_queue_depth = Counter()  # host -> urls waiting in the frontier
+        self.gauges = {}  # name -> callable read at snapshot time, e.g. pipeline stage queue depths
+        self.counters = Counter()  # Free-form event counts, e.g. connection pool checkouts
+        self.reports = {}  # name -> callable returning a json section, e.g. circuit breaker state
+        self.bytes_downloaded = 0
+        self.pages_fetched = 0
+        self.documents_written = 0
+        self.started_at = time.time()
+        self.lock = Lock()
+        self.rate_samples = deque([(self.started_at, 0)], maxlen=6)  # (time, pages_fetched) from the snapshot loop
+        self.stop_event = Event()
+        self.thread = None
+        self.server = None
+        self.snapshot_path = None
+
+    def timer(self, key):
+        return Timer(self.histograms[key])
+
+    def observe(self, key, seconds):
+        self.histograms[key].observe(seconds)
+
+    def gauge(self, name, read):
+        """Report `read()` as `name` in every snapshot."""
+        self.gauges[name] = read
+
+    def report(self, name, read):
+        """Add `read()` as section `name` of every json snapshot (not exported to Prometheus)."""
+        self.reports[name] = read
+
+    def forget_host(self, host):
+        with self.lock:
+            self.host_queue_depth.pop(host, None)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def record_response(self, status, num_bytes):
+        with self.lock:
+            self.status_counts[str(status)] += 1
+            self.bytes_downloaded += num_bytes
+            self.pages_fetched += 1
+
+    def record_error(self, kind='error'):
+        with self.lock:
+            self.status_counts[kind] += 1
+
+    def record_document(self):
+        with self.lock:
+            self.documents_written += 1
+
+    def queued(self, host, count=1):
+        with self.lock:
+            self.host_queue_depth[host] += count
+
+    def dequeued(self, host):
+        with self.lock:
+            self.host_queue_depth[host] -= 1
+            if self.host_queue_depth[host] <= 0:
+                del self.host_queue_depth[host]
+
+    def snapshot(self):
+        now = time.time()
+        with self.lock:
+            elapsed = max(now - self.started_at, 1e-9)
+            last_time, last_pages = self.rate_samples[0]  # About the last minute with the default interval
+            recent = (self.pages_fetched - last_pages) / max(now - last_time, 1e-9)
+            data = {
+                "name": self.name,
+                "timestamp": now,
+                "uptime_seconds": round(elapsed, 3),
+                "pages_fetched": self.pages_fetched,
+                "documents_written": self.documents_written,
+                "bytes_downloaded": self.bytes_downloaded,
+                "pages_per_second": round(self.pages_fetched / elapsed, 3),
+                "recent_pages_per_second": round(recent, 3),
+                "status_counts": dict(self.status_counts),
+                "counters": dict(self.counters),
+                "queued_hosts": len(self.host_queue_depth),
+                "host_queue_depth": dict(self.host_queue_depth.most_common(self.top_hosts)),
+            }
+        data["gauges"] = {name: read() for name, read in self.gauges.items()}
+        for name, read in self.reports.items():
+            data[name] = read()
+        for key, histogram in self.histograms.items():
+            data[key] = histogram.snapshot()
+        return data
+
+    def summary(self):
+        data = self.snapshot()
+        fetch = data["fetch_seconds"]
+        return (f"{data['pages_fetched']} pages, {data['documents_written']} documents, "
+                f"{data['bytes_downloaded'] / 1e6:.1f} MB in {data['uptime_seconds']:.0f}s "
+                f"({data['pages_per_second']} pages/s), fetch p50 {fetch['p50']} p95 {fetch['p95']}, "
+                f"statuses {data['status_counts']}")
+
+    def prometheus(self):
+        data = self.snapshot()
+        prefix = self.name
+        lines = []
+        for key in self.HISTOGRAMS:
+            histogram = self.histograms[key]
+            lines.append(f"# TYPE {prefix}_{key} histogram")
+            cumulative = 0
+            for bound, n in zip([str(b) for b in histogram.buckets] + ["+Inf"], histogram.counts):
+                cumulative += n
+                lines.append(f'{prefix}_{key}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}_{key}_sum {histogram.sum}")
+            lines.append(f"{prefix}_{key}_count {histogram.count}")
+        for key in ("pages_fetched", "documents_written", "bytes_downloaded"):
+            lines.append(f"# TYPE {prefix}_{key}_total counter")
+            lines.append(f"{prefix}_{key}_total {data[key]}")
+        lines.append(f"# TYPE {prefix}_responses_total counter")
+        for status, n in sorted(data["status_counts"].items()):
+            lines.append(f'{prefix}_responses_total{{status="{status}"}} {n}')
+        for key in ("pages_per_second", "recent_pages_per_second", "queued_hosts"):
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {data[key]}")
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in data["gauges"].items():
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        lines.append(f"# TYPE {prefix}_host_queue_depth gauge")
+        for host, depth in data["host_queue_depth"].items():
+            lines.append(f'{prefix}_host_queue_depth{{host="{host}"}} {depth}')
+        return '\n'.join(lines) + '\n'
+
+    def write_snapshot(self, path=None):
+        path = path or self.snapshot_path
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(tmp_path, path)
+
+    def start(self, snapshot_path=None, interval=10, port=None):
+        self.snapshot_path = snapshot_path
+        self.stop_event.clear()
+        with self.lock:
+            self.started_at = time.time()  # Rates cover the crawl, not the setup before it
+            self.rate_samples = deque([(self.started_at, self.pages_fetched)], maxlen=6)
+        if snapshot_path:
+            self.thread = Thread(target=self._snapshot_loop, args=(interval,), daemon=True)
+            self.thread.start()
+        if port is not None:
+            self.server = ThreadingHTTPServer(('', port), metrics_handler(self))
+            Thread(target=self.server.serve_forever, daemon=True).start()
+            logging.info(f"Crawl metrics served on port {port}: /metrics and /metrics.json")
+
+    def _snapshot_loop(self, interval):
+        while not self.stop_event.wait(interval):
+            with self.lock:
+                self.rate_samples.append((time.time(), self.pages_fetched))
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logging.error(f"Could not write metrics snapshot: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        if self.snapshot_path:
+            self.write_snapshot()  # Final numbers for the finished crawl
+        if self.server:
+            self.server.shutdown()
+            self.server = None
+
+
+def metrics_handler(metrics):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = metrics.prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body, content_type = json.dumps(metrics.snapshot()).encode('utf-8'), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes would flood the crawl log
+
+    return MetricsHandler
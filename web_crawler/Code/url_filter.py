@@ -0,0 +1,86 @@
+import re
+from functools import lru_cache
+from urllib.parse import urljoin
+
+
+def trie_regex(words):
+    """
+    One regex matching any of `words` as a substring. The alternatives are factored into a trie
+    (\\.(?:gif|pdf|...)|s(?:earch|pecial)...), so at each position the engine follows at most one branch
+    per character instead of trying every word; a word that is a prefix of another ends its branch, since
+    the shorter one already matches.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        if '' in node:
+            return ''
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+
+    return build(trie)
+
+
+class UrlFilter:
+    """Substring block list (".pdf", "youtube", "mailto", ...) compiled into a single trie regex."""
+
+    def __init__(self, patterns, ignore_case=False):
+        self.patterns = sorted(set(patterns))
+        flags = re.IGNORECASE if ignore_case else 0
+        # An empty list must match nothing, not everything
+        self.regex = re.compile(trie_regex(self.patterns), flags) if self.patterns else None
+
+    def matches(self, url):
+        return self.regex is not None and self.regex.search(url) is not None
+
+    def __contains__(self, url):
+        return self.matches(url)
+
+
+class LinkNormalizer:
+    """
+    Link hot path shared by both crawlers: resolve, canonicalize, validate and block-list check every link
+    of a page in one call. The per-url part is memoized in an LRU cache, navigation links repeat on every
+    page of a site, so most links of a page are cache hits. With `traps` (a url_traps.TrapDetector) each
+    surviving url must also be admitted by it; that check keeps state, so it runs outside the cache.
+    """
+
+    def __init__(self, canonicalize, url_filter, is_valid=None, cache_size=1 << 16, traps=None):
+        self.canonicalize = canonicalize
+        self.url_filter = url_filter
+        self.is_valid = is_valid
+        self.traps = traps
+        self.canonical = lru_cache(maxsize=cache_size)(self._canonical)
+
+    def _canonical(self, absolute_url):
+        """Canonical form of an absolute url, or None if it is invalid or blocked."""
+        url = self.canonicalize(absolute_url)
+        if self.is_valid is not None and not self.is_valid(url):
+            return None
+        if self.url_filter.matches(url):
+            return None
+        return url
+
+    def normalize(self, base_url, links):
+        """(canonical url, anchor text) for the page's links that pass, in page order, each url once."""
+        canonical = self.canonical
+        traps = self.traps
+        seen = set()
+        normalized = []
+        for href, anchor_text in links:
+            if not href.startswith(('http://', 'https://')):
+                href = urljoin(base_url, href)
+            url = canonical(href)
+            if url is not None and url not in seen:
+                seen.add(url)
+                if traps is None or traps.admit(url):
+                    normalized.append((url, anchor_text))
+        return normalized
+
+    def cache_info(self):
+        return self.canonical.cache_info()
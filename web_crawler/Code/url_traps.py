@@ -0,0 +1,144 @@
+import re
+from collections import Counter
+from threading import Lock
+from urllib.parse import urlsplit, parse_qsl
+
+SESSION_PARAMS = frozenset(('sid', 'sessionid', 'session_id', 'sessid', 'jsessionid', 'phpsessid', 'aspsessionid', 'cfid', 'cftoken'))
+CALENDAR_PARAMS = frozenset(('year', 'month', 'day', 'date', 'week', 'cal', 'calendar'))
+# A path ending in a date: /2031/07, /2031/7/15/ or a whole 2031-07 / 2031-07-15 segment, valid months
+# and days only. Numeric ids (/news/20123.html) and dated article slugs (/2031/07/some-title) don't match.
+YEAR, MONTH, DAY = r'(?:19|20)\d\d', r'(?:0?[1-9]|1[0-2])', r'(?:0?[1-9]|[12]\d|3[01])'
+CALENDAR_PATH = re.compile(rf'/{YEAR}(?:/{MONTH}(?:/{DAY})?|-{MONTH}(?:-{DAY})?)/?$')
+DIGITS = re.compile(r'\d+')
+# Hex ids, hashes and other long tokens mixing letters and digits
+ID_TOKEN = re.compile(r'^(?=[^/]*\d)(?=[^/]*[a-zA-Z])[\w-]{16,}$')
+
+
+def path_shape(path):
+    """Path with numbers as # and long id-like segments as *, e.g. /calendar/2031/7 -> /calendar/#/#."""
+    return '/'.join('*' if ID_TOKEN.match(segment) else DIGITS.sub('#', segment) for segment in path.split('/'))
+
+
+def repeating_block(segments, max_repeats, max_block=3):
+    """True if some run of 1..max_block segments occurs max_repeats times in a row (/a/b/a/b/a/b)."""
+    for size in range(1, max_block + 1):
+        needed = size * max_repeats
+        for start in range(len(segments) - needed + 1):
+            block = segments[start:start + size]
+            if all(segments[start + k * size:start + (k + 1) * size] == block for k in range(1, max_repeats)):
+                return True
+    return False
+
+
+class TrapDetector:
+    """
+    Admission check for links about to enter the frontier, aimed at spaces that generate urls without
+    end. Rejected outright: urls longer than `max_length`, deeper than `max_depth` path segments, or whose
+    path repeats a block of segments `max_repeats` times in a row. Capped per pattern, where a pattern
+    is the host, path shape (numbers and id tokens wildcarded) and query parameter names:
+      session_id  - a session id parameter (sid, jsessionid, ...), `trap_pattern_cap` urls
+      calendar    - a path ending in a date or calendar parameters, `trap_pattern_cap` urls
+      facets      - more than `max_query_params` parameters, `trap_pattern_cap` urls
+      query_param - a parameter the host has used with more than `max_param_values` distinct values,
+                    `query_pattern_cap` urls
+    Urls already admitted stay admitted, so a calendar link repeated on every page is counted once.
+    Suppressed urls are counted per kind, in `metrics` as trap_<kind>. Thread safe.
+    """
+
+    def __init__(self, max_length=400, max_depth=12, max_repeats=3, max_query_params=6, max_param_values=50,
+                 trap_pattern_cap=50, query_pattern_cap=500, metrics=None):
+        self.max_length = max_length
+        self.max_depth = max_depth
+        self.max_repeats = max_repeats
+        self.max_query_params = max_query_params
+        self.max_param_values = max_param_values
+        self.trap_pattern_cap = trap_pattern_cap
+        self.query_pattern_cap = query_pattern_cap
+        self.metrics = metrics
+        self.param_values = {}  # (host, param) -> distinct values seen, kept up to max_param_values + 1
+        self.admitted = {}  # pattern -> urls admitted under it, at most its cap
+        self.suppressed = Counter()  # kind -> urls suppressed
+        self.suppressed_patterns = Counter()  # pattern -> urls suppressed past its cap
+        self.lock = Lock()
+
+    def classify(self, url):
+        """
+        (kind, pattern) of a trap url, pattern None if it is rejected outright; (None, None) for a regular url.
+
+        >>> detector = TrapDetector()
+        >>> detector.classify('http://example.com/calendar/2031/07/15')[0]
+        'calendar'
+        >>> detector.classify('http://example.com/events/2031-07')[0]
+        'calendar'
+        >>> detector.classify('http://example.com/news/20123.html')
+        (None, None)
+        >>> detector.classify('http://example.com/story/2031071.html')
+        (None, None)
+        >>> detector.classify('http://example.com/2031/07/some-title')
+        (None, None)
+        >>> detector.classify('http://example.com/archive/2031/13')
+        (None, None)
+        """
+        if len(url) > self.max_length:
+            return 'too_long', None
+        parts = urlsplit(url)
+        segments = [segment for segment in parts.path.split('/') if segment]
+        if len(segments) > self.max_depth:
+            return 'too_deep', None
+        if repeating_block(segments, self.max_repeats):
+            return 'repeating_path', None
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        names = sorted({name.lower() for name, _ in params})
+        if SESSION_PARAMS.intersection(names) or ';jsessionid=' in parts.path.lower():
+            kind = 'session_id'
+        elif CALENDAR_PATH.search(parts.path) or CALENDAR_PARAMS.intersection(names):
+            kind = 'calendar'
+        elif len(names) > self.max_query_params:
+            kind = 'facets'
+        elif params and self._high_cardinality(parts.netloc, params):
+            kind = 'query_param'
+        else:
+            return None, None
+        return kind, (parts.netloc, path_shape(parts.path), tuple(names))
+
+    def _high_cardinality(self, host, params):
+        high = False
+        with self.lock:
+            for name, value in params:
+                values = self.param_values.setdefault((host, name.lower()), set())
+                if len(values) <= self.max_param_values:
+                    values.add(value)
+                high = high or len(values) > self.max_param_values
+        return high
+
+    def admit(self, url):
+        """True if the url may enter the frontier."""
+        kind, pattern = self.classify(url)
+        if kind is None:
+            return True
+        if pattern is not None:
+            cap = self.query_pattern_cap if kind == 'query_param' else self.trap_pattern_cap
+            with self.lock:
+                admitted = self.admitted.setdefault(pattern, set())
+                if url in admitted:
+                    return True
+                if len(admitted) < cap:
+                    admitted.add(url)
+                    return True
+                self.suppressed_patterns[pattern] += 1
+        with self.lock:
+            self.suppressed[kind] += 1
+        if self.metrics is not None:
+            self.metrics.count(f"trap_{kind}")
+        return False
+
+    def snapshot(self, top=10):
+        """Suppressed urls per kind and the patterns that hit their cap most, for the crawl stats."""
+        with self.lock:
+            return {
+                "suppressed": dict(self.suppressed),
+                "top_patterns": {f"{host}{shape}{'?' + '&'.join(names) if names else ''}": n
+                                 for (host, shape, names), n in self.suppressed_patterns.most_common(top)},
+                "high_cardinality_params": sorted(f"{host} {name}" for (host, name), values in self.param_values.items()
+                                                  if len(values) > self.max_param_values)[:top],
+            }